@@ -0,0 +1,224 @@
+""" Persistent store of the abbreviation dictionary
+
+The abbreviation dictionary (abbreviation_dictionary.json in the resources folder specified in config.py, synchronised
+with eXist by transpy.get_exist_data()) is compiled once into the SQLite database 'abbreviation_dictionary.sqlite'
+next to it. The database stores the SHA-256 hash of the JSON file it was built from as version stamp. If the JSON file
+has changed, the database is rebuilt automatically. Updates from eXist are merged into the database by
+merge_dictionary(), which also keeps ETag and Last-Modified of the download for conditional requests.
+
+AbbreviationStore is a read-only mapping of abbreviations and expansions. The database is opened on the first lookup,
+so the store can be passed to worker processes, where every process opens its own read-only connection. Looked up
+words are kept in memory, so every word is fetched from the database only once per process.
+
+"""
+
+import os # handles filenames in folder
+import json # for reading abbreviation_dictionary.json
+import sqlite3 # for storing the compiled dictionary
+import hashlib # for version stamps
+
+# version of the database format, increase if the tables change
+store_version = 1
+
+# file names in the resources folder
+json_file_name = 'abbreviation_dictionary.json'
+store_file_name = 'abbreviation_dictionary.sqlite'
+
+
+def source_stamp(filename):
+    """ Returns the version stamp of an abbreviation dictionary: SHA-256 hash of the JSON file and store version
+
+    :param filename: Path to abbreviation_dictionary.json
+    :return: Version stamp as string
+    :raises FileNotFoundError: If the file does not exist
+    """
+
+    with open(filename, 'rb') as json_file:
+        return f'{store_version}:{hashlib.sha256(json_file.read()).hexdigest()}'
+
+
+def build_store(json_filename, store_filename, stamp, metadata=None):
+    """
+    Compiles abbreviation_dictionary.json into a database.
+
+    The database is written to a temporary file first, so parallel processes never read half a database.
+
+    :param json_filename: Path to abbreviation_dictionary.json
+    :param store_filename: Path to database
+    :param stamp: Version stamp of the JSON file, see source_stamp()
+    :param metadata: Further metadata as dictionary, e.g. ETag of the download from eXist
+    """
+
+    with open(json_filename, 'r', encoding='utf8') as json_file:
+        dictionary_abbr = json.load(json_file)
+
+    temporary_filename = f'{store_filename}.{os.getpid()}.tmp'
+    if os.path.exists(temporary_filename):
+        os.remove(temporary_filename)
+    connection = sqlite3.connect(temporary_filename)
+    try:
+        with connection:
+            connection.execute('CREATE TABLE abbreviations (abbreviation TEXT PRIMARY KEY, expansion TEXT NOT NULL) '
+                               'WITHOUT ROWID')
+            connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            connection.executemany('INSERT INTO abbreviations VALUES (?, ?)', dictionary_abbr.items())
+            connection.executemany('INSERT INTO metadata VALUES (?, ?)',
+                                   dict(metadata or {}, stamp=stamp).items())
+    finally:
+        connection.close()
+    os.replace(temporary_filename, store_filename)
+
+
+def read_metadata(store_filename):
+    """ Returns the metadata of a database (version stamp and e.g. ETag), empty if it does not exist or cannot be read
+    """
+
+    if not os.path.exists(store_filename):
+        return {}
+    try:
+        connection = sqlite3.connect(f'file:{store_filename}?mode=ro', uri=True)
+        try:
+            return dict(connection.execute('SELECT key, value FROM metadata').fetchall())
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return {}
+
+
+def write_json(json_filename, dictionary_abbr):
+    """ Writes abbreviation_dictionary.json, written to a temporary file first and renamed """
+
+    temporary_filename = f'{json_filename}.{os.getpid()}.tmp'
+    with open(temporary_filename, 'w', encoding='utf8') as json_file:
+        json.dump(dictionary_abbr, json_file)
+    os.replace(temporary_filename, json_filename)
+
+
+def merge_dictionary(json_filename, dictionary_abbr, metadata=None):
+    """
+    Replaces the abbreviation dictionary by a new version and merges the changes into its database.
+
+    abbreviation_dictionary.json is replaced first. If the database is up to date with the former JSON file, only
+    added, changed and removed abbreviations are written in a single transaction together with the new version stamp,
+    so processes reading the database see either the former or the new version. Otherwise the database is rebuilt.
+
+    :param json_filename: Path to abbreviation_dictionary.json
+    :param dictionary_abbr: Dictionary of abbreviations and expansions
+    :param metadata: Further metadata as dictionary, e.g. ETag of the download from eXist
+    :return: Dictionary with the number of added, changed and removed abbreviations
+    """
+
+    store_filename = os.path.join(os.path.dirname(json_filename), store_file_name)
+    former_stamp = source_stamp(json_filename) if os.path.exists(json_filename) else None
+    store_is_current = former_stamp is not None and read_metadata(store_filename).get('stamp') == former_stamp
+    write_json(json_filename, dictionary_abbr)
+    stamp = source_stamp(json_filename)
+
+    if not store_is_current:
+        build_store(json_filename, store_filename, stamp, metadata)
+        return {'added': len(dictionary_abbr), 'changed': 0, 'removed': 0}
+
+    connection = sqlite3.connect(store_filename)
+    try:
+        with connection:
+            existing = dict(connection.execute('SELECT abbreviation, expansion FROM abbreviations').fetchall())
+            removed = [(abbreviation,) for abbreviation in existing if abbreviation not in dictionary_abbr]
+            updated = [(abbreviation, expansion) for abbreviation, expansion in dictionary_abbr.items()
+                       if existing.get(abbreviation) != expansion]
+            connection.executemany('DELETE FROM abbreviations WHERE abbreviation = ?', removed)
+            connection.executemany('INSERT OR REPLACE INTO abbreviations VALUES (?, ?)', updated)
+            connection.execute('DELETE FROM metadata')
+            connection.executemany('INSERT INTO metadata VALUES (?, ?)', dict(metadata or {}, stamp=stamp).items())
+    finally:
+        connection.close()
+    added = sum(1 for abbreviation, _ in updated if abbreviation not in existing)
+    return {'added': added, 'changed': len(updated) - added, 'removed': len(removed)}
+
+
+class AbbreviationStore:
+    """
+    Read-only mapping of abbreviations and expansions stored in a database.
+
+    Supports `word in store`, `store[word]` and `store.get(word)` like the dictionary loaded from
+    abbreviation_dictionary.json formerly.
+
+    Attributes:
+        filename (str): Path to database.
+        version (str): Version stamp of the JSON file the database was built from.
+    """
+
+    def __init__(self, filename, version):
+        self.filename = filename
+        self.version = version
+        self._connection = None
+        self._process_id = None
+        self._lookups = {}
+
+    def __getstate__(self):
+        # connections cannot be pickled, worker processes open their own connection
+        return {'filename': self.filename, 'version': self.version}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['version'])
+
+    def _connect(self):
+        """ Opens the database read-only on first use (and again in forked worker processes) """
+
+        if self._connection is None or self._process_id != os.getpid():
+            self._connection = sqlite3.connect(f'file:{self.filename}?mode=ro', uri=True, check_same_thread=False)
+            self._process_id = os.getpid()
+        return self._connection
+
+    def _lookup(self, word):
+        """ Returns expansion of a word or None, every word is fetched from the database only once """
+
+        if word not in self._lookups:
+            row = self._connect().execute('SELECT expansion FROM abbreviations WHERE abbreviation = ?',
+                                          (word,)).fetchone()
+            self._lookups[word] = row[0] if row else None
+        return self._lookups[word]
+
+    def __contains__(self, word):
+        return self._lookup(word) is not None
+
+    def __getitem__(self, word):
+        expansion = self._lookup(word)
+        if expansion is None:
+            raise KeyError(word)
+        return expansion
+
+    def get(self, word, default=None):
+        expansion = self._lookup(word)
+        return default if expansion is None else expansion
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM abbreviations').fetchone()[0]
+
+    def __iter__(self):
+        return iter([row[0] for row in self._connect().execute('SELECT abbreviation FROM abbreviations')])
+
+
+# stores opened in this process by path of the JSON file
+opened_stores = {}
+
+
+def open_store(json_filename):
+    """
+    Opens the store of an abbreviation dictionary, the database is (re)built if missing or outdated.
+
+    Stores are kept per process, an unchanged store is returned again without reading the database.
+
+    :param json_filename: Path to abbreviation_dictionary.json
+    :return: AbbreviationStore
+    :raises FileNotFoundError: If the JSON file does not exist
+    """
+
+    stamp = source_stamp(json_filename)
+    if json_filename in opened_stores and opened_stores[json_filename].version == stamp:
+        return opened_stores[json_filename]
+
+    store_filename = os.path.join(os.path.dirname(json_filename), store_file_name)
+    if read_metadata(store_filename).get('stamp') != stamp:
+        build_store(json_filename, store_filename, stamp)
+    opened_stores[json_filename] = AbbreviationStore(store_filename, stamp)
+    return opened_stores[json_filename]
@@ -0,0 +1,197 @@
+"""
+BDD Batch Processing Script
+===========================
+
+Summary:
+--------
+This script processes many books of one or several manuscripts in one run. The books are read from a job manifest.
+If requested, all books are exported from Transkribus and downloaded concurrently first. Then the books are
+distributed over a pool of worker processes. The abbreviation store is built once, every worker opens it read-only and
+loads the TEI templates once, then converts its books using bdd.process_book(). A failing book is reported and does not
+stop the other books.
+
+Usage:
+------
+python batch.py <manifest> [-workers N] [-dl] [-cache] [-report report.json] [-sync]
+
+- manifest: CSV file with the columns siglum, book, page_range, folio, iiif_image_id or JSON file containing a list of
+  objects with these keys, e.g. {"siglum": "B", "book": 7, "page_range": "282-291", "folio": "139v",
+  "iiif_image_id": 236435}. An optional column/key 'download' overrides -dl for a single book.
+- -workers N: (optional) Number of worker processes (default: number of CPUs).
+- -dl: (optional) Export and download the data of all books from Transkribus (concurrently, before processing).
+- -cache: (optional) Reuse pages converted in earlier runs if their PAGE XML is unchanged.
+- -report: (optional) Save timings and errors of all books as JSON file.
+- -sync: (optional) Update the abbreviation dictionary from eXist before processing (only changes are downloaded).
+
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import time
+import traceback
+
+import bdd
+import config # stores basic config
+import transkribus_client # for concurrent exports and resumable downloads
+import transpy
+import url_templates # for checking templates of the manuscripts
+
+
+# resources shared by all books processed in a worker
+worker_dictionary_abbr_external = None
+
+
+def read_manifest(filename):
+    """ Read job manifest
+
+    :param filename: Path to CSV or JSON file
+    :return: List of jobs as dictionaries with the keys siglum, book, page_range, folio, iiif_image_id (and download)
+    """
+
+    if filename.lower().endswith('.json'):
+        with open(filename, 'r', encoding='utf8') as manifest_file:
+            jobs = json.load(manifest_file)
+    else:
+        with open(filename, 'r', encoding='utf8', newline='') as manifest_file:
+            jobs = [row for row in csv.DictReader(manifest_file)]
+
+    required_keys = ['siglum', 'book', 'page_range', 'folio', 'iiif_image_id']
+    for number, job in enumerate(jobs, start=1):
+        missing_keys = [key for key in required_keys if str(job.get(key, '')).strip() == '']
+        if missing_keys:
+            raise ValueError(f'Job {number} in {filename} lacks {", ".join(missing_keys)}')
+    return jobs
+
+
+def wants_download(job, download):
+    """ Checks, if a job has to be downloaded, the column 'download' of the manifest overrides the flag -dl """
+
+    return str(job.get('download', download)).strip().lower() in ('true', '1', 'yes')
+
+
+def download_jobs(jobs, download):
+    """ Export and download all books to be downloaded concurrently (pages are read from the zip files later)
+
+    :param jobs: Jobs as returned by read_manifest()
+    :param download: Download all books if not specified by job
+    :return: Dictionary of job numbers and error messages of failed downloads
+    """
+
+    numbers = [number for number, job in enumerate(jobs) if wants_download(job, download)]
+    if not numbers:
+        return {}
+
+    exports = []
+    for number in numbers:
+        job = jobs[number]
+        manuscript_data = config.manuscript_data[job['siglum']]
+        startpage, endpage = [int(page) for page in job['page_range'].split('-')]
+        exports.append((manuscript_data['transkribus_collection_id'], manuscript_data['transkribus_document_id'],
+                        startpage, endpage,
+                        transpy.export_zip_file_name(manuscript_data['transkribus_document_id'], startpage, endpage)))
+
+    print(f'Starting export and download of {len(exports)} books from Transkribus.')
+    errors = {}
+    for number, zip_file_name in zip(numbers, transkribus_client.download_exports(exports)):
+        if isinstance(zip_file_name, Exception):
+            errors[number] = f'Download failed: {type(zip_file_name).__name__}: {zip_file_name}'
+    print('Finished download.\n')
+    return errors
+
+
+def init_worker(dictionary_abbr_external):
+    """ Set shared resources once per worker process
+
+    :param dictionary_abbr_external: Abbreviation store opened by the main process, see transpy.load_abbreviation_dict()
+    """
+
+    global worker_dictionary_abbr_external
+    worker_dictionary_abbr_external = dictionary_abbr_external
+
+
+def process_job(job, use_cache=False):
+    """ Process a single book of the manifest in a worker process
+
+    :param job: Job as returned by read_manifest()
+    :param use_cache: Reuse unchanged pages of earlier runs?
+    :return: Dictionary with job, status, duration in seconds, output file, report of the stages and error message
+    """
+
+    start = time.perf_counter()
+    result = {'siglum': job['siglum'], 'book': int(job['book']), 'page_range': job['page_range']}
+    try:
+        result['output'] = bdd.process_book(job['siglum'], job['book'], job['page_range'], job['folio'],
+                                            job['iiif_image_id'],
+                                            dictionary_abbr_external=worker_dictionary_abbr_external,
+                                            use_cache=use_cache)
+        result['stage_report'] = os.path.splitext(result['output'])[0] + '.report.json'
+        result['status'] = 'ok'
+    except (Exception, SystemExit) as e:
+        # PageXMLTests stops with exit() if the PAGE XML is inconsistent
+        result['status'] = 'failed'
+        result['error'] = f'{type(e).__name__}: {e}'
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conversion of many books from Transkribus into BDD-TEI.')
+    parser.add_argument('manifest', help='CSV or JSON file listing siglum, book, page_range, folio, iiif_image_id')
+    parser.add_argument('-workers', '--workers', help='Number of worker processes', type=int, default=os.cpu_count())
+    parser.add_argument('-dl', help='Download?', action='store_true')
+    parser.add_argument('-cache', help='Reuse unchanged pages of earlier runs?', action='store_true')
+    parser.add_argument('-report', '--report', help='Save timings and errors as JSON file')
+    parser.add_argument('-sync', help='Update abbreviations from eXist first?', action='store_true')
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+    # check templates of all manuscripts before starting
+    for siglum in sorted({job['siglum'] for job in jobs}):
+        url_templates.page_templates(siglum)
+    start = time.perf_counter()
+    results = [None] * len(jobs)
+
+    # books that could not be downloaded are not processed
+    download_errors = download_jobs(jobs, args.dl)
+    for number, error in download_errors.items():
+        job = jobs[number]
+        results[number] = {'siglum': job['siglum'], 'book': int(job['book']), 'page_range': job['page_range'],
+                           'status': 'failed', 'error': error, 'traceback': '', 'seconds': 0}
+
+    # abbreviation store is built once and opened read-only by every worker
+    dictionary_abbr_external = transpy.load_abbreviation_dict(sync=args.sync)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                                initargs=(dictionary_abbr_external,)) as executor:
+        futures = {executor.submit(process_job, job, args.cache): number for number, job in enumerate(jobs)
+                   if number not in download_errors}
+        for future in concurrent.futures.as_completed(futures):
+            job = jobs[futures[future]]
+            try:
+                result = future.result()
+            except Exception as e:
+                # worker process died, e.g. out of memory
+                result = {'siglum': job['siglum'], 'book': int(job['book']), 'page_range': job['page_range'],
+                          'status': 'failed', 'error': f'{type(e).__name__}: {e}', 'traceback': '', 'seconds': 0}
+            # report in order of manifest
+            results[futures[future]] = result
+            print(f"{result['status']:>6} {result['siglum']} book {result['book']:02d} in {result['seconds']:.1f}s "
+                  f"{result.get('error', '')}")
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f'\nProcessed {len(results)} books in {time.perf_counter() - start:.1f}s, {len(failed)} failed.')
+    for result in failed:
+        print(f"\n{result['siglum']} book {result['book']:02d}:\n{result['traceback']}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf8') as report_file:
+            json.dump(results, report_file, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -16,7 +16,7 @@ This script is designed to automate the processing of manuscripts stored in Tran
 Usage:
 ------
 To use this script, run it from the command line with the following arguments:
-python bdd.py <siglum> <book> <page_range> <folio> <iiif_image_id> [-dl]
+python bdd.py <siglum> <book> <page_range> <folio> <iiif_image_id> [-dl] [-compat] [--jobs N] [-cache] [-sync] [--profile [cprofile|pyinstrument]] [-stream]
 
 - siglum: The unique identifier for the manuscript (e.g., B, F, V).
 - book: The book number.
@@ -24,6 +24,16 @@ python bdd.py <siglum> <book> <page_range> <folio> <iiif_image_id> [-dl]
 - folio: The starting folio number.
 - iiif_image_id: The ID of the IIIF image (as specified in the iiif-manifest).
 - -dl: (optional) Include this flag to download the data from Transkribus.
+- -compat: (optional) Include this flag to compare the abbreviation expansion with the legacy function and print differences.
+- --jobs N: (optional) Number of worker processes for converting the PAGE XML files into TEI (default 1).
+- -cache: (optional) Include this flag to reuse pages converted in earlier runs if their PAGE XML is unchanged.
+- -sync: (optional) Include this flag to update the abbreviation dictionary from eXist (only changes are downloaded).
+- --profile: (optional) Profile the conversion with cProfile (default) or pyinstrument and print the timing report of
+  the stages and the hits and timings of the postprocessing rules. The report (wall time, CPU time, peak memory and
+  document size per stage, hits and seconds per postprocessing rule) is always saved as '<TEI file>.report.json' next
+  to the TEI file.
+- -stream: (optional) Convert the book chapter by chapter and write it into the TEI file directly instead of keeping
+  the whole book in memory (not together with -compat).
 
 Dependencies:
 -------------
@@ -34,7 +44,19 @@ This script relies on the following external libraries:
 - lxml
 - re
 - datetime
+- io
 - os
+- concurrent.futures
+- functools
+- page_cache
+- page_model
+- placeholders
+- profiling
+- rewrite
+- streaming
+- url_templates
+- validation
+- xpaths
 
 License:
 --------
@@ -45,10 +67,22 @@ This script is released under the MIT license. Please refer to the accompanying
 import argparse
 import transpy
 import config
-import lxml.etree as LET
+import coordinates
 import re
 import datetime
+import io
 import os
+import concurrent.futures
+import functools
+import page_cache
+import page_model
+import placeholders
+import profiling
+import rewrite
+import streaming
+import url_templates
+import validation
+import xpaths
 
 
 class ManuscriptToProcess:
@@ -68,9 +102,10 @@ class ManuscriptToProcess:
         start_folio (str): The starting folio number of the manuscript.
         iiif_image_id (int): The ID of the IIIF image.
         path_to_pagexml_files (List[str]): The paths to the PAGE XML files for the manuscript.
-        facs_url (str): The URL for the facsimile of the manuscript.
-        corresp (str): The correspondence information for the manuscript.
-        ana (str): The annotation information for the manuscript.
+        facs_url (str): The URL template for the facsimile of the manuscript.
+        corresp (str): The URL template for the correspondence information of the manuscript.
+        ana (str): The URL template for the annotation information of the manuscript.
+        page_templates (dict): The compiled templates of facs_url, corresp and ana (see url_templates.py).
         toc_label_for_later_replacement (List[str]): A list of TOC labels for later replacement.
         label_for_later_replacement (List[str]): A list of labels for later replacement.
         interrogation_label_for_later_replacement (List[str]): A list of interrogation labels for later replacement.
@@ -89,28 +124,34 @@ class ManuscriptToProcess:
         coords_baseline(self, root, xpath):
             Retrieves and adjusts the coordinates from the baseline of a text region in a PAGE XML document.
 
+        coords_baseline_from_points(self, coords):
+            Calculates the coordinates of a baseline from its points.
+
         coords_text_region(self, root, xpath):
             Get the bounding box coordinates of a text region in a PAGE XML file.
 
-        create_tei_fw_head(self, root):
+        coords_text_region_from_points(self, coords):
+            Calculates the bounding box coordinates of a text region from its points.
+
+        create_tei_fw_head(self, page):
             Creates tei:fw for the header of the manuscript.
 
-        create_column(self, root, column_name, column_a_b):
+        create_column(self, page, column_name, column_a_b):
             Creates text of a column from a PAGE XML file.
 
-        create_tei_fw_foot(self, root):
+        create_tei_fw_foot(self, page):
             Creates tei:fw for the footer of the manuscript.
 
-        store_toc_label_for_later_replacement(self, root):
+        store_toc_label_for_later_replacement(self, page):
             Stores information about TOC labels for later replacement.
 
-        store_label_for_later_replacement(self, root):
+        store_label_for_later_replacement(self, page):
             Stores information about labels for later replacement.
 
-        store_interrogation_label_for_later_replacement(self, root):
+        store_interrogation_label_for_later_replacement(self, page):
             Stores information about interrogation labels for later replacement.
 
-        store_inscription_for_later_replacement(self, root):
+        store_inscription_for_later_replacement(self, page):
             Stores information about inscriptions for later replacement.
 
         create_tei_from_pagexml(self):
@@ -141,6 +182,8 @@ class ManuscriptToProcess:
         self.facs_url = config.manuscript_data[sigla]['facs_url']
         self.corresp = config.manuscript_data[sigla]['corresp']
         self.ana = config.manuscript_data[sigla]['ana']
+        # compile and validate templates for facs, corresp and ana once
+        self.page_templates = url_templates.page_templates(sigla)
         self.toc_label_for_later_replacement = []
         self.label_for_later_replacement = []
         self.interrogation_label_for_later_replacement = []
@@ -215,7 +258,8 @@ class ManuscriptToProcess:
 
         Parameters:
         root (etree.Element): The root node of a PAGE XML document tree.
-        xpath (str): An XPath expression used to find specific elements in the PAGE XML tree.
+        xpath (str): An XPath expression used to find specific elements in the PAGE XML tree (or a compiled query,
+        see xpaths.py).
 
         Returns:
         coord_string (str): A string representing the adjusted coordinates of the baseline in the format "c1,c2,w,h",
@@ -231,41 +275,23 @@ class ManuscriptToProcess:
         each pair of values is separated by a space.
         """
 
-        # scaling factor for coordinates
-        x = float(self.iiif_scale_factor)
-
         # fetch coordinates using XPath query from the PAGE XML document root
-        coords = root.xpath(xpath,
-                            namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-
-        # iterate over all coordinate sets found
-        for i in coords:
-            # split the coordinates by space (expected format is "x1,y1 x2,y2 ... xn,yn")
-            coord = i.split(' ')
-
-            # split the leftmost (first) coordinate by comma into x and y values
-            coord_left = coord[0].split(',')
+        coords = xpath(root) if callable(xpath) else root.xpath(xpath, namespaces=xpaths.namespaces)
 
-            # split the rightmost (last) coordinate by comma into x and y values
-            coord_right = coord[-1].split(',')
+        return self.coords_baseline_from_points(coords)
 
-            # calculate adjusted x-coordinate (c1) and y-coordinate (c2) of the leftmost point of the baseline
-            c1 = int(int(coord_left[0]) * x) - 20  # scale the original x-coordinate by the factor x and reduce by 20
-            c2 = int(int(coord_left[1]) * x) - 50  # scale the original y-coordinate by the factor x and reduce by 50
-
-            # calculate the width of the baseline (the x-distance between the leftmost and rightmost points)
-            w = int(coord_right[0]) - int(coord_left[0]) + 80  # add 80 to the width
-
-            # scale the width by the factor x
-            w = int(w * x)
-
-            # fix the height of the baseline at 100
-            h = 100
+    def coords_baseline_from_points(self, coords):
+        """
+        Calculates the coordinates of a baseline as described in coords_baseline() from its points.
 
-        # format the calculated values into a string "c1,c2,w,h"
-        coord_string = f"{c1},{c2},{w},{h}"
+        :param coords: List of point strings ("x1,y1 x2,y2 ... xn,yn"), the last one is used
+        :return: The coordinates as a string in the format "c1,c2,w,h".
+        """
 
-        return coord_string
+        if not coords:
+            raise ValueError('No baseline found')
+        # box from first to last point of the baseline, see coordinates.baseline_boxes()
+        return coordinates.baseline_boxes(coords[-1:], self.iiif_scale_factor)[0]
         
     def coords_text_region(self, root, xpath):
         """ 
@@ -278,70 +304,43 @@ class ManuscriptToProcess:
         are in the format "x,y,width,height".
 
         :param root: The root of the PAGE XML document.
-        :param xpath: The XPath query to find the points.
+        :param xpath: The XPath query to find the points (string or compiled query, see xpaths.py).
         :return: The bounding box coordinates as a string in the format "x,y,width,height".
         """
 
-        # scaling factor for coordinates
-        x = float(self.iiif_scale_factor)
-
         # fetch coordinates using XPath query from the PAGE XML document root
-        coords = root.xpath(xpath,
-                            namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-
-        # iterate over all coordinate sets found
-        for i in coords:
-            # initialize lists to store x and y coordinates
-            coords_list_left = []
-            coords_list_right = []
-
-            # split the coordinates by space (expected format is "x1,y1 x2,y2 ... xn,yn")
-            coord = i.split(' ')
-
-            for e in coord:
-                # split each coordinate by comma into x and y values and append to respective lists
-                e = e.split(',')
-                coords_list_left.append(int(e[0]))
-                coords_list_right.append(int(e[1]))
-
-        # calculate the bounding box coordinates
-        c1 = int(min(coords_list_left) * x)  # leftmost x-coordinate, scaled by x
-        w = max(coords_list_left)  # width of the bounding box, scaled by x and adjusted for padding
-        w = int(w * x)
-        w = w - c1
-        w = w + 30
-        c2 = min(coords_list_right)  # topmost y-coordinate, scaled by x and adjusted for padding
-        c2 = int(c2 * x)
-        h = max(coords_list_right)  # height of the bounding box, scaled by x and adjusted for padding
-        h = int(h * x)
-        h = h - c2
-        h = h + 30
-        c2 = c2 - 30
-
-        # format the calculated values into a string "c1,c2,w,h"
-        coord_string = str(c1) + ',' + str(c2) + ',' + str(w) + ',' + str(h)
-
-        return coord_string
-
-    def create_tei_fw_head(self, root):
+        coords = xpath(root) if callable(xpath) else root.xpath(xpath, namespaces=xpaths.namespaces)
+
+        return self.coords_text_region_from_points(coords)
+
+    def coords_text_region_from_points(self, coords):
+        """
+        Calculates the bounding box of a text region as described in coords_text_region() from its points.
+
+        :param coords: List of point strings ("x1,y1 x2,y2 ... xn,yn"), the last one is used
+        :return: The bounding box coordinates as a string in the format "x,y,width,height".
+        """
+
+        if not coords:
+            raise ValueError('No coordinates found')
+        # bounding box with padding of 30 to the top, width and height, see coordinates.bounding_boxes()
+        return coordinates.bounding_boxes(coords[-1:], self.iiif_scale_factor, padding=30)[0]
+
+    def create_tei_fw_head(self, page):
         """ create tei:fw for header
         Creates tei:fw element including header if available from pageXML.
-        :param root: Takes root from etree
+        :param page: Takes text regions of page as returned by transpy.read_page_regions()
         :return text_header: Returns tei:fw element as string
         """
 
         try:
-            header_list = root.xpath('//ns0:TextRegion[contains(@type,"header")]',
-                                namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+            header_list = page_model.find_text_regions(page, region_type='header')
             if header_list:
                 header = header_list[0]
             else:
-                header = root.xpath('//ns0:TextRegion[contains(@custom,"type:header")]',
-                                    namespaces={
-                                        'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-            unicode_header = header.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            coords_header = self.coords_baseline(header, './/ns0:TextLine//ns0:Baseline/@points')
+                header = page_model.find_text_regions(page, custom_type='header')[0]
+            unicode_header = header.text
+            coords_header = self.coords_baseline_from_points(header.baselines)
             text_header = f'\n<fw type="page-header" place="top" facs="{coords_header}">{unicode_header[0]}</fw>'
 
         except Exception as e:
@@ -350,61 +349,51 @@ class ManuscriptToProcess:
 
         return text_header
 
-    def create_column(self, root, column_name, column_a_b):
+    def create_column(self, page, column_name, column_a_b):
         """ creates text of column 1 from pageXML
 
         Creates text of column one including tei:lb elements as well as coordinates stored in tei:@facs from pageXML.
 
-        :param root: Takes root from etree
+        :param page: Takes text regions of page as returned by transpy.read_page_regions()
         :param column_name: specifies column name as 'column_1' or 'column_2'
         :param column_a_b: specifies column 'a' or 'b' for proper tei:cb
         :return text_column_1: Returns text of column 1 element as string
         """
 
         try:
-            column = root.xpath(f'//ns0:TextRegion[contains(@custom,"type:{column_name}")]',
-                                namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[
-                0]
-            coords_column = self.coords_text_region(column, './ns0:Coords/@points')
-            # create column with coordinates
-            text_column = f'<cb n="{column_a_b}" facs="{coords_column}"/>'
-
-            # lines in column
-            unicode_column = column.xpath('.//ns0:TextLine', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            line_number = 0
-            for line in unicode_column:
-                line_text = line.xpath('./ns0:TextEquiv/ns0:Unicode/text()', namespaces={
-                    'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-                line_coords = self.coords_text_region(line, './ns0:Coords/@points')
-                line_number += 1
-                text_column = f'{text_column}\n<lb n="{line_number}" facs="{line_coords}"/>{line_text[0]}'
+            column = page_model.find_text_regions(page, custom_type=column_name)[0]
+            coords_column = self.coords_text_region_from_points(column.coords)
+            # create column with coordinates, lines are collected and joined once
+            column_parts = [f'<cb n="{column_a_b}" facs="{coords_column}"/>']
+
+            # lines in column, coordinates of all lines are calculated at once
+            lines_coords = coordinates.bounding_boxes([line.coords[-1] for line in column.lines],
+                                                      self.iiif_scale_factor, padding=30)
+            for line_number, (line, line_coords) in enumerate(zip(column.lines, lines_coords), start=1):
+                column_parts.append(f'<lb n="{line_number}" facs="{line_coords}"/>{line.text[0]}')
+            text_column = '\n'.join(column_parts)
         except Exception as e:
             print(str(e) + f'===>Textpage {column_name} wrong.')
             text_column = f'\n<cb n="{column_a_b}"/>'
         return text_column
 
-    def create_tei_fw_foot(self, root):
+    def create_tei_fw_foot(self, page):
         """ create tei:fw for footer
 
         Creates tei:fw element including footer if available from pageXML.
 
-        :param root: Takes root from etree
+        :param page: Takes text regions of page as returned by transpy.read_page_regions()
         :return text_footer: Returns tei:fw element as string
         """
 
         try:
-            footer_list = root.xpath('//ns0:TextRegion[contains(@type,"footer")]',
-                                     namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+            footer_list = page_model.find_text_regions(page, region_type='footer')
             if footer_list:
                 footer = footer_list[0]
             else:
-                footer = root.xpath('//ns0:TextRegion[contains(@custom,"type:footer")]',
-                                    namespaces={'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[
-                    0]
-            unicode_footer = footer.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            coords_footer = self.coords_baseline(footer, './/ns0:TextLine//ns0:Baseline/@points')
+                footer = page_model.find_text_regions(page, custom_type='footer')[0]
+            unicode_footer = footer.text
+            coords_footer = self.coords_baseline_from_points(footer.baselines)
             text_footer = \
                 f'\n<fw type="quire-numeral" place="bottom" facs="{coords_footer[0]}">{unicode_footer[0]}</fw>'
         except Exception as e:
@@ -413,17 +402,12 @@ class ManuscriptToProcess:
 
         return text_footer
 
-    def store_toc_label_for_later_replacement(self, root):
-        for chapter_number_toc in root.xpath('//ns0:TextRegion[contains(@custom,"type:chapter_count")]', namespaces={
-            'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}):
+    def store_toc_label_for_later_replacement(self, page):
+        for chapter_number_toc in page_model.find_text_regions(page, custom_type='chapter_count'):
             # create label element
-            chapter_number_toc_text = chapter_number_toc.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()',
-                                                               namespaces={
-                                                                   'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[
-                0]
-            coords_label_toc_a = chapter_number_toc.xpath('./ns0:Coords/@points', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            coords_label_toc_b = self.coords_text_region(chapter_number_toc, './ns0:Coords/@points')
+            chapter_number_toc_text = chapter_number_toc.text[0]
+            coords_label_toc_a = chapter_number_toc.coords
+            coords_label_toc_b = self.coords_text_region_from_points(chapter_number_toc.coords)
 
             side = self.identify_placement_of_element(coords_label_toc_a)
             replace_key = re.search(r'~(\d+)~', chapter_number_toc_text)
@@ -436,23 +420,18 @@ class ManuscriptToProcess:
             list_item = [div_number, replace_key, label_toc]
             self.toc_label_for_later_replacement.append(list_item)
 
-    def store_label_for_later_replacement(self, root):
-        for chapter_number in root.xpath('//ns0:TextRegion[contains(@custom,"type:chapter_count")]', namespaces={
-            'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}):
+    def store_label_for_later_replacement(self, page):
+        for chapter_number in page_model.find_text_regions(page, custom_type='chapter_count'):
             try:
-                chapter_number_text = chapter_number.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()',
-                                                           namespaces={
-                                                               'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[
-                    0]
+                chapter_number_text = chapter_number.text[0]
 
                 # todo
                 '''match_chapter_number_wrong = re.match(r"(?<!^)\*(\d{1,3})\*", chapter_number_text)
                 if match_chapter_number_wrong:
                     print("test", chapter_number_text)'''
 
-                coords_label_a = chapter_number.xpath('./ns0:Coords/@points', namespaces={
-                    'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-                coords_label_b = self.coords_text_region(chapter_number, './ns0:Coords/@points')
+                coords_label_a = chapter_number.coords
+                coords_label_b = self.coords_text_region_from_points(chapter_number.coords)
 
                 side = self.identify_placement_of_element(coords_label_a)
                 replace_key = re.search(r'\*(\d+)\*', chapter_number_text)
@@ -468,7 +447,7 @@ class ManuscriptToProcess:
             except Exception as e:
                 print(str(e) + '>>>Error with label<<<')
 
-    def store_interrogation_label_for_later_replacement(self, root):
+    def store_interrogation_label_for_later_replacement(self, page):
         """
         Stores the information about interrogation labels for later replacement.
 
@@ -478,17 +457,14 @@ class ManuscriptToProcess:
         it retrieves the coordinates of the label and stores the information 
         for later replacement in the XML.
 
-        :param root: The root element of the PAGE XML document.
+        :param page: The text regions of the page as returned by transpy.read_page_regions().
         """
-        for chapter_number in root.xpath('//ns0:TextRegion[contains(@custom,"type:chapter_count")]', namespaces={
-            'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}):
-            chapter_number_text = chapter_number.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
+        for chapter_number in page_model.find_text_regions(page, custom_type='chapter_count'):
+            chapter_number_text = chapter_number.text[0]
             try:
                 if '*i' in chapter_number_text:
-                    coords_label_a = chapter_number.xpath('./ns0:Coords/@points', namespaces={
-                        'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-                    coords_label_b = self.coords_text_region(chapter_number, './ns0:Coords/@points')
+                    coords_label_a = chapter_number.coords
+                    coords_label_b = self.coords_text_region_from_points(chapter_number.coords)
 
                     side = self.identify_placement_of_element(coords_label_a)
                     replace_key = re.search(r'\*i(\d+)\*', chapter_number_text)
@@ -503,7 +479,7 @@ class ManuscriptToProcess:
             except Exception as e:
                 print(f"{e} >>>Interrogation<<<")
 
-    def store_inscription_for_later_replacement(self, root):
+    def store_inscription_for_later_replacement(self, page):
         """
         Stores the information about inscriptions for later replacement.
 
@@ -513,18 +489,15 @@ class ManuscriptToProcess:
         corresponding XML element to represent the inscription. The information
         is then stored for later replacement in the XML.
 
-        :param root: The root element of the PAGE XML document.
+        :param page: The text regions of the page as returned by transpy.read_page_regions().
         """
-        for inskription in root.xpath('//ns0:TextRegion[contains(@custom,"type:Inskription")]', namespaces={
-            'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}):
+        for inskription in page_model.find_text_regions(page, custom_type='Inskription'):
             inskription_text = ''
-            for line in inskription.xpath('.//ns0:TextLine/ns0:TextEquiv/ns0:Unicode/text()', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}):
+            for line in inskription.text:
                 inskription_text = f"{inskription_text} {line}"
 
-            coords_inskription_a = inskription.xpath('./ns0:Coords/@points', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            coords_inskription_b = self.coords_text_region(inskription, './ns0:Coords/@points')
+            coords_inskription_a = inskription.coords
+            coords_inskription_b = self.coords_text_region_from_points(inskription.coords)
             side = self.identify_placement_of_element(coords_inskription_a)
 
             inskription_xml = f'</hi></head>\n<note type="inscription" place="margin {side}" anchored="false" facs="{coords_inskription_b}">{inskription_text}</note>'
@@ -537,7 +510,96 @@ class ManuscriptToProcess:
             replace_text = f'{inskription_xml}\n<p n="1"><hi rend="color:red initial">'
             self.inscriptions_to_replace.append([replace_text, text_to_be_replaced, replace_key])
 
-    def create_tei_from_pagexml(self):
+    def page_positions(self):
+        """
+        Precomputes folio number and IIIF image id of every PAGE XML file.
+
+        Starting from 'start_folio' and 'iiif_image_id', the folio is incremented and the image id is increased by one
+        for every page, as done during conversion. The instance variables are not changed.
+
+        :return: List of tuples (folio, iiif_image_id) in the order of 'path_to_pagexml_files'
+        """
+
+        start_folio, iiif_image_id = self.start_folio, self.iiif_image_id
+        positions = []
+        for _ in self.path_to_pagexml_files:
+            positions.append((self.start_folio, self.iiif_image_id))
+            self.increment_folia()
+            self.iiif_image_id += 1
+        self.start_folio, self.iiif_image_id = start_folio, iiif_image_id
+        return positions
+
+    def convert_page(self, filename, folio, iiif_image_id, page_attributes=None):
+        """
+        Converts a single PAGE XML file into a TEI fragment.
+
+        The page only depends on its folio number and IIIF image id, so pages can be converted independently of each
+        other, e.g. in worker processes. Labels and inscriptions found on the page are returned instead of being
+        collected in the instance variables.
+
+        :param filename: Path to PAGE XML file or transpy.ZipPage
+        :param folio: Folio number of the page, e.g. '139v'
+        :param iiif_image_id: IIIF image id of the page
+        :param page_attributes: Dictionary of facs_url, corresp and ana of the page as rendered by
+            url_templates.render_page_attributes(), rendered from the templates of the manuscript if None
+        :return: Tuple of TEI fragment as string and lists of toc labels, labels, interrogation labels and inscriptions
+        """
+
+        # read text regions of the page in a single pass
+        page = transpy.read_page_regions(filename)
+
+        # set page position
+        self.start_folio = folio
+        self.iiif_image_id = iiif_image_id
+        # collect labels and inscriptions of this page only
+        self.toc_label_for_later_replacement = []
+        self.label_for_later_replacement = []
+        self.interrogation_label_for_later_replacement = []
+        self.inscriptions_to_replace = []
+
+        # creates page beginning for each xml-pagefile using templates taken from config file
+        if page_attributes is None:
+            page_attributes = {name: template.render(folio, iiif_image_id)
+                               for name, template in self.page_templates.items()}
+        page_break = f'\n<pb n="{self.start_folio}" facs="{page_attributes["facs_url"]}" ' \
+                     f'corresp="{page_attributes["corresp"]}" ana="{page_attributes["ana"]}"/> '
+        # adds tei:fw if header exists on page
+        text_header = self.create_tei_fw_head(page)
+        # creates text of column 1 from lines
+        text_column_1 = self.create_column(page, 'column_1', 'a')
+        # creates text of column 2 from lines
+        text_column_2 = self.create_column(page, 'column_2', 'b')
+        # creates tei:fw footer element
+        text_footer = self.create_tei_fw_foot(page)
+        # create page
+        text_page = f"{page_break}{text_header}\n{text_column_1}\n{text_column_2}\n{text_footer}"
+
+        # create list of toc_labels for later replacement
+        try:
+            self.store_toc_label_for_later_replacement(page)
+        except:
+            pass
+        # create list of labels for later replacement
+        try:
+            self.store_label_for_later_replacement(page)
+        except Exception as e:
+            print(e)
+        # create list of interrogation labels for later replacement
+        try:
+            self.store_interrogation_label_for_later_replacement(page)
+
+        except:
+            pass
+        # create list of inscriptions for later replacment
+        try:
+            self.store_inscription_for_later_replacement(page)
+        except:
+            pass
+
+        return (text_page, self.toc_label_for_later_replacement, self.label_for_later_replacement,
+                self.interrogation_label_for_later_replacement, self.inscriptions_to_replace)
+
+    def create_tei_from_pagexml(self, jobs=1, cache=None):
         """
         Creates TEI representation from the extracted text in the PAGE XML files.
 
@@ -545,65 +607,95 @@ class ManuscriptToProcess:
         It constructs the TEI representation by combining the extracted text and applying certain
         replacements and transformations. The TEI representation is stored in the 'bdd_tei_text' attribute of the object.
 
+        Pages are converted independently (see convert_page()), in a pool of worker processes if jobs is greater
+        than 1. Fragments, labels and inscriptions are collected in page order, so the result does not depend on jobs.
+        If a cache is given, only pages missing in the cache are converted.
+
+        :param jobs: Number of worker processes, pages are converted in this process if 1
+        :param cache: PageCache (see page_cache.py) for reusing pages of earlier runs or None
         """
-        text_page = ""
-        # open each pagexml-file for exporting text to tei
-        for filename in self.path_to_pagexml_files:
-            tree = LET.parse(filename)
-            root = tree.getroot()
-
-            # creates page beginning for each xml-pagefile using data taken from config file
-            page_break = f'\n<pb n="{self.start_folio}" facs="{eval(self.facs_url)}" corresp="{eval(self.corresp)}" ' \
-                         f'ana="{eval(self.ana)}"/> '
-            # adds tei:fw if header exists on page
-            text_header = self.create_tei_fw_head(root)
-            # creates text of column 1 from lines
-            text_column_1 = self.create_column(root, 'column_1', 'a')
-            # creates text of column 2 from lines
-            text_column_2 = self.create_column(root, 'column_2', 'b')
-            # creates tei:fw footer element
-            text_footer = self.create_tei_fw_foot(root)
-            # create page
-            text_page = f"{text_page}{page_break}{text_header}\n{text_column_1}\n{text_column_2}\n{text_footer}"
-
-            # create list of toc_labels for later replacement
-            try:
-                self.store_toc_label_for_later_replacement(root)
-            except:
-                pass
-            # create list of labels for later replacement
-            try:
-                self.store_label_for_later_replacement(root)
-            except Exception as e:
-                print(e)
-            # create list of interrogation labels for later replacement
-            try:
-                self.store_interrogation_label_for_later_replacement(root)
 
-            except:
-                pass
-            # create list of inscriptions for later replacment
-            try:
-                self.store_inscription_for_later_replacement(root)
-            except:
-                pass
-
-            # test pagexml for certain elements and replace with corresponding tei
-            elements_to_be_tested = [['~i~', r'~i~(.*?)~',
-                                      f'<!-- Beginn Inhaltsverzeichnis -->\n<div type="toc" xml:id="{self.tei_base_id_book}-toc">\n<head type="incipit"><hi rend="color:red capitals">\g<1></hi></head>\n<list>\n~'],
-                                     ['*i*', r'\*i\*(.*?)\*p\*',
-                                      f'</list>\n</div>\n<!-- Beginn des Haupttextes  -->\n<div type="content" xml:id="{self.tei_base_id_book}-con">\n<div xml:id="{self.tei_base_id_book}-con-000" type="praefatiuncula">\n<head type="incipit"><hi rend="color:red capitals">\g<1></hi></head><p n="1"><hi rend="color:red">'],
-                                     ['#p#', '#p#', '</hi></p>\n</div>']]
-            for element in elements_to_be_tested:
-                if element[0] in text_page:
-                    text_page = re.sub(element[1], element[2], text_page, flags=re.DOTALL)
-
-            # increase folio number and iiif_image_id
+        positions = self.page_positions()
+        pages = [None] * len(positions)
+
+        # load unchanged pages from cache
+        if cache is not None:
+            keys = [cache.key(transpy.read_pagexml(filename), folio, iiif_image_id)
+                    for filename, (folio, iiif_image_id) in zip(self.path_to_pagexml_files, positions)]
+            pages = [cache.load(key) for key in keys]
+        missing = [number for number, page in enumerate(pages) if page is None]
+        missing_filenames = [self.path_to_pagexml_files[number] for number in missing]
+        # render facs, corresp and ana of all pages at once
+        page_attributes = url_templates.render_page_attributes(self.sigla, [positions[number] for number in missing])
+        missing_positions = [positions[number] + (attributes,) for number, attributes in zip(missing, page_attributes)]
+
+        # convert remaining pages
+        if jobs > 1 and len(missing) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_page_worker,
+                                                        initargs=(self,)) as executor:
+                converted_pages = list(executor.map(convert_page_in_worker, missing_filenames, missing_positions,
+                                                    chunksize=max(1, len(missing) // (jobs * 4))))
+        else:
+            converted_pages = [self.convert_page(filename, *position)
+                               for filename, position in zip(missing_filenames, missing_positions)]
+        for number, page in zip(missing, converted_pages):
+            pages[number] = page
+            if cache is not None:
+                cache.save(keys[number], page)
+        if cache is not None:
+            print(f'Page cache: {len(pages) - len(missing)} of {len(pages)} pages reused, {len(missing)} converted.')
+
+        # collect labels and inscriptions in page order
+        self.toc_label_for_later_replacement = []
+        self.label_for_later_replacement = []
+        self.interrogation_label_for_later_replacement = []
+        self.inscriptions_to_replace = []
+        for _, toc_labels, labels, interrogation_labels, inscriptions in pages:
+            self.toc_label_for_later_replacement.extend(toc_labels)
+            self.label_for_later_replacement.extend(labels)
+            self.interrogation_label_for_later_replacement.extend(interrogation_labels)
+            self.inscriptions_to_replace.extend(inscriptions)
+
+        # join pages once
+        text_page = ''.join(page[0] for page in pages)
+
+        # test pagexml for certain elements and replace with corresponding tei
+        # (applied once to the whole text, as markers may span pages)
+        elements_to_be_tested = [['~i~', r'~i~(.*?)~',
+                                  f'<!-- Beginn Inhaltsverzeichnis -->\n<div type="toc" xml:id="{self.tei_base_id_book}-toc">\n<head type="incipit"><hi rend="color:red capitals">\g<1></hi></head>\n<list>\n~'],
+                                 ['*i*', r'\*i\*(.*?)\*p\*',
+                                  f'</list>\n</div>\n<!-- Beginn des Haupttextes  -->\n<div type="content" xml:id="{self.tei_base_id_book}-con">\n<div xml:id="{self.tei_base_id_book}-con-000" type="praefatiuncula">\n<head type="incipit"><hi rend="color:red capitals">\g<1></hi></head><p n="1"><hi rend="color:red">'],
+                                 ['#p#', '#p#', '</hi></p>\n</div>']]
+        for element in elements_to_be_tested:
+            if element[0] in text_page:
+                text_page = re.sub(element[1], element[2], text_page, flags=re.DOTALL)
+
+        # increase folio number and iiif_image_id beyond the last page
+        if positions:
+            self.start_folio, self.iiif_image_id = positions[-1]
             self.increment_folia()
             self.iiif_image_id += 1
 
         self.bdd_tei_text = text_page
 
+
+# manuscript used by worker processes of create_tei_from_pagexml
+page_worker_manuscript = None
+
+
+def init_page_worker(manuscript):
+    """ Stores a copy of the manuscript once per worker process """
+
+    global page_worker_manuscript
+    page_worker_manuscript = manuscript
+
+
+def convert_page_in_worker(filename, position):
+    """ Converts a page in a worker process, see ManuscriptToProcess.convert_page() """
+
+    return page_worker_manuscript.convert_page(filename, *position)
+
+
 class BddTei:
     """
     A class for transforming PAGE XML files to TEI format according to BDD schematics.
@@ -615,9 +707,13 @@ class BddTei:
         label_for_later_replacement (list): A list of chapter labels for later replacement.
         inscriptions_to_replace (list): A list of inscriptions to replace.
         tei_base_id_book (str): The base ID of the TEI book.
+        delspans (dict): The tei:delSpan elements numbered so far and their replacements.
+        delspan_number (int): The number of the next tei:delSpan element.
+        seg_number (int): The number of the next tei:seg element.
 
     Methods:
         bdd_export_tei(): Transforms the PAGE XML as a single TEI file according to BDD schematics.
+        remove_placeholders(): Removes the placeholders remaining after the labels have been inserted.
         sc_to_g(): Replaces special characters in the TEI representation.
         bdd_specific_tei(): Modifies specific elements in the TEI representation according to BDD requirements.
         line_breaks_angled_dash(): Adjusts line breaks in the TEI representation using manually inserted '¬' character.
@@ -640,6 +736,10 @@ class BddTei:
         self.label_for_later_replacement = manuscript.label_for_later_replacement
         self.inscriptions_to_replace = manuscript.inscriptions_to_replace
         self.tei_base_id_book = manuscript.tei_base_id_book
+        # delSpan and seg are numbered across calls of bdd_specific_tei(), e.g. for the chunks of streaming.py
+        self.delspans = {}
+        self.delspan_number = 1
+        self.seg_number = 1
 
     def bdd_export_tei(self):
         """
@@ -655,72 +755,20 @@ class BddTei:
 
         """
 
-        # Insert label TOC
-        for element in self.toc_label_for_later_replacement:
-            if int(element[0]) == 1:
-                # treat first element differently
-                self.tei = re.sub(r'\n(<lb.*?/>)(</hi></head>\n)<list>\n~1~(\w)',
-                                  r'\g<2>\g<1><list>' + element[2].replace(element[1], '') + r'\g<3></hi>', self.tei)
-            else:
-                elmt = re.findall(f'\n(<lb.*?/>){element[1]}(\w)', self.tei)
-                if elmt:
-                    self.tei = re.sub(f'\n(<lb.*?/>){element[1]}(\w)',
-                                  r'</item>\n\g<1>' + element[2].replace(element[1], '') + r'\g<2></hi>', self.tei)
-                else: #for chapter titles that are on the same line
-                    self.tei = re.sub(f'{element[1]}(\w)',
-                                r'</item>\n' + element[2].replace(element[1], '') + r'\g<1></hi>', self.tei)
-
-        # Insert label interrogation
-        for element in self.interrogation_label_for_later_replacement:
-            # print(element[0])
-            if int(element[0]) == 1:
-                # treat first element differently
-
-                self.tei = re.sub(r'\*i' + element[0] + r'\*~(\w)',
-                                  '</p>' + element[2].replace(element[1], '') + r'\g<1></hi>', self.tei)
-            else:
-                self.tei = re.sub(r'\*i' + element[0] + r'\*~(\w)',
-                                  '</p></div>' + element[2].replace(element[1], '') + r'\g<1></hi>', self.tei)
-
-
-        if len(self.interrogation_label_for_later_replacement) == 0:
-            replace_keys = re.findall(r'\*i\d+\*', self.tei)
-            # print("found_keys", replace_keys)
-            for r_k in replace_keys:
-                div_number = r_k.replace('*', '')
-                div_number = div_number.replace('i', '')
-                label = f'<div n="{div_number}" type="interrogation"><p n="1"><hi rend="color:red">'
-                if int(div_number)==1:
-                    self.tei = re.sub(r'\*i' + div_number + r'\*',
-                                  label + '</hi>', self.tei)
-                else:
-                    self.tei = re.sub(r'\*i' + div_number + r'\*',
-                                      '</p></div>\n' + label + '</hi>', self.tei)
-
-        # Insert label chapter
-        for element in self.label_for_later_replacement:
-            # print(element[1])
-            if int(element[0]) == 1:
-                # treat first element differently
-                self.tei = re.sub(r'\*' + element[0] + r'\*', element[2].replace(element[1], ''), self.tei)
-            else:
-                self.tei = re.sub(r'\*' + element[0] + r'\*', '</p>\n</div>\n' + element[2].replace(element[1], ''),
-                                  self.tei)
-
-        for element in self.inscriptions_to_replace:
-            if 'i1' in element[0]:
-                # interrogationes start with inscription instead of interrogation number
-                element[0] = element[0].replace('</hi></head>\n', '')
-                element[0] = element[0].replace('\n<p n="1"><hi rend="color:red initial">', '')
-
-                self.tei = re.sub(r'\*i1\*(.*?)~(\w)',
-                                  '</p>\n<div n="1" type="interrogation"><head type="chapter-title"><hi '
-                                  r'rend="color:red">\g<1></hi></head>\n' +
-                                  element[0].replace('*i1*', '') + r'<p n="1"><hi rend="color:red">\g<2></hi>',
-                                  self.tei, flags=re.DOTALL)
-            else:
-                self.tei = re.sub('(' + element[1] + '.*?)~', r'\g<1>' + element[0].replace(element[2], '') + '~',
-                                  self.tei, flags=re.DOTALL)
+        # insert labels of TOC, interrogations and chapters and inscriptions in a single scan (see placeholders.py)
+        self.tei = placeholders.resolve_placeholders(self.tei, self.toc_label_for_later_replacement,
+                                                     self.interrogation_label_for_later_replacement,
+                                                     self.label_for_later_replacement, self.inscriptions_to_replace)
+        self.remove_placeholders()
+
+    def remove_placeholders(self):
+        """
+        Removes the placeholders remaining after the labels have been inserted and closes the items of the TOC.
+
+        Note:
+        - This method modifies the 'tei' attribute of the ManuscriptToProcess instance.
+
+        """
 
         self.tei = self.tei.replace('</item></item>', '</item>')
         self.tei = self.tei.replace('</list>', '</item></list>')
@@ -734,7 +782,8 @@ class BddTei:
         Replaces special characters in the TEI representation.
 
         This method replaces special characters from a list provided in the config file. Each character is replaced 
-        with its corresponding replacement value.
+        with its corresponding replacement value. All characters are replaced in a single pass (see
+        character_translator).
 
         Note:
         - This method modifies the 'tei' attribute of the ManuscriptToProcess instance.
@@ -742,8 +791,7 @@ class BddTei:
         """
 
         # replace special characters from list in config file...
-        for character in config.character_list:
-            self.tei = self.tei.replace(character[1], character[0])
+        self.tei = character_translator.apply(self.tei)
 
     def bdd_specific_tei(self):
         """
@@ -763,40 +811,25 @@ class BddTei:
         - This method modifies the 'tei' attribute of the ManuscriptToProcess instance.
 
         """
-        # <add> used in Transkribus to show inline additions
-        self.tei = self.tei.replace('<add>', '<add place="above" type="contemporary">')
-
-        # unclear
-        self.tei = self.tei.replace('...',
-                                    '<unclear reason="tight-binding" resp="Transkribus" cert="low">...</unclear>')
-
-        # editorial comment
-        self.tei = self.tei.replace('[', '<note type="editorial-comment" resp="transkribus">')
-        self.tei = self.tei.replace(']', '</note>')
-        self.tei = self.tei.replace('<note>', '<note type="editorial-comment" resp="transkribus">')
-
-        # del
-        self.tei = self.tei.replace('<del>', '<del rend="">')
-
-        # subst
-        self.tei = self.tei.replace('<subst>', '<subst><del rend="erasure"/><add place="" type="">')
-        self.tei = self.tei.replace('</subst>', '</add></subst>')
+        # add, unclear, editorial comment, del and subst in a single pass (see bdd_specific_translator)
+        self.tei = bdd_specific_translator.apply(self.tei)
 
         # delspan
         # seg
-        n = 1
         for i in re.findall('<delSpan>.*?</delSpan>', self.tei, re.DOTALL):
             print(i)
-            id = f"{self.tei_base_id_book}-delSpan-{str(n).zfill(3)}"
-            seg_text = i.replace('<delSpan>', f'<delSpan spanTo="#{id}" rend=""/>').replace('</delSpan>', f'<anchor xml:id="{id}"/>')
-            self.tei = self.tei.replace(i, seg_text)
-            n += 1
+            # identical delSpan elements keep the id of the first one
+            if i not in self.delspans:
+                id = f"{self.tei_base_id_book}-delSpan-{str(self.delspan_number).zfill(3)}"
+                self.delspans[i] = i.replace('<delSpan>', f'<delSpan spanTo="#{id}" rend=""/>').replace(
+                    '</delSpan>', f'<anchor xml:id="{id}"/>')
+            self.tei = self.tei.replace(i, self.delspans[i])
+            self.delspan_number += 1
 
         # seg
-        n = 1
         for i in re.findall('<seg>.*?</seg>', self.tei):
             #print(i)
-            id = f"{self.tei_base_id_book}-supp-{str(n).zfill(3)}"
+            id = f"{self.tei_base_id_book}-supp-{str(self.seg_number).zfill(3)}"
             seg_text = i.replace('<seg>', '').replace('</seg>', '')
             supplied = i.replace('<seg>', f'<supplied xml:id="{id}" reason="displaced-over-the-line">').replace(
                 '</seg>', '</supplied>').replace('', '')
@@ -804,7 +837,7 @@ class BddTei:
             self.tei = self.tei.replace(i, f'<seg corresp="#{id}" type="pos-of-displaced">{seg_text}§</seg>{supplied}',
                                         1)
             print(supplied)
-            n += 1
+            self.seg_number += 1
 
         self.tei = self.tei.replace('§', '')
 
@@ -831,12 +864,8 @@ class BddTei:
         """ preprocessing before expansion of abbreviations
 
         """
-        # replace pre character
-        self.tei = self.tei.replace('\ue665', 'p\u0304')
-        # replace wrong -tur sign
-        self.tei = self.tei.replace('\u1dd1', '\uf1c2')
-        # make sure, -ur ligatur has not been put behind interpunctuation
-        self.tei = self.tei.replace('', '')
+        # replace pre character and wrong -tur sign, move -ur ligature before interpunctuation
+        self.tei = preprocessing_translator.apply(self.tei)
 
     def postprocessing(self):
         """
@@ -852,83 +881,104 @@ class BddTei:
 
         """
 
-        # check, if </p> element is wrongly inserted in choice element:
-        for choice_element in re.findall('<choice>.*?</p>.*?</choice>', self.tei):
-            if '<p ' not in choice_element:
-                replacement = re.sub('</p>', r'', choice_element)
-                self.tei = re.sub(choice_element, replacement + '</p>', self.tei)
-
-        # check, if </hi> element is wrongly inserted in choice element:
-        for choice_element in re.findall('<choice>.*?</hi>.*?</choice>', self.tei):
-            if '<hi ' not in choice_element:
-                replacement = re.sub('</hi>', r'', choice_element)
-                self.tei = re.sub(choice_element, replacement + '</hi>', self.tei)
-
-        self.tei = re.sub(
-            '<choice><abbr><choice><abbr><p n="1"><hi rend="color:red">I</hi>nterrogandū</abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice></abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice>',
-            '<choice><abbr><p n="1"><hi rend="color:red">I</hi>nterrogandū</abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice>',
-            self.tei)
-        self.tei = re.sub(
-            '(type="chapter"><head type="chapter-title"><label type="chapter-number" .*?</hi></label> )<choice><abbr><hi rend="color:red">',
-            '\g<1><hi rend="color:red"><choice><abbr>', self.tei, flags=re.DOTALL)
-        self.tei = re.sub(
-            '(type="chapter"><head type="chapter-title"><label type="chapter-number" .*?</hi></label> <hi rend="color:red"><choice><abbr>.*?<expan>)<hi rend="color:red">',
-            '\g<1>', self.tei, flags=re.DOTALL)
-        self.tei = re.sub('(\n\n<pb.*?/>\n<fw.*?>\n<cb n="a".*?/>\n<lb.*?/>)</hi></head>', '</hi></head>\g<1>',
-                          self.tei)
-        self.tei = re.sub('(\n<cb n="b".*?/>\n<lb.*?/>)</hi></head>', '</hi></head>\g<1>', self.tei)
-        self.tei = re.sub('(\n<lb.*?/>)</hi></head>', '</hi></head>\g<1>', self.tei)
-
-         # correction generic cases
-        xml_to_be_corrected = ['lb ', 'add', 'p', 'hi></label', 'item', 'note', 'fw']
-
-        for i in xml_to_be_corrected:
-            self.tei = re.sub(
-                '(<choice><abbr>)(<' + i + '.*?>)(.*?</abbr><expan>)(<' + i + '.*?>)(.*?</expan></choice>)',
-                r'\g<2>\g<1>\g<3>\g<5>', self.tei)
-            self.tei = re.sub(
-                '(<choice><abbr>.*?)</' + i + '>(</abbr><expan>.*?)</' + i + '>(.*?</expan></choice>)',
-                r'\g<1>\g<2>\g<3></' + i + '>', self.tei)
-
-        # correction of ambigue expansions
-        # Capitula in fw
-        self.tei = re.sub('(<fw.*?><choice><abbr>Cap<g ref="#char-0305">&#x0305;</g></abbr><expan>)Capitulum(</expan></choice>.*?</fw>)',
-                          '\g<1>Capitula\g<2>', self.tei, flags=re.IGNORECASE)
-        # Cap in fw ohne Auflösung
-        #self.tei = re.sub('(<fw.*?>)Cap<g ref="#char-0305">&#x0305;</g>(.*?</fw>)',
-        #                  '\g<1><choice><abbr>Cap<g ref="#char-0305">&#x0305;</g></abbr><expan>Capitula</expan></choice>\g<2>', self.tei, flags=re.IGNORECASE)
-        # Ex concilio
-        self.tei = re.sub('(<note type="inscription".*?>Ex <choice>.*?<expan>)concilium(</expan>)',
-                          '\g<1>concilio\g<2>', self.tei)
-        # Ex eodem capitulo
-        self.tei = re.sub('(<note type="inscription".*?>Ex eodem <choice>.*?<expan>)Capitula(<)', '\g<1>Capitulo\g<2>',
-                          self.tei)
-
-        # correction of linebreaks
-        self.tei = re.sub('¬\n(<pb.*?<lb .*?)(/>)', '\g<1> break="no"\g<2>', self.tei, flags=re.DOTALL)
-        # Bei <hi>Q</hi> kommt <hi>Qu</hi>. EInsetzen um ein Buchstaben verrückt, aber nur bei Wörtern mit Q?
-        self.tei = re.sub('¬\n(<pb.*?<lb .*?)(/>)', '\g<1> break="no"\g<2>', self.tei, flags=re.DOTALL)
-        self.tei = re.sub(
-            '<choice><abbr><fw type="page-header" place="top" facs="638,58,210,100"><choice><abbr>Cap̅</abbr><expan>Capitula</expan></choice></abbr><expan><fw type="page-header" place="top" facs="638,58,210,100">Capitulum</expan></choice>',
-            '<fw type="page-header" place="top" facs="638,58,210,100"><choice><abbr>Cap̅</abbr><expan>Capitula</expan></choice>',
-            self.tei)
-        # text_page = re.sub('<choice><abbr>earu<g ref="#char-0304">\u0304</g><add place="above" type="contemporary">roru<g ref="#char-0304">\u0304</g></abbr><expan>earumr<add place="above" type="contemporary">orum</expan></choice></add>','<choice><abbr>earu<g ref="#char-0304">&#x0304;</g></abbr><expan>earum<add place="above" type="contemporary">orum</expan></choice><add place="above" type="contemporary"><choice><abbr>roru<g ref="#char-0304">\u</g></abbr><expan>rorum</expan></choice></add>', text_page)
-        self.tei = re.sub(
-            '<choice><abbr></p></div><div n="10" type="interrogation"><label type="chapter-number" place="margin left" facs="205,219,157,181"><hi rend="color:red">Int̅</abbr><expan></p></div><div n="10" type="interrogation">I<label type="chapter-number" place="margin left" facs="205,219,157,181">n<hi rend="color:red">terrogatio</expan></choice>',
-            '</p></div><div n="10" type="interrogation"><label type="chapter-number" place="margin left" facs="205,219,157,181"><hi rend="color:red"><choice><abbr>Int̅</abbr><expan>Interrogatio</expan></choice>',
-            self.tei)
-        self.tei = re.sub(
-            '<choice><abbr>ep̅o<add place="above" type="contemporary">s</abbr><expan>epis<add place="above" type="contemporary">copos</expan></choice></add>',
-            '<choice><abbr>ep̅o</abbr><expan>episcopo</expan></choice><add place="above" type="contemporary">s</add>',
-            self.tei)
-        self.tei = re.sub(
-            '<add place="above" type="contemporary"><choice><abbr>e</add>ade<g ref="#char-0304">&#x0304;</g></abbr><expan>e</add>adem</expan></choice>',
-            '<choice><abbr><add place="above" type="contemporary">e</add>ade<g ref="#char-0304">&#x0304;</g></abbr><expan><add place="above" type="contemporary">e</add>adem</expan></choice>',
-            self.tei)
-        self.tei = re.sub(
-            '<add place="above" type="contemporary"><choice><abbr>n̅</add>posset</abbr><expan>ER</add>ROR</expan></choice>',
-            '<add place="above" type="contemporary"><choice><abbr>n̅</abbr><expan>non</expan></choice></add> posset',
-            self.tei)
+        self.tei = postprocessing_rules.apply(self.tei)
+
+
+# special characters of config.character_list replaced by their elements in BddTei.sc_to_g (see rewrite.Translator)
+character_translator = rewrite.Translator([(character[1], character[0]) for character in config.character_list])
+
+# replacements of BddTei.preprocessing, applied one after another
+preprocessing_translator = rewrite.Translator([
+    # replace pre character
+    ('\ue665', 'p\u0304'),
+    # replace wrong -tur sign
+    ('\u1dd1', '\uf1c2'),
+    # make sure, -ur ligatur has not been put behind interpunctuation
+    ('', ''),
+])
+
+# fixed-string replacements of BddTei.bdd_specific_tei, applied one after another
+bdd_specific_translator = rewrite.Translator([
+    # <add> used in Transkribus to show inline additions
+    ('<add>', '<add place="above" type="contemporary">'),
+    # unclear
+    ('...', '<unclear reason="tight-binding" resp="Transkribus" cert="low">...</unclear>'),
+    # editorial comment
+    ('[', '<note type="editorial-comment" resp="transkribus">'),
+    (']', '</note>'),
+    ('<note>', '<note type="editorial-comment" resp="transkribus">'),
+    # del
+    ('<del>', '<del rend="">'),
+    # subst
+    ('<subst>', '<subst><del rend="erasure"/><add place="" type="">'),
+    ('</subst>', '</add></subst>'),
+])
+
+# rules of BddTei.postprocessing, applied one after another (see rewrite.py)
+postprocessing_rules = rewrite.RuleSet([
+    # check, if </p> element is wrongly inserted in choice element:
+    rewrite.ChoiceTagRule('p in choice', 'p'),
+    # check, if </hi> element is wrongly inserted in choice element:
+    rewrite.ChoiceTagRule('hi in choice', 'hi'),
+    rewrite.Rule('nested choice Interrogandum',
+        '<choice><abbr><choice><abbr><p n="1"><hi rend="color:red">I</hi>nterrogandū</abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice></abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice>',
+        '<choice><abbr><p n="1"><hi rend="color:red">I</hi>nterrogandū</abbr><expan><p n="1"><hi rend="color:red">I</hi>nterrogandum</expan></choice>'),
+    rewrite.Rule('hi before choice in chapter title',
+        '(type="chapter"><head type="chapter-title"><label type="chapter-number" .*?</hi></label> )<choice><abbr><hi rend="color:red">',
+        r'\g<1><hi rend="color:red"><choice><abbr>', re.DOTALL),
+    rewrite.Rule('hi in expan in chapter title',
+        '(type="chapter"><head type="chapter-title"><label type="chapter-number" .*?</hi></label> <hi rend="color:red"><choice><abbr>.*?<expan>)<hi rend="color:red">',
+        r'\g<1>', re.DOTALL),
+    rewrite.Rule('end of head before pb', '(\n\n<pb.*?/>\n<fw.*?>\n<cb n="a".*?/>\n<lb.*?/>)</hi></head>', r'</hi></head>\g<1>'),
+    rewrite.Rule('end of head before cb', '(\n<cb n="b".*?/>\n<lb.*?/>)</hi></head>', r'</hi></head>\g<1>'),
+    rewrite.Rule('end of head before lb', '(\n<lb.*?/>)</hi></head>', r'</hi></head>\g<1>'),
+] + [
+    # correction generic cases
+    rule
+    for i in ['lb ', 'add', 'p', 'hi></label', 'item', 'note', 'fw']
+    for rule in [
+        rewrite.Rule(f'<{i.strip()}> before choice',
+            '(<choice><abbr>)(<' + i + '.*?>)(.*?</abbr><expan>)(<' + i + '.*?>)(.*?</expan></choice>)',
+            r'\g<2>\g<1>\g<3>\g<5>'),
+        rewrite.Rule(f'</{i.strip()}> behind choice',
+            '(<choice><abbr>.*?)</' + i + '>(</abbr><expan>.*?)</' + i + '>(.*?</expan></choice>)',
+            r'\g<1>\g<2>\g<3></' + i + '>', required='</' + i + '></abbr><expan>'),
+    ]
+] + [
+    # correction of ambigue expansions
+    # Capitula in fw
+    rewrite.Rule('Capitula in fw',
+        '(<fw.*?><choice><abbr>Cap<g ref="#char-0305">&#x0305;</g></abbr><expan>)Capitulum(</expan></choice>.*?</fw>)',
+        r'\g<1>Capitula\g<2>', re.IGNORECASE),
+    # Cap in fw ohne Auflösung
+    #rewrite.Rule('Cap in fw', '(<fw.*?>)Cap<g ref="#char-0305">&#x0305;</g>(.*?</fw>)',
+    #    r'\g<1><choice><abbr>Cap<g ref="#char-0305">&#x0305;</g></abbr><expan>Capitula</expan></choice>\g<2>', re.IGNORECASE),
+    # Ex concilio
+    rewrite.Rule('Ex concilio', '(<note type="inscription".*?>Ex <choice>.*?<expan>)concilium(</expan>)',
+        r'\g<1>concilio\g<2>'),
+    # Ex eodem capitulo
+    rewrite.Rule('Ex eodem capitulo', '(<note type="inscription".*?>Ex eodem <choice>.*?<expan>)Capitula(<)',
+        r'\g<1>Capitulo\g<2>'),
+    # correction of linebreaks
+    rewrite.Rule('line break before pb', '¬\n(<pb.*?<lb .*?)(/>)', r'\g<1> break="no"\g<2>', re.DOTALL),
+    # Bei <hi>Q</hi> kommt <hi>Qu</hi>. EInsetzen um ein Buchstaben verrückt, aber nur bei Wörtern mit Q?
+    rewrite.Rule('line break before pb (second pass)', '¬\n(<pb.*?<lb .*?)(/>)', r'\g<1> break="no"\g<2>', re.DOTALL),
+    rewrite.Rule('nested choice Capitula in fw',
+        '<choice><abbr><fw type="page-header" place="top" facs="638,58,210,100"><choice><abbr>Cap̅</abbr><expan>Capitula</expan></choice></abbr><expan><fw type="page-header" place="top" facs="638,58,210,100">Capitulum</expan></choice>',
+        '<fw type="page-header" place="top" facs="638,58,210,100"><choice><abbr>Cap̅</abbr><expan>Capitula</expan></choice>'),
+    rewrite.Rule('Interrogatio in label',
+        '<choice><abbr></p></div><div n="10" type="interrogation"><label type="chapter-number" place="margin left" facs="205,219,157,181"><hi rend="color:red">Int̅</abbr><expan></p></div><div n="10" type="interrogation">I<label type="chapter-number" place="margin left" facs="205,219,157,181">n<hi rend="color:red">terrogatio</expan></choice>',
+        '</p></div><div n="10" type="interrogation"><label type="chapter-number" place="margin left" facs="205,219,157,181"><hi rend="color:red"><choice><abbr>Int̅</abbr><expan>Interrogatio</expan></choice>'),
+    rewrite.Rule('episcopos with add',
+        '<choice><abbr>ep̅o<add place="above" type="contemporary">s</abbr><expan>epis<add place="above" type="contemporary">copos</expan></choice></add>',
+        '<choice><abbr>ep̅o</abbr><expan>episcopo</expan></choice><add place="above" type="contemporary">s</add>'),
+    rewrite.Rule('eadem with add',
+        '<add place="above" type="contemporary"><choice><abbr>e</add>ade<g ref="#char-0304">&#x0304;</g></abbr><expan>e</add>adem</expan></choice>',
+        '<choice><abbr><add place="above" type="contemporary">e</add>ade<g ref="#char-0304">&#x0304;</g></abbr><expan><add place="above" type="contemporary">e</add>adem</expan></choice>'),
+    rewrite.Rule('non with add',
+        '<add place="above" type="contemporary"><choice><abbr>n̅</add>posset</abbr><expan>ER</add>ROR</expan></choice>',
+        '<add place="above" type="contemporary"><choice><abbr>n̅</abbr><expan>non</expan></choice></add> posset'),
+])
 
 
 class PageXMLTests:
@@ -937,27 +987,47 @@ class PageXMLTests:
 
     This class provides methods for performing various tests on PAGE XML files. It can concatenate multiple text files,
     check text regions for necessary tags, check entries in the single text file, check the number of items in a list,
-    and check the internal structure of the text based on special placeholders.
+    and check the internal structure of the text based on special placeholders. The pages are checked independently,
+    in a pool of worker processes if jobs is greater than 1 (see validation.py).
 
     Args:
-        path_to_pagexml_files (list): A list of file paths to the PAGE XML files to be tested.
+        path_to_pagexml_files (list): A list of file paths (or transpy.ZipPage) to the PAGE XML files to be tested.
+        jobs (int): Number of worker processes for checking the pages.
 
     Attributes:
         filenames (list): A list of file paths to the PAGE XML files.
-        single_text_file (str): The concatenated text from all the files.
+        single_text_file (str): The concatenated text from all the files (only created by create_single_text_file()).
+        validations (list): The results of validation.validate_page() for every file.
+        findings (list): The problems found so far as validation.Finding (page, region id, rule, message).
 
     """
 
-    def __init__(self, path_to_pagexml_files):
+    def __init__(self, path_to_pagexml_files, jobs=1):
         """
         Initializes an instance of the PageXMLTests class.
 
         Args:
             path_to_pagexml_files (list): A list of file paths to the PAGE XML files to be tested.
+            jobs (int): Number of worker processes for checking the pages.
 
         """
         self.filenames = path_to_pagexml_files
+        self.jobs = jobs
         self.single_text_file = ""
+        self.validations = None
+        self.findings = []
+
+    def validate(self):
+        """
+        Checks all pages once, see validation.validate_pages().
+
+        Returns:
+            list: The results of validation.validate_page() for every file.
+
+        """
+        if self.validations is None:
+            self.validations = validation.validate_pages(self.filenames, self.jobs)
+        return self.validations
 
     def create_single_text_file(self):
         """
@@ -965,27 +1035,27 @@ class PageXMLTests:
     
         This method reads multiple text files specified by the 'filenames' attribute and concatenates their contents
         into a single text file. The resulting text file is stored in the 'single_text_file' attribute of the object.
+        The tests do not need it anymore, they count the placeholders page by page.
     
         Returns:
             str: The concatenated text from all the files.
     
         """
-        single_text_file = ""
+        texts = []
         for filename in self.filenames:
-            with open(filename, 'r', encoding = 'utf8') as file:
-                text = file.read()
-                single_text_file = single_text_file + text
-        self.single_text_file = single_text_file.replace('⁓','~') #replace wrong '⁓' with correct one '~'
+            with io.TextIOWrapper(transpy.open_pagexml(filename), encoding = 'utf8') as file:
+                texts.append(file.read())
+        self.single_text_file = ''.join(texts).replace('⁓','~') #replace wrong '⁓' with correct one '~'
         return self.single_text_file
 
     def check_text_regions(self):
         """
         Checks text regions in the XML files for necessary tags.
 
-        This method iterates over the XML files specified by the 'filenames' attribute and checks each text region
-        for the presence of necessary markup tags. It specifically looks for the presence of the "structure {type:"
-        tag within each text region. If a text region is found without the necessary markup, an error message is printed
-        with the details of the text region.
+        This method checks each text region of the XML files specified by the 'filenames' attribute for the presence
+        of necessary markup tags. It specifically looks for the presence of the "structure {type:" tag in the custom
+        attribute of each text region. If a text region is found without the necessary markup, an error message is
+        printed with the details of the text region and added to 'findings'.
 
         Note:
         - The method prints error messages if any text regions are found without the necessary markup.
@@ -993,25 +1063,14 @@ class PageXMLTests:
         """
 
         consistent_text_regions = True
-        for filename in self.filenames:
-            tree = LET.parse(filename)
-            root = tree.getroot()
+        for page in self.validate():
+            for finding in page.findings:
+                print(f"\nTextregion missing markup on page {finding.page}!\n=================================")
+                print(f"{finding.region_id}: {finding.message}\n=================================")
+                self.findings.append(finding)
+                consistent_text_regions = False
 
-            current_page = root.xpath('//ns0:TranskribusMetadata/@pageNr', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-
-            textregions = root.xpath('//ns0:TextRegion', namespaces={
-                'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
-            for element in textregions:
-                if "structure {type:" in LET.tostring(element, encoding='unicode', method='xml'):
-                    pass
-                else:
-                    print(f"\nTextregion missing markup on page {current_page}!\n=================================")
-                    print(
-                        f"{LET.tostring(element, encoding='unicode', method='xml')}\n=================================")
-                    consistent_text_regions = False
-
-            print(f"Page {current_page} checked for consistency of textregions.")
+            print(f"Page {page.page} checked for consistency of textregions.")
 
         if consistent_text_regions == True:
             print("===> All pages have been checked successfully, now checking internal structure.\n")
@@ -1021,19 +1080,18 @@ class PageXMLTests:
 
     def check_entries(self, character, type):
         """
-        Checks entries in the single text file for a given character pattern.
+        Checks entries in the PAGE XML files for a given character pattern.
     
-        This method counts the number of entries in the single text file that match the specified character pattern.
-        The character pattern is provided as the 'character' parameter. The method searches for entries marked up by
-        '~n~' or entries enclosed within the specified characters. The type of entries is provided as the 'type' parameter.
+        This method counts the number of entries in the PAGE XML files that match the specified character pattern.
+        The character pattern is provided as the 'character' parameter. The method uses the entries marked up by
+        '~n~' or '*n*' collected page by page. The type of entries is provided as the 'type' parameter.
     
         Note:
-        - The method assumes that the single text file has been created before calling this method.
         - The method prints the number of entries detected and returns the number of entries, the set of entries,
           and the list of entries.
     
         Args:
-        - character (str): The character pattern used to mark up the entries.
+        - character (str): The character used to mark up the entries, '~' or '*'.
         - type (str): The type of entries being checked.
     
         Returns:
@@ -1044,11 +1102,9 @@ class PageXMLTests:
         """
         # count number of chapters using toc entries marked up by '~n~'
         if "*" in character:
-            entries = re.findall(f'\*\d+\*', self.single_text_file)
-            entries = [int(i.replace(f'{character}', '')) for i in entries]
+            entries = [entry for page in self.validate() for entry in page.chapter_entries]
         else:
-            entries = re.findall(f'{character}\d+{character}', self.single_text_file)
-            entries = [int(i.replace(f'{character}', '')) for i in entries]
+            entries = [entry for page in self.validate() for entry in page.toc_entries]
         number_of_entries = max(entries)
         set_of_entries = set(entries)
         print(f"===> {number_of_entries} {type}-entries detected")
@@ -1060,8 +1116,8 @@ class PageXMLTests:
 
         This method checks the number of occurrences of each item in the list 'items' and compares it to the expected
         test number. If the count of an item divided by 2 is equal to the test number, the item is considered correct.
-        Otherwise, an error message is printed indicating that the item has the wrong number. The method returns a boolean
-        value indicating whether all items have the correct number.
+        Otherwise, an error message is printed indicating that the item has the wrong number and added to 'findings'.
+        The method returns a boolean value indicating whether all items have the correct number.
 
         Args:
         - items (list): A list of items to be checked.
@@ -1071,33 +1127,26 @@ class PageXMLTests:
         - test (bool): A boolean value indicating whether all items have the correct number.
 
         """
-        test = True
-        for i in range(1, max(items)):
-            if items.count(i) / 2 == test_number:
-                pass
-            else:
-                print(f"Item ({type}) {i} has wrong number.")
-                #print(sorted(items))
-                test = False
+        findings = validation.check_entry_numbers(items, test_number, type)
+        for finding in findings:
+            print(finding.message)
+        self.findings.extend(findings)
         print("All items correct.")
-        return test
+        return not findings
 
     def check_internal_structure(self):
         """
         Checks the internal structure of the text based on special placeholders.
 
         This method performs checks on the internal structure of the text using special placeholders, namely '~n~' and '*n*'.
-        It creates a single text file for easy checking and then counts the number of TOC entries marked with '~n~' and
-        the number of chapters marked with '*n*'. It compares these numbers and performs further checks on the number
-        of placeholders in the text.
+        It counts the number of TOC entries marked with '~n~' and the number of chapters marked with '*n*' page by
+        page. It compares these numbers and performs further checks on the number of placeholders in the text.
 
         Note:
-        - This method relies on the 'create_single_text_file', 'check_entries', and 'check_number_of_items' methods.
+        - This method relies on the 'check_entries' and 'check_number_of_items' methods.
 
         """
         print("Start checking internal structure")
-        # creates texfile for easy checking
-        self.create_single_text_file()
 
         # count number of chapters using toc entries marked up by '~n~' or '*n*'
         number_of_entries_toc, set_of_entries_toc, entries_toc = self.check_entries('~', 'TOC')
@@ -1119,6 +1168,197 @@ class PageXMLTests:
             exit()
 
 
+@functools.lru_cache(maxsize=None)
+def load_tei_template(tei_base_id):
+    """ Load TEI template of a manuscript once per process
+
+    :param tei_base_id: Base id of the manuscript without trailing '-'
+    :return: Template as string, containing '%%' as placeholder for the text
+    """
+
+    with open(os.path.join(config.resources_folder,f'tei_template_{tei_base_id}.xml'),
+              'r', encoding='utf8') as xmlfile:
+        return xmlfile.read()
+
+
+def create_page_cache(siglum):
+    """ Create cache of converted pages for a manuscript
+
+    Pages are cached in the folder 'cache_folder' specified in config.py (./cache if not specified). Cached pages are
+    only reused if the data of the manuscript in config.py and the abbreviation dictionary are unchanged.
+
+    :param siglum: Siglum of the manuscript as specified in config.py
+    :return: PageCache
+    """
+
+    settings = (sorted(config.manuscript_data[siglum].items()),
+                page_cache.file_hash(os.path.join(config.resources_folder, 'abbreviation_dictionary.json')))
+    return page_cache.PageCache(getattr(config, 'cache_folder', os.path.join(os.getcwd(), 'cache')), settings)
+
+
+def process_book(siglum, book, page_range, folio, iiif_image_id, download=False, compatibility_mode=False, jobs=1,
+                 dictionary_abbr_external=None, session=None, use_cache=False, profile=None, stream=False):
+    """
+    Downloads, tests and converts one book of a manuscript into BDD-TEI and saves it in the output folder.
+
+    Wall time, CPU time, peak memory and document size of every stage are saved as '<TEI file>.report.json' next to
+    the TEI file, see profiling.py.
+
+    In streaming mode the book is converted chapter by chapter and written into the TEI file directly (see
+    streaming.py), the TEI file is the same.
+
+    :param siglum: Siglum of the manuscript as specified in config.py, e.g. 'B'
+    :param book: Book number as int
+    :param page_range: Range of Transkribus page numbers as string, e.g. '282-291'
+    :param folio: First folio of the book, e.g. '139v'
+    :param iiif_image_id: IIIF image id of the first page
+    :param download: Download PAGE XML from Transkribus first?
+    :param compatibility_mode: Compare abbreviation expansion with legacy function?
+    :param jobs: Number of worker processes for converting PAGE XML into TEI
+    :param dictionary_abbr_external: Abbreviation dictionary, loaded from resources folder if not given
+    :param session: Transkribus session used for downloading, a new session is started if not given
+    :param use_cache: Reuse pages converted in earlier runs if their PAGE XML is unchanged?
+    :param profile: Profile the conversion with 'cprofile' or 'pyinstrument' and print the report of the stages?
+    :param stream: Convert the book chapter by chapter and write it into the TEI file directly?
+    :return: Path to the saved TEI file
+    :raises ValueError: If streaming is combined with compatibility mode or the TEI template has not exactly one '%%'
+    """
+
+    if stream and compatibility_mode:
+        raise ValueError('The compatibility check of the abbreviation expansion needs the whole book, '
+                         'use either streaming or compatibility mode')
+
+    # creating variables from arguments
+    book_int = int(book)
+    book_string = str(book_int).zfill(2)
+    startpage = int(page_range.split('-')[0])
+    endpage = int(page_range.split('-')[1])
+
+    # create path to folder
+    path_to_folder = os.path.join(config.export_folder,book_string)
+
+    # create manuscript object
+    manuscript = ManuscriptToProcess(siglum)
+    # update
+    manuscript.tei_base_id_book = manuscript.tei_base_id_book + book_string
+    manuscript.start_folio = folio
+    manuscript.iiif_image_id = int(iiif_image_id)
+
+    # the text is written between the beginning and the end of the template in streaming mode
+    if stream and load_tei_template(manuscript.tei_base_id[:-1]).count('%%') != 1:
+        raise ValueError(f'Streaming mode needs exactly one placeholder %% in the TEI template '
+                         f'tei_template_{manuscript.tei_base_id[:-1]}.xml, convert without -stream')
+
+    # several books may be saved at the same time in batch mode
+    os.makedirs(os.path.join(os.getcwd(),'output',f'{book_string}'), exist_ok=True)
+    output_filename = os.path.join(os.getcwd(),'output',f'{book_string}',f'{manuscript.tei_base_id_book}.xml')
+    output_filename_base = os.path.splitext(output_filename)[0]
+
+    # record wall time, cpu time, memory and document size of every stage, optionally profile the whole conversion
+    report = profiling.StageReport(manuscript.tei_base_id_book)
+    with profiling.profiled(profile, output_filename_base):
+
+        # start download if flag '-dl' is given
+        zip_file_name = transpy.export_zip_file_name(manuscript.transkribus_document, startpage, endpage)
+        if download == True:
+            print(
+                f'Starting export of page-xml from Transkribus and download to local machine for book {book_string} in manuscript {manuscript.sigla}.')
+            with report.stage('download'):
+                transpy.download_zip_from_transkribus(manuscript.transkribus_collection, manuscript.transkribus_document,
+                                                      startpage, endpage, session=session)
+            print('Finished download.\n')
+
+        # open page-xml files for further processing
+        # get path to individual page-xml files, files of the latest download are read directly from the zip file without
+        # extracting them, the folder is used if it or one of its files is more recent (e.g. extracted or corrected files
+        # or files without download)
+        path_to_pagexml = os.path.join(path_to_folder,str(manuscript.transkribus_document),manuscript.base_folder,'page')
+        if os.path.exists(zip_file_name) and (not os.path.isdir(path_to_pagexml) or os.path.getmtime(zip_file_name) >
+                                              transpy.newest_modification_time(path_to_pagexml)):
+            manuscript.path_to_pagexml_files = transpy.load_pagexml_from_zip(zip_file_name)
+        else:
+            manuscript.path_to_pagexml_files = transpy.load_pagexml(path_to_pagexml)
+
+        # create pageXML object
+        page_xml_tests = PageXMLTests(manuscript.path_to_pagexml_files, jobs=jobs)
+
+        # test pageXML for consistency according to project needs
+        with report.stage('check_text_regions'):
+            page_xml_tests.check_text_regions()
+        if book_int > 0:  # Exclude Prologue (book 0)
+            with report.stage('check_internal_structure'):
+                page_xml_tests.check_internal_structure()
+
+        # conversion of pageXML into tei object
+        with report.stage('create_tei_from_pagexml', lambda: getattr(manuscript, 'bdd_tei_text', '')):
+            manuscript.create_tei_from_pagexml(jobs=jobs, cache=create_page_cache(siglum) if use_cache else None)
+
+        # create tei object for further processing
+        tei_file = BddTei(manuscript)
+
+        # insert book number and date into template file, the text of the book replaces its placeholder
+        template_file = load_tei_template(manuscript.tei_base_id[:-1])
+        today = datetime.date.today()
+        def fill_template(text):
+            return text.replace("{book}", book_string).replace("{date-yyyy-mm-dd}", str(today))
+
+        # convert chapter by chapter and write into file directly
+        if stream:
+            with report.stage('stream_first_pass'):
+                book_chunks = streaming.BookChunks(tei_file)
+                manuscript.bdd_tei_text = None
+            if dictionary_abbr_external is None:
+                with report.stage('load_abbreviation_dict'):
+                    dictionary_abbr_external = transpy.load_abbreviation_dict()
+            with report.stage('stream_second_pass', rule_set=postprocessing_rules):
+                template_start, template_end = template_file.split('%%')
+                with open(output_filename, 'w+', encoding = 'utf8') as newfile:
+                    newfile.write(fill_template(template_start))
+                    for chunk in book_chunks.expand(dictionary_abbr_external):
+                        newfile.write(fill_template(chunk))
+                    newfile.write(fill_template(template_end))
+                book_chunks.close()
+        else:
+            # process tei
+            with report.stage('bdd_export_tei', lambda: tei_file.tei):
+                tei_file.bdd_export_tei()
+            with report.stage('preprocessing', lambda: tei_file.tei):
+                tei_file.preprocessing()
+            with report.stage('line_breaks_angled_dash', lambda: tei_file.tei):
+                tei_file.line_breaks_angled_dash()
+
+            # TODO: Reihenfolge klären
+            with report.stage('bdd_specific_tei', lambda: tei_file.tei):
+                tei_file.bdd_specific_tei()
+
+            if dictionary_abbr_external is None:
+                with report.stage('load_abbreviation_dict'):
+                    dictionary_abbr_external = transpy.load_abbreviation_dict()
+            with report.stage('replace_abbreviations_from_tei', lambda: tei_file.tei):
+                tei_file.tei = transpy.replace_abbreviations_from_tei(dictionary_abbr_external, tei_file.tei,
+                                                                      compatibility_mode=compatibility_mode)
+
+            with report.stage('sc_to_g', lambda: tei_file.tei):
+                tei_file.sc_to_g()
+            with report.stage('postprocessing', lambda: tei_file.tei, postprocessing_rules):
+                tei_file.postprocessing()
+
+            # replace placeholder in template file and save as new file
+            with report.stage('save', lambda: tei_file.tei):
+                new_file = fill_template(template_file.replace('%%', tei_file.tei))
+
+                with open(output_filename, 'w+', encoding = 'utf8') as newfile:
+                    newfile.write(new_file)
+
+    # save report next to the TEI file
+    report.save(output_filename_base + '.report.json')
+    if profile is not None:
+        print(report.table())
+        print(postprocessing_rules.report())
+
+    return output_filename
+
+
 def main():
     """
     Main script for downloading, exporting, and converting manuscripts stored in Transkribus into BDD-TEI format.
@@ -1142,81 +1382,20 @@ def main():
     parser.add_argument('folio', metavar='F', help='Angabe der Folionummer')
     parser.add_argument('iiif_image_id', metavar='I', help='Angabe der IIIF-Image-ID')
     parser.add_argument('-dl', help='Download?', action='store_true')
+    parser.add_argument('-compat', help='Compare abbreviation expansion with legacy function?', action='store_true')
+    parser.add_argument('-jobs', '--jobs', help='Number of worker processes for conversion', type=int, default=1)
+    parser.add_argument('-cache', help='Reuse unchanged pages of earlier runs?', action='store_true')
+    parser.add_argument('-sync', help='Update abbreviations from eXist first?', action='store_true')
+    parser.add_argument('--profile', help='Profile conversion and print timing report of stages?', nargs='?',
+                        const='cprofile', choices=profiling.profilers)
+    parser.add_argument('-stream', help='Convert chapter by chapter and write into file directly?',
+                        action='store_true')
     args = parser.parse_args()
 
-    # creating variables from arguments
-    book_int = args.book
-    book_string = str(book_int).zfill(2)
-    startpage = int(args.page_range.split('-')[0])
-    endpage = int(args.page_range.split('-')[1])
-
-    # create path to folder
-    path_to_folder = os.path.join(config.export_folder,book_string)
-
-    # create manuscript object
-    manuscript = ManuscriptToProcess(args.siglum)
-    # update
-    manuscript.tei_base_id_book = manuscript.tei_base_id_book + book_string
-    manuscript.start_folio = args.folio
-    manuscript.iiif_image_id = int(args.iiif_image_id)
-
-    # start download if flag '-dl' is given
-    if args.dl == True:
-        print(
-            f'Starting export of page-xml from Transkribus and download to local machine for book {book_string} in manuscript {manuscript.sigla}.')
-        transpy.download_data_from_transkribus(manuscript.transkribus_collection, manuscript.transkribus_document,
-                                               startpage, endpage, path_to_folder)
-        print('Finished download.\n')
-
-    # open page-xml files for further processing
-    # get path to individual page-xml files
-    manuscript.path_to_pagexml_files = transpy.load_pagexml(os.path.join(path_to_folder,str(manuscript.transkribus_document),manuscript.base_folder,'page'))
-
-    # create pageXML object
-    page_xml_tests = PageXMLTests(manuscript.path_to_pagexml_files)
-
-    # test pageXML for consistency according to project needs
-    page_xml_tests.check_text_regions()
-    if book_int > 0:  # Exclude Prologue (book 0)
-        page_xml_tests.check_internal_structure()
-
-    # conversion of pageXML into tei object
-    manuscript.create_tei_from_pagexml()
-
-    # create tei object for further processing
-    tei_file = BddTei(manuscript)
-
-    # process tei
-    tei_file.bdd_export_tei()
-    tei_file.preprocessing()
-    tei_file.line_breaks_angled_dash()
-
-    # TODO: Reihenfolge klären
-    tei_file.bdd_specific_tei()
-
-    dictionary_abbr_external = transpy.load_abbreviation_dict()
-    tei_file.tei = transpy.replace_abbreviations_from_tei(dictionary_abbr_external, tei_file.tei)
-
-    tei_file.sc_to_g()
-    tei_file.postprocessing()
-
-    # replace placeholder in template file and save as new file
-    with open(os.path.join(config.resources_folder,f'tei_template_{manuscript.tei_base_id[:-1]}.xml'),
-              'r', encoding='utf8') as xmlfile:
-        template_file = xmlfile.read()
-
-    new_file = template_file.replace('%%', tei_file.tei)
-    # insert book number into file
-    new_file = new_file.replace("{book}", book_string)
-    # insert date into file
-    today = datetime.date.today()
-    new_file = new_file.replace("{date-yyyy-mm-dd}", str(today))
-
-    if os.path.exists(os.path.join(os.getcwd(),'output',f'{book_string}')) == False:
-        os.mkdir(os.path.join(os.getcwd(),'output',f'{book_string}'))
-    with open(os.path.join(os.getcwd(),'output',f'{book_string}',f'{manuscript.tei_base_id_book}.xml'),
-              'w+', encoding = 'utf8') as newfile:
-        newfile.write(new_file)
+    process_book(args.siglum, args.book, args.page_range, args.folio, args.iiif_image_id, download=args.dl,
+                 compatibility_mode=args.compat, jobs=args.jobs, use_cache=args.cache,
+                 dictionary_abbr_external=transpy.load_abbreviation_dict(sync=True) if args.sync else None,
+                 profile=args.profile, stream=args.stream)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""
+Benchmark of the conversion pipeline
+====================================
+
+Summary:
+--------
+Times the stages of the conversion of a book on the PAGE XML files and TEI books in the folder coords (coords/6 with
+bamberg-sb-c-6-06.xml and coords/20 with bamberg-sb-c-6-20.xml): the tests of PageXMLTests, create_tei_from_pagexml,
+the processing of BddTei including replace_abbreviations_from_tei and postprocessing, and the correction of the
+coordinates with TeiCorrector and correct_coords.correct_file. With -scale the books are repeated to synthetic books
+of 10 or 100 times their pages (chapter and TOC numbers continue in every copy, so the tests still pass). For every
+stage wall time, CPU time and peak memory (see profiling.py) and the throughput in pages/s and words/s are reported.
+
+Usage:
+------
+Run from the root folder of the repository (config.py and the abbreviation dictionary have to exist):
+python benchmarks/pipeline.py [-books coords/6 coords/20] [-scale 1 10 100] [-siglum B] [-jobs 1] [-report report.json]
+
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+
+import lxml.etree as LET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bdd # classes of the pipeline
+import correct_coords # correction of tei:@facs
+import page_model # text regions and lines of pageXML files
+import profiling # timing of stages
+import transpy # function library
+import xpaths # namespaces
+
+# chapter (*n*) and TOC (~n~) markers of the PAGE XML files
+marker = re.compile(r'([*~])(\d+)\1')
+
+# xml:id as attribute name of lxml
+xml_id = '{http://www.w3.org/XML/1998/namespace}id'
+
+
+def pagexml_files(pagexml_dir):
+    """ Returns the paths of the PAGE XML files of a folder in order of their page number """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transpy.load_pagexml(pagexml_dir)
+
+
+def tei_book(pagexml_dir):
+    """ Returns the TEI book of a folder of PAGE XML files, e.g. coords/bamberg-sb-c-6-20.xml for coords/20 """
+
+    folder, book = os.path.split(os.path.normpath(pagexml_dir))
+    for file_name in sorted(os.listdir(folder)):
+        if file_name.endswith(f'-{int(book):02d}.xml'):
+            return os.path.join(folder, file_name)
+    raise FileNotFoundError(f'No TEI book found for {pagexml_dir} in {folder}')
+
+
+def count_words(filenames):
+    """ Counts the words of the text lines of PAGE XML files """
+
+    return sum(len(text.split()) for filename in filenames for region in page_model.read_page_regions(filename).regions
+               for text in region.text)
+
+
+def scale_pagexml(filenames, output_dir, factor):
+    """
+    Repeats the pages of a book to a synthetic book.
+
+    The chapter and TOC numbers of every copy continue the numbers of the previous copy.
+
+    :param filenames: Paths of the PAGE XML files of the book
+    :param output_dir: Folder of the synthetic book
+    :param factor: Number of copies
+    :return: Paths of the PAGE XML files of the synthetic book
+    """
+
+    texts = []
+    for filename in filenames:
+        with open(filename, 'r', encoding='utf8') as pagexml_file:
+            texts.append(pagexml_file.read())
+    highest = max((int(match.group(2)) for text in texts for match in marker.finditer(text)), default=0)
+
+    os.makedirs(output_dir, exist_ok=True)
+    number = 0
+    for copy_number in range(factor):
+        for text in texts:
+            number += 1
+            with open(os.path.join(output_dir, f'{number:05d}.xml'), 'w', encoding='utf8') as pagexml_file:
+                pagexml_file.write(marker.sub(
+                    lambda match: f'{match.group(1)}{int(match.group(2)) + copy_number * highest}{match.group(1)}',
+                    text))
+    return pagexml_files(output_dir)
+
+
+def scale_tei(tei_file_path, output_file, factor):
+    """
+    Repeats the content of the book of a TEI file to a synthetic book matching scale_pagexml().
+
+    :param tei_file_path: Path to TEI file
+    :param output_file: Path to TEI file of the synthetic book
+    :param factor: Number of copies, xml:id of the copies are made unique by the suffix '-<copy>'
+    """
+
+    tei_tree = LET.parse(tei_file_path)
+    book = tei_tree.find('.//tei:body/tei:div', namespaces=xpaths.namespaces)
+    children = list(book)
+    for copy_number in range(1, factor):
+        for child in children:
+            child = copy.deepcopy(child)
+            for element in child.iter():
+                if xml_id in element.attrib:
+                    element.set(xml_id, f'{element.get(xml_id)}-{copy_number}')
+            book.append(child)
+    tei_tree.write(output_file, encoding='utf8', xml_declaration=True)
+
+
+def run_stages(filenames, tei_file_path, pagexml_dir, output_dir, siglum, book, jobs, dictionary_abbr_external):
+    """
+    Runs the stages of the pipeline on a book.
+
+    :return: StageReport
+    """
+
+    report = profiling.StageReport(f'{siglum}-{book}')
+
+    page_xml_tests = bdd.PageXMLTests(filenames, jobs=jobs)
+    with report.stage('PageXMLTests.check_text_regions'):
+        page_xml_tests.check_text_regions()
+    with report.stage('PageXMLTests.check_internal_structure'):
+        page_xml_tests.check_internal_structure()
+
+    manuscript = bdd.ManuscriptToProcess(siglum)
+    manuscript.tei_base_id_book = manuscript.tei_base_id_book + f'{book:02d}'
+    manuscript.start_folio = '1r'
+    manuscript.iiif_image_id = 1
+    manuscript.path_to_pagexml_files = filenames
+    with report.stage('create_tei_from_pagexml', lambda: getattr(manuscript, 'bdd_tei_text', '')):
+        manuscript.create_tei_from_pagexml(jobs=jobs)
+
+    tei_file = bdd.BddTei(manuscript)
+    for stage in ['bdd_export_tei', 'preprocessing', 'line_breaks_angled_dash', 'bdd_specific_tei']:
+        with report.stage(f'BddTei.{stage}', lambda: tei_file.tei):
+            getattr(tei_file, stage)()
+    with report.stage('replace_abbreviations_from_tei', lambda: tei_file.tei):
+        tei_file.tei = transpy.replace_abbreviations_from_tei(dictionary_abbr_external, tei_file.tei)
+    for stage in ['sc_to_g', 'postprocessing']:
+        with report.stage(f'BddTei.{stage}', lambda: tei_file.tei):
+            getattr(tei_file, stage)()
+
+    with report.stage('TeiCorrector'):
+        tei_corrector = correct_coords.TeiCorrector(tei_file_path, pagexml_dir,
+                                                    os.path.join(output_dir, 'corrector.xml'))
+        tei_corrector.correct_lines()
+        tei_corrector.correct_other_elements('//tei:label')
+        tei_corrector.write_file()
+    # profile declared in config.py, with tei:lb like TeiCorrector.correct_lines()
+    profile = correct_coords.transform_profile('scale-3.6-lines')
+    with report.stage('correct_coords.correct_file'):
+        correct_coords.correct_file(tei_file_path, pagexml_dir, os.path.join(output_dir, 'corrected.xml'), profile)
+    return report
+
+
+def throughput_table(report, pages, words):
+    """ Returns the stages of a report with throughput in pages/s and words/s as printable table """
+
+    lines = [f'{"stage":<40} {"wall s":>8} {"cpu s":>8} {"peak MB":>8} {"pages/s":>10} {"words/s":>12}']
+    for stage in report.stages:
+        wall_seconds = stage['wall_seconds'] or 1e-9
+        peak = f'{stage["peak_rss_bytes"] / 2 ** 20:.1f}' if stage['peak_rss_bytes'] is not None else '-'
+        lines.append(f'{stage["stage"]:<40} {stage["wall_seconds"]:>8.3f} {stage["cpu_seconds"]:>8.3f} {peak:>8} '
+                     f'{pages / wall_seconds:>10.1f} {words / wall_seconds:>12.0f}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the pipeline on the books in coords')
+    parser.add_argument('-books', nargs='+', help='Folders of PAGE XML files next to their TEI book',
+                        default=['coords/6', 'coords/20'])
+    parser.add_argument('-scale', nargs='+', help='Number of copies of every book', type=int, default=[1, 10])
+    parser.add_argument('-siglum', help='Siglum of the manuscript as specified in config.py', default='B')
+    parser.add_argument('-jobs', help='Number of worker processes for PageXMLTests and create_tei_from_pagexml',
+                        type=int, default=1)
+    parser.add_argument('-report', help='Save results as JSON file')
+    args = parser.parse_args()
+
+    dictionary_abbr_external = transpy.load_abbreviation_dict()
+    results = []
+    for pagexml_dir in args.books:
+        book = int(os.path.basename(os.path.normpath(pagexml_dir)))
+        filenames = pagexml_files(pagexml_dir)
+        words_per_copy = count_words(filenames)
+        for factor in args.scale:
+            with tempfile.TemporaryDirectory() as folder:
+                # ...the original book is used as it is, synthetic books are written into the temporary folder...
+                if factor == 1:
+                    book_filenames, book_pagexml_dir, tei_file_path = filenames, pagexml_dir, tei_book(pagexml_dir)
+                else:
+                    book_pagexml_dir = os.path.join(folder, str(book))
+                    book_filenames = scale_pagexml(filenames, book_pagexml_dir, factor)
+                    tei_file_path = os.path.join(folder, os.path.basename(tei_book(pagexml_dir)))
+                    scale_tei(tei_book(pagexml_dir), tei_file_path, factor)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    report = run_stages(book_filenames, tei_file_path, book_pagexml_dir, folder, args.siglum, book,
+                                        args.jobs, dictionary_abbr_external)
+
+            pages = len(book_filenames)
+            words = words_per_copy * factor
+            print(f'\nBook {book} x{factor}: {pages} pages, {words} words')
+            print(throughput_table(report, pages, words))
+            results.append({'book': book, 'scale': factor, 'pages': pages, 'words': words, 'report': report.to_dict()})
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf8') as report_file:
+            json.dump(results, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
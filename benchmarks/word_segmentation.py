@@ -0,0 +1,158 @@
+"""
+Benchmark for word segmentation
+===============================
+
+Summary:
+--------
+Builds a synthetic book of run-together words and measures transpy.word_segmentation on it. Word forms are taken
+from a lexicon csv file (column 'WF-Name') or generated randomly. A share of neighbouring words is joined without
+space, the benchmark reports throughput and how many of the joined words have been split correctly. Optionally, the
+former approach (regex scans of a pandas DataFrame per split point) is timed on a sample of the joined words.
+
+Usage:
+------
+Run from the root folder of the repository (config.py has to exist):
+python benchmarks/word_segmentation.py [-tokens 100000] [-lexicon path/to/lexicon.csv] [-joined 0.1] [-legacy 50]
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lexicon # indexed lexicon of word forms
+import transpy # function library
+
+
+def synthetic_word_forms(number, seed=0):
+    """ Generates random latin-like word forms """
+
+    random.seed(seed)
+    syllables = ['a', 'e', 'i', 'o', 'u', 'ab', 'ad', 'am', 'an', 'ar', 'bi', 'ca', 'ce', 'de', 'di', 'do', 'e', 'ec',
+                 'em', 'er', 'es', 'et', 'fi', 'ge', 'in', 'is', 'it', 'la', 'le', 'li', 'ma', 'me', 'mi', 'mo', 'na',
+                 'ne', 'ni', 'no', 'nt', 'or', 'pa', 'pe', 'po', 'pre', 'qu', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si',
+                 'so', 'st', 'ta', 'te', 'ti', 'to', 'tu', 'um', 'ur', 'us', 'ui', 'ue']
+    word_forms = set()
+    while len(word_forms) < number:
+        word_forms.add(''.join(random.choice(syllables) for _ in range(random.randint(1, 5))))
+    return sorted(word_forms)
+
+
+def synthetic_book(word_forms, tokens, joined, words_per_line=8, lines_per_page=50, seed=0):
+    """
+    Generates pages of text from word forms with a share of neighbouring words joined without space.
+
+    :return: List of pages as strings, dictionary of joined words and their expected segmentation
+    """
+
+    random.seed(seed)
+    words = [random.choice(word_forms) for _ in range(tokens)]
+    expected = {}
+    line = []
+    lines = []
+    index = 0
+    while index < len(words):
+        if index + 1 < len(words) and random.random() < joined:
+            line.append(words[index] + words[index + 1])
+            expected[words[index] + words[index + 1]] = words[index] + ' ' + words[index + 1]
+            index += 2
+        else:
+            line.append(words[index])
+            index += 1
+        if len(line) == words_per_line:
+            lines.append(' '.join(line))
+            line = []
+    if line:
+        lines.append(' '.join(line))
+
+    pages = []
+    for start in range(0, len(lines), lines_per_page):
+        pages.append("<pb/><cb n='a'/>\n<lb/>" + '\n<lb/>'.join(lines[start:start + lines_per_page]))
+    return pages, expected
+
+
+def legacy_segmentation(word, df):
+    """ Former split point search, one word at a time, two regex scans of the DataFrame per step """
+
+    if df['WF-Name'].str.contains('^' + word + '$', regex=True).any():
+        return word
+    n = 1
+    word1 = word[:len(word) - n]
+    word2 = word[len(word) - n:]
+    while not (df['WF-Name'].str.contains(word1 + '$', regex=True).any()) and \
+            (df['WF-Name'].str.contains(word2 + '$', regex=True).any()):
+        n += 1
+        word1 = word[:len(word) - n]
+        word2 = word[len(word) - n:]
+    return word1 + ' ' + word2
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark word segmentation on a synthetic book')
+    parser.add_argument('-tokens', help='Number of tokens of the synthetic book', type=int, default=100000)
+    parser.add_argument('-lexicon', help='Lexicon csv file, random word forms are used if omitted')
+    parser.add_argument('-forms', help='Number of random word forms if no lexicon is given', type=int, default=50000)
+    parser.add_argument('-joined', help='Share of words joined with their neighbour', type=float, default=0.1)
+    parser.add_argument('-legacy', help='Number of joined words to time the former approach on', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if args.lexicon:
+            filename = args.lexicon
+        else:
+            filename = os.path.join(folder, 'lexicon.csv')
+            pd.DataFrame({'WF-Name': synthetic_word_forms(args.forms)}).to_csv(filename, index=False)
+
+        start = time.perf_counter()
+        lexicon_of_word_forms = lexicon.load_lexicon(filename)
+        print(f'Lexicon: {len(lexicon_of_word_forms)} word forms, loaded in {time.perf_counter() - start:.2f}s')
+
+        word_forms = sorted(lexicon_of_word_forms.word_forms)
+        pages, expected = synthetic_book(word_forms, args.tokens, args.joined)
+        print(f'Book: {args.tokens} tokens on {len(pages)} pages, {len(expected)} different joined words')
+
+        start = time.perf_counter()
+        lexicon_of_word_forms.trie
+        print(f'Trie built in {time.perf_counter() - start:.2f}s')
+
+        start = time.perf_counter()
+        for page in pages:
+            transpy.word_segmentation(page, lexicon_of_word_forms)
+        duration = time.perf_counter() - start
+        print(f'Segmentation: {duration:.2f}s, {args.tokens / duration:.0f} tokens/s, '
+              f'{len(pages) / duration:.1f} pages/s')
+
+        # ...joined words are split exactly as generated or into another valid sequence of word forms...
+        exact = 0
+        valid = 0
+        for word, expected_segmentation in expected.items():
+            segmentation = lexicon_of_word_forms.segment(word)
+            if ' '.join(segmentation) == expected_segmentation:
+                exact += 1
+            elif len(segmentation) > 1 or word in lexicon_of_word_forms:
+                valid += 1
+        print(f'Joined words split as generated: {exact}/{len(expected)}, otherwise valid: {valid}/{len(expected)}')
+
+        if args.legacy:
+            df = pd.read_csv(filename)
+            sample = list(expected)[:args.legacy]
+            start = time.perf_counter()
+            for word in sample:
+                legacy_segmentation(word, df)
+            legacy_duration = (time.perf_counter() - start) / len(sample)
+            start = time.perf_counter()
+            for word in sample:
+                lexicon_of_word_forms.segment(word)
+            duration = (time.perf_counter() - start) / len(sample)
+            print(f'Per joined word: former approach {legacy_duration * 1000:.1f}ms, segmenter {duration * 1000:.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,9 @@ export_folder="/path/to/folder/"
 
 resources_folder = "/path/to/folder/"
 
+# cache of converted pages (optional, defaults to ./cache)
+cache_folder = "/path/to/folder/"
+
 exist_url = "url/to/existdb/"
 
 special_characters_dict = {'-ur':'\uf1c2',
@@ -108,6 +111,8 @@ character_list = [['<g ref="#char-f1ac"></g>',''],
     ['<g ref="#char-2234">∴</g>','∴'],
     ['<g ref="#char-23D1">⏑</g>','⏑']]
 
+# templates for the attributes facs, corresp and ana of tei:pb use the fields {iiif_image_id}, {folio},
+# {folio_number} and {folio_side}, e.g. {iiif_image_id:0>4} for zero-padding (see url_templates.py)
 manuscript_data = { 'F': {
                         'signatur': 'Frankfurt a.M., UB, Barth. 50',
                         'transkribus_collection_id': 80437,
@@ -115,9 +120,9 @@ manuscript_data = { 'F': {
                         'base_folder': '01_Transkription_Frankfurt-ub-b-50',
                         'tei_base_id': 'frankfurt-ub-b-50-',
                         'iiif_scale_factor': 1.34,
-                        'facs_url':'f"https://sammlungen.ub.uni-frankfurt.de/i3f/v20/{self.iiif_image_id}/full/full/0/default.jpg"',
-                        'corresp':'f"https://sammlungen.ub.uni-frankfurt.de/msma/i3f/v20/2035614/canvas/{self.iiif_image_id}"',
-                        'ana':'f"/annotations/frankfurt-ub-b-50-annotation-{self.iiif_image_id}"'},
+                        'facs_url':'https://sammlungen.ub.uni-frankfurt.de/i3f/v20/{iiif_image_id}/full/full/0/default.jpg',
+                        'corresp':'https://sammlungen.ub.uni-frankfurt.de/msma/i3f/v20/2035614/canvas/{iiif_image_id}',
+                        'ana':'/annotations/frankfurt-ub-b-50-annotation-{iiif_image_id}'},
 
                     'B': {
                         'signatur': 'Bamberg, SB, Can. 6',
@@ -126,9 +131,9 @@ manuscript_data = { 'F': {
                         'base_folder': '01_Transkription_Bamberg_Stabi_Can_6',
                         'tei_base_id': 'bamberg-sb-c-6-',
                         'iiif_scale_factor': 1,
-                        'facs_url':'f"https://api.digitale-sammlungen.de/iiif/image/v2/bsb00140701_00{self.iiif_image_id}/full/full/0/default.jpg"',
-                        'corresp':'f"https://api.digitale-sammlungen.de/iiif/presentation/v2/bsb00140701/canvas/{self.iiif_image_id}"',
-                        'ana':'f"/annotations/bamberg-sb-c-6-annotation-{self.iiif_image_id}"'},
+                        'facs_url':'https://api.digitale-sammlungen.de/iiif/image/v2/bsb00140701_00{iiif_image_id}/full/full/0/default.jpg',
+                        'corresp':'https://api.digitale-sammlungen.de/iiif/presentation/v2/bsb00140701/canvas/{iiif_image_id}',
+                        'ana':'/annotations/bamberg-sb-c-6-annotation-{iiif_image_id}'},
 
                     'K': {
                         'signatur': 'Köln, EDD, Cod. 119',
@@ -137,9 +142,9 @@ manuscript_data = { 'F': {
                         'base_folder': '01_Transkription_Köln_EDD_Cod_119',
                         'tei_base_id': 'koeln-edd-c-119-',
                         'iiif_scale_factor': 1,
-                        'facs_url':'f"https://digital.dombibliothek-koeln.de/i3f/v20/{self.iiif_image_id}/full/full/0/default.jpg"',
-                        'corresp':'f"https://digital.dombibliothek-koeln.de/i3f/v20/284343/canvas/{self.iiif_image_id}"',
-                        'ana':'f"/annotations/koeln-edd-c-119-annotation-{self.iiif_image_id}"'},
+                        'facs_url':'https://digital.dombibliothek-koeln.de/i3f/v20/{iiif_image_id}/full/full/0/default.jpg',
+                        'corresp':'https://digital.dombibliothek-koeln.de/i3f/v20/284343/canvas/{iiif_image_id}',
+                        'ana':'/annotations/koeln-edd-c-119-annotation-{iiif_image_id}'},
 
                     'Va': {
                         'signatur': 'Vatikan, BAV, Pal. lat. 585',
@@ -148,9 +153,9 @@ manuscript_data = { 'F': {
                         'base_folder': '01_Transkription_BAV_Pal_lat_585',
                         'tei_base_id': 'vatican-bav-pal-lat-585-',
                         'iiif_scale_factor': 1,
-                        'facs_url':'f"https://digi.vatlib.it/pub/digit/MSS_Pal.lat.585/iiif/Pal.lat.585_{str(self.iiif_image_id).zfill(4)}_fa_{self.start_folio[:-1].zfill(4)+self.start_folio[-1:]}.jp2/full/full/0/default.jpg"',
-                        'corresp':'f"https://digi.vatlib.it/iiif/MSS_Pal.lat.585/canvas/p{str(self.iiif_image_id).zfill(4)}"',
-                        'ana':'f"/annotations/vatican-bav-pal-lat-585-annotation-p{str(self.iiif_image_id).zfill(4)}"'},
+                        'facs_url':'https://digi.vatlib.it/pub/digit/MSS_Pal.lat.585/iiif/Pal.lat.585_{iiif_image_id:0>4}_fa_{folio_number:0>4}{folio_side}.jp2/full/full/0/default.jpg',
+                        'corresp':'https://digi.vatlib.it/iiif/MSS_Pal.lat.585/canvas/p{iiif_image_id:0>4}',
+                        'ana':'/annotations/vatican-bav-pal-lat-585-annotation-p{iiif_image_id:0>4}'},
 
                     'Vb': {
                         'signatur': 'Vatikan, BAV, Pal. lat. 586',
@@ -159,7 +164,21 @@ manuscript_data = { 'F': {
                         'base_folder': '01_Transkription_BAV_Pal_lat_586',
                         'tei_base_id': 'vatican-bav-pal-lat-586-',
                         'iiif_scale_factor': 1,
-                        'facs_url':'f"https://digi.vatlib.it/pub/digit/MSS_Pal.lat.585/iiif/Pal.lat.586_{str(self.iiif_image_id).zfill(4)}_fa_{self.start_folio[:-1].zfill(4)+self.start_folio[-1:]}.jp2/full/full/0/default.jpg"',
-                        'corresp':'f"https://digi.vatlib.it/iiif/MSS_Pal.lat.586/canvas/p{str(self.iiif_image_id).zfill(4)}"',
-                        'ana':'f"/annotations/vatican-bav-pal-lat-586-annotation-p{str(self.iiif_image_id).zfill(4)}"'},
-}
\ No newline at end of file
+                        'facs_url':'https://digi.vatlib.it/pub/digit/MSS_Pal.lat.585/iiif/Pal.lat.586_{iiif_image_id:0>4}_fa_{folio_number:0>4}{folio_side}.jp2/full/full/0/default.jpg',
+                        'corresp':'https://digi.vatlib.it/iiif/MSS_Pal.lat.586/canvas/p{iiif_image_id:0>4}',
+                        'ana':'/annotations/vatican-bav-pal-lat-586-annotation-p{iiif_image_id:0>4}'},
+}
+# profiles for correcting the coordinates in tei:@facs with correct_coords.py
+#   scale_factor: factor for all coordinates, None for iiif_scale_factor of the manuscript (specify -siglum)
+#   offsets: (optional) added to x, y, w, h after scaling, only tei:@facs with four values are transformed then
+#   lines: (optional) take coordinates of tei:lb from the lines of the PAGE XML files
+#   elements: (optional) elements whose tei:@facs are transformed, predicates may only test attributes
+coordinate_transforms = {
+    'scale-3.6': {'scale_factor': 3.6,
+                  'elements': ['tei:label', 'tei:cb', 'tei:fw', 'tei:note[@type="inscription"]']},
+    'scale-3.6-lines': {'scale_factor': 3.6, 'lines': True,
+                        'elements': ['tei:label', 'tei:cb', 'tei:fw', 'tei:note[@type="inscription"]']},
+    'shift-3.6': {'scale_factor': 3.6, 'offsets': [-50, 140, 0, -160], 'elements': ['tei:*']},
+    'iiif': {'scale_factor': None, 'lines': True,
+             'elements': ['tei:label', 'tei:cb', 'tei:fw', 'tei:note[@type="inscription"]']},
+}
@@ -0,0 +1,129 @@
+""" Vectorised calculation of coordinates for tei:@facs
+
+Polygons of PAGE XML (Coords/@points and Baseline/@points, format "x1,y1 x2,y2 ... xn,yn") are parsed into a single
+NumPy array of points, together with the offset of the first point of every polygon. Bounding boxes, baselines and
+transformations of boxes are calculated for all polygons at once and returned as "x,y,w,h" strings.
+
+Results are the same as calculating every value with Python ints and floats: coordinates are scaled in double
+precision and truncated towards zero like int().
+
+"""
+
+import numpy as np # for vectorised calculations
+
+
+def parse_points(polygons):
+    """
+    Parses polygons into one array of points.
+
+    :param polygons: List of point strings ("x1,y1 x2,y2 ... xn,yn")
+    :return: Array of points with shape (number of points, 2), array of offsets of the first point of each polygon
+    :raises ValueError: If a polygon is empty or a point does not consist of two integers
+    """
+
+    counts = [polygon.count(' ') + 1 for polygon in polygons]
+    values = ' '.join(polygons).replace(',', ' ').split(' ')
+    if len(values) != 2 * sum(counts):
+        raise ValueError(f'Points must consist of two values: {polygons}')
+    points = np.array(values, dtype=np.int64).reshape(-1, 2)
+    offsets = np.zeros(len(polygons), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    return points, offsets
+
+
+def scale(values, scale_factor):
+    """ Scales values by a factor and truncates them towards zero (like int(value * scale_factor)) """
+
+    return np.trunc(values * float(scale_factor)).astype(np.int64)
+
+
+def format_boxes(boxes):
+    """
+    Formats boxes as strings.
+
+    :param boxes: Array with shape (number of boxes, 4)
+    :return: List of strings "x,y,w,h"
+    """
+
+    return [f'{x},{y},{w},{h}' for x, y, w, h in boxes.tolist()]
+
+
+def bounding_boxes(polygons, scale_factor, padding=0):
+    """
+    Calculates the scaled bounding boxes of polygons.
+
+    The corners of every box are scaled and truncated separately, width and height are calculated from the
+    truncated corners. If padding is given, the box is extended by padding to the top and width and height are
+    increased by padding.
+
+    :param polygons: List of point strings ("x1,y1 x2,y2 ... xn,yn")
+    :param scale_factor: Factor for scaling the coordinates
+    :param padding: Padding added to the top, to width and height
+    :return: List of strings "x,y,w,h"
+    """
+
+    if not polygons:
+        return []
+    points, offsets = parse_points(polygons)
+    minimum = scale(np.minimum.reduceat(points, offsets), scale_factor)
+    maximum = scale(np.maximum.reduceat(points, offsets), scale_factor)
+    boxes = np.column_stack((minimum[:, 0], minimum[:, 1] - padding,
+                             maximum[:, 0] - minimum[:, 0] + padding, maximum[:, 1] - minimum[:, 1] + padding))
+    return format_boxes(boxes)
+
+
+def baseline_boxes(polygons, scale_factor):
+    """
+    Calculates boxes around baselines from their first and last point.
+
+    The box starts 20 left of and 50 above the first point, is 80 wider than the distance between first and last
+    point (before scaling) and has a fixed height of 100.
+
+    :param polygons: List of point strings of baselines ("x1,y1 x2,y2 ... xn,yn")
+    :param scale_factor: Factor for scaling the coordinates
+    :return: List of strings "x,y,w,h"
+    """
+
+    if not polygons:
+        return []
+    points, offsets = parse_points(polygons)
+    first = points[offsets]
+    last = points[np.append(offsets[1:], len(points)) - 1]
+    start = scale(first, scale_factor)
+    boxes = np.column_stack((start[:, 0] - 20, start[:, 1] - 50, scale(last[:, 0] - first[:, 0] + 80, scale_factor),
+                             np.full(len(polygons), 100)))
+    return format_boxes(boxes)
+
+
+def transform_values(values, scale_factor, offsets=0):
+    """
+    Scales and shifts lists of values, e.g. the values of "x,y,w,h" strings.
+
+    Every value is multiplied by scale_factor, the offset of its position is added and the result is truncated
+    towards zero, e.g. int(x * 3.6 - 50) for scale_factor 3.6 and offset -50 of x.
+
+    :param values: List of strings of comma separated integers
+    :param scale_factor: Factor for scaling the values
+    :param offsets: Offset per position as list (all strings must have as many values) or one offset for all values
+    :return: List of strings of comma separated integers
+    :raises ValueError: If a value is no integer or a string has not as many values as offsets
+    """
+
+    if not values:
+        return []
+    rows = [value.split(',') for value in values]
+    counts = [len(row) for row in rows]
+    array = np.array([number for row in rows for number in row], dtype=np.int64)
+    if np.ndim(offsets):
+        if any(count != len(offsets) for count in counts):
+            raise ValueError(f'Values must consist of {len(offsets)} values')
+        offsets = np.tile(np.asarray(offsets, dtype=np.float64), len(values))
+    transformed = np.trunc(array * float(scale_factor) + offsets).astype(np.int64).tolist()
+
+    # ...split flat list of results into strings of the given lengths...
+    results = []
+    start = 0
+    for count in counts:
+        results.append(','.join(map(str, transformed[start:start + count])))
+        start += count
+    return results
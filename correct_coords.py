@@ -1,53 +1,128 @@
 from lxml import etree
+import argparse
+import collections
+import concurrent.futures
+import coordinates # vectorised calculation of coordinates
 import os
+import re
+import config # stores basic config (transform profiles)
+import page_model # text regions and lines of pageXML files
+import xpaths # precompiled XPath queries
+
+# namespace of TEI as used in tags
+tei = '{' + xpaths.namespaces['tei'] + '}'
+
+
+class ColumnTracker:
+    """
+    Tracks page and column of the tei:lb of a TEI document while walking over its elements in document order.
+
+    Elements inside tei:expan are skipped, tei:lb inside inscriptions as well. Page breaks and column breaks are
+    counted when they end, i.e. when they are on the preceding axis of all following elements. A tei:lb belongs to
+    column a of page i if at least i tei:pb and i-1 tei:cb[@n="b"] precede it, to column b of page i if
+    i tei:cb[@n="a"] and i tei:cb[@n="b"] precede it (the same conditions as the former XPath queries per page).
+
+    Attributes:
+        folios (list): Folios (tei:pb/@n) of the page breaks passed so far.
+
+    Methods:
+        columns(event, element): Updates counters and returns the columns of a tei:lb.
+        is_page_break(event, element): Checks, if an event is counted as page break.
+    """
+
+    def __init__(self):
+        self.folios = []
+        self.columns_a = 0
+        self.columns_b = 0
+        self.expan_depth = 0
+        self.inscription_depth = 0
+
+    def is_page_break(self, event, element):
+        """ Checks, if an event of iterwalk()/iterparse() is counted as page break """
+
+        return event == 'end' and element.tag == tei + 'pb' and not self.expan_depth
+
+    def columns(self, event, element):
+        """
+        Updates counters with an event of iterwalk()/iterparse() with the events 'start' and 'end'.
+
+        :param event: 'start' or 'end'
+        :param element: Element of the event
+        :return: List of tuples (page number, 'a' or 'b') the element belongs to, empty unless the element is a tei:lb,
+        column b of the preceding page comes first
+        """
+
+        if element.tag == tei + 'expan':
+            self.expan_depth += 1 if event == 'start' else -1
+        elif element.tag == tei + 'note' and element.get('type') == 'inscription':
+            self.inscription_depth += 1 if event == 'start' else -1
+        elif self.expan_depth:
+            pass
+        elif event == 'end':
+            if element.tag == tei + 'pb':
+                self.folios.append(element.get('n'))
+            elif element.tag == tei + 'cb' and element.get('n') == 'a':
+                self.columns_a += 1
+            elif element.tag == tei + 'cb' and element.get('n') == 'b':
+                self.columns_b += 1
+        elif element.tag == tei + 'lb' and not self.inscription_depth:
+            columns = []
+            if self.columns_a == self.columns_b:
+                columns.append((self.columns_b, 'b'))
+            if len(self.folios) > self.columns_b:
+                columns.append((self.columns_b + 1, 'a'))
+            return columns
+        return []
+
 
 class TeiCorrector:
     def __init__(self, tei_file_path, pagexml_dir, fileout, scale_factor=3.6):
         self.tei_tree = etree.parse(tei_file_path)
-        self.pagexml_files = sorted(os.listdir(pagexml_dir), key=lambda x: int(x.split('.')[0]))
+        self.pagexml_files = pagexml_files(pagexml_dir)
         print(self.pagexml_files, len(self.pagexml_files))
         self.pagexml_dir = pagexml_dir
         self.file_out = fileout
         self.scale_factor = scale_factor
-        self.ns = {
-            'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15',
-            'tei': 'http://www.tei-c.org/ns/1.0'
-        }
+        self.ns = xpaths.namespaces
         self.scale_factor = scale_factor
 
        
     def coords_text_region(self, coords):
-        x = float(self.scale_factor)
-        
-        coords_list_left = []
-        coords_list_right = []
-        coord = coords.split(' ')
-        for e in coord:
-            e = e.split(',')
-            coords_list_left.append(int(e[0]))
-            coords_list_right.append(int(e[1]))
+        return coordinates.bounding_boxes([coords], self.scale_factor)[0]
 
-        c1 = int(min(coords_list_left) * x)
-        w = max(coords_list_left)
-        w = int(w * x)
-        w = w - c1
+    def coords_text_regions(self, lines):
+        """ Calculates the bounding boxes of the first Coords/@points of many lines at once """
 
-        c2 = min(coords_list_right)
-        c2 = int(c2 * x)
-        h = max(coords_list_right)
-        h = int(h * x)
-        h = h - c2
+        return coordinates.bounding_boxes([line.coords[0] for line in lines], self.scale_factor)
 
-        coord_string = str(c1) + ',' + str(c2) + ',' + str(w) + ',' + str(h)
-        return coord_string
 
+    def group_lines(self):
+        """ Groups tei:lb by page and column in a single walk over the TEI tree, see ColumnTracker
+
+        :return: List of tei:pb, dictionaries of page number and list of tei:lb of column a and b
+        """
+
+        tracker = ColumnTracker()
+        page_breaks = []
+        lines_column_a = collections.defaultdict(list)
+        lines_column_b = collections.defaultdict(list)
+        for event, element in etree.iterwalk(self.tei_tree, events=('start', 'end')):
+            if tracker.is_page_break(event, element):
+                page_breaks.append(element)
+            for page_number, column in tracker.columns(event, element):
+                if column == 'a':
+                    lines_column_a[page_number].append(element)
+                else:
+                    lines_column_b[page_number].append(element)
+        return page_breaks, lines_column_a, lines_column_b
 
     def correct_lines(self):
+        page_breaks, lines_column_a, lines_column_b = self.group_lines()
         i = 1
         for pagexml_file in self.pagexml_files:
-            pagexml_tree = etree.parse(f'{self.pagexml_dir}/{pagexml_file}')
+            page = page_model.read_page_regions(f'{self.pagexml_dir}/{pagexml_file}')
                 
-            folio = self.tei_tree.xpath(f'(//tei:pb[not(ancestor::tei:expan)])[{i}]', namespaces = {'tei':'http://www.tei-c.org/ns/1.0'})[0].attrib['n']
+            folio = page_breaks[i - 1].attrib['n']
                 
 
             print(f"==================  {i, folio, pagexml_file}  =========================")            
@@ -56,19 +131,17 @@ class TeiCorrector:
             try:
             
                 # get column 1 in TEI
-                cb_a = self.tei_tree.xpath(f'.//tei:lb[preceding::tei:pb[not(ancestor::tei:expan)][{i}] and count(preceding::tei:cb[@n="b"][not(ancestor::tei:expan)]) = {i-1} and not(ancestor::tei:expan) and not(ancestor::tei:note[@type="inscription"])]', namespaces = {'tei':'http://www.tei-c.org/ns/1.0'})
+                cb_a = lines_column_a[i]
                 for k in cb_a:
                     if 'n' not in k.attrib:
                         print(etree.tostring(k))
                 # get column 1 in PageXML
-                column_1 = pagexml_tree.xpath('//ns0:TextRegion[contains(@custom,"type:column_1")]', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-                lines_column_1 = column_1.xpath('.//ns0:TextLine', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+                column_1 = page_model.find_text_regions(page, custom_type='column_1')[0]
+                lines_column_1 = column_1.lines
                 print(f"Spalte a: {len(cb_a), len(lines_column_1)}")
 
                 # loop through cb_a and lines_column_1 and print the coords
-                for k,y in zip(cb_a,lines_column_1):
-                    coords = y.xpath('./ns0:Coords/@points', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-                    coord_string = self.coords_text_region(coords)
+                for k,coord_string in zip(cb_a,self.coords_text_regions(lines_column_1[:len(cb_a)])):
                     #try:
                         #print(k.attrib['n'], k.attrib['facs'] + ";" + y.attrib['custom'],coord_string) 
                     #except:
@@ -82,13 +155,11 @@ class TeiCorrector:
             try:
     
                 # get column b in TEI
-                cb_b = self.tei_tree.xpath(f'.//tei:lb[count(preceding::tei:cb[@n="b"][not(ancestor::tei:expan)]) = {i} and count(preceding::tei:cb[@n="a"][not(ancestor::tei:expan)]) = {i} and not(ancestor::tei:expan) and not(ancestor::tei:note[@type="inscription"])]', namespaces = {'tei':'http://www.tei-c.org/ns/1.0'})
-                column_2 = pagexml_tree.xpath('//ns0:TextRegion[contains(@custom,"type:column_2")]', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-                lines_column_2 = column_2.xpath('.//ns0:TextLine', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+                cb_b = lines_column_b[i]
+                column_2 = page_model.find_text_regions(page, custom_type='column_2')[0]
+                lines_column_2 = column_2.lines
                 print(f"Spalte b: {len(cb_b), len(lines_column_2)}")
-                for k,y in zip(cb_b,lines_column_2):
-                    coords = y.xpath('./ns0:Coords/@points', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
-                    coord_string = self.coords_text_region(coords)
+                for k,coord_string in zip(cb_b,self.coords_text_regions(lines_column_2[:len(cb_b)])):
                     #try:
                         #print(k.attrib['n'], k.attrib['facs'] + ";" + y.attrib['custom'],coord_string) 
                     #except:
@@ -105,11 +176,10 @@ class TeiCorrector:
         
     def correct_other_elements(self,xpath):
         print(xpath)
-        elements = self.tei_tree.xpath(xpath, namespaces = {'tei':'http://www.tei-c.org/ns/1.0'})
-        for element in elements:
-            coords = element.attrib['facs']
-            coords_int = coords.split(',')
-            coords_string = ','.join([str(int(int(x) * self.scale_factor)) for x in coords_int])
+        elements = self.tei_tree.xpath(xpath, namespaces = self.ns)
+        coords_strings = coordinates.transform_values([element.attrib['facs'] for element in elements],
+                                                      self.scale_factor)
+        for element, coords_string in zip(elements, coords_strings):
             element.set('facs',coords_string)
             print(coords_string)
 
@@ -117,14 +187,303 @@ class TeiCorrector:
         self.tei_tree.write(self.file_out, pretty_print=True)
 
 
-# use the class
-file_in = os.path.join(os.getcwd(), 'coords','bamberg-sb-c-6-20.xml') 
-file_out = os.path.join(os.getcwd(), 'coords','bamberg-sb-c-6-20_new.xml')
-path_to_pagexml = os.path.join(os.getcwd(), 'coords','20')
-tei_corrector = TeiCorrector(file_in, path_to_pagexml,file_out)
-#tei_corrector.correct_lines()
-tei_corrector.correct_other_elements('//tei:label')
-tei_corrector.correct_other_elements('//tei:cb')
-tei_corrector.correct_other_elements('//tei:fw')
-tei_corrector.correct_other_elements('//tei:note[@type="inscription"]')
-tei_corrector.write_file()
+class TransformProfile:
+    """
+    Transformation of the coordinates in tei:@facs as declared in config.coordinate_transforms.
+
+    Attributes:
+        name (str): Name of the profile.
+        scale_factor (float): Factor for all coordinates.
+        offsets (list): Offsets added to x, y, w, h after scaling or None. If given, only tei:@facs with four values are
+            transformed.
+        lines (bool): Take the coordinates of tei:lb from the lines of the PAGE XML files?
+        elements (list): Element names with optional predicates (e.g. 'tei:note[@type="inscription"]'), whose
+            tei:@facs are transformed.
+
+    Methods:
+        matches(element): Checks, if tei:@facs of an element is transformed.
+        transform(values): Transforms values of tei:@facs.
+    """
+
+    def __init__(self, name, scale_factor, offsets=None, lines=False, elements=()):
+        self.name = name
+        self.scale_factor = float(scale_factor)
+        self.offsets = list(offsets) if offsets is not None else None
+        if self.offsets is not None and len(self.offsets) != 4:
+            raise ValueError(f'Transform profile {name}: offsets must contain four values (x, y, w, h)')
+        self.lines = lines
+        self.elements = list(elements)
+        try:
+            # elements are tested at their start tag, predicates can only use attributes
+            self.queries = [xpaths.compile_xpath(f'self::{element}') for element in self.elements]
+        except etree.XPathSyntaxError as e:
+            raise ValueError(f'Transform profile {name}: invalid element in {self.elements}: {e}') from e
+
+    def __reduce__(self):
+        # compiled queries cannot be pickled, they are compiled again in worker processes
+        return TransformProfile, (self.name, self.scale_factor, self.offsets, self.lines, self.elements)
+
+    def matches(self, element):
+        """ Checks, if tei:@facs of an element is transformed """
+
+        return 'facs' in element.attrib and any(query(element) for query in self.queries)
+
+    def transform(self, values):
+        """
+        Transforms values of tei:@facs.
+
+        :param values: List of strings of comma separated integers
+        :return: List of transformed strings
+        """
+
+        # ...values without comma (e.g. URLs) are left, with offsets only values x,y,w,h are transformed...
+        selected = [number for number, value in enumerate(values)
+                    if (value.count(',') == 3 if self.offsets is not None else ',' in value)]
+        results = list(values)
+        transformed = coordinates.transform_values([values[number] for number in selected], self.scale_factor,
+                                                   self.offsets if self.offsets is not None else 0)
+        for number, value in zip(selected, transformed):
+            results[number] = value
+        return results
+
+
+def transform_profile(name, sigla=None):
+    """
+    Returns a transform profile declared in config.coordinate_transforms.
+
+    :param name: Name of the profile
+    :param sigla: Siglum of the manuscript, required if the profile has no scale_factor (iiif_scale_factor of the
+    manuscript is used then)
+    :return: TransformProfile
+    :raises ValueError: If the profile is unknown or invalid
+    """
+
+    profiles = getattr(config, 'coordinate_transforms', {})
+    if name not in profiles:
+        raise ValueError(f'Unknown transform profile {name}, config.coordinate_transforms declares '
+                         f'{", ".join(profiles) or "no profiles"}')
+    settings = dict(profiles[name])
+    if settings.get('scale_factor') is None:
+        if sigla is None:
+            raise ValueError(f'Transform profile {name} uses iiif_scale_factor of the manuscript, specify -siglum')
+        settings['scale_factor'] = config.manuscript_data[sigla]['iiif_scale_factor']
+    return TransformProfile(name, **settings)
+
+
+def pagexml_files(pagexml_dir):
+    """ Lists the PAGE XML files of a folder in order of their page number (e.g. 1.xml, 2.xml, ...) """
+
+    return sorted(os.listdir(pagexml_dir), key=lambda x: int(x.split('.')[0]))
+
+
+def collect_corrections(tei_file_path, pagexml_dir, profile):
+    """
+    Calculates the corrected tei:@facs of a TEI file in a single streaming pass.
+
+    The TEI file is read with iterparse(), elements are cleared when they have been passed, so only the current branch
+    of the tree is kept in memory. tei:lb are grouped by page and column with ColumnTracker and take the coordinates
+    of the line at the same position in the column of the PAGE XML file (the first Coords/@points of the line, scaled,
+    without offsets); they are not transformed again. Pages are read when they are reached. All coordinates are
+    calculated at once at the end.
+
+    :param tei_file_path: Path to TEI file
+    :param pagexml_dir: Folder of the PAGE XML files of the book (one file per page), only used if profile.lines
+    :param profile: TransformProfile
+    :return: Dictionary of element numbers (position in document order, starting at 0) and tei:@facs, list of
+    tuples (folio, column, number of tei:lb, number of PAGE XML lines or None if the column is missing)
+    """
+
+    files = pagexml_files(pagexml_dir) if profile.lines else []
+    tracker = ColumnTracker()
+    column_lines = {}
+    counted_lines = collections.Counter()
+    folios = {}
+    lines = {}
+    elements = {}
+    number = -1
+    for event, element in etree.iterparse(tei_file_path, events=('start', 'end')):
+        if event == 'end':
+            tracker.columns(event, element)
+            # ...forget passed elements, tail is kept for serialisation...
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+            continue
+
+        number += 1
+        # ...page 0 contains tei:lb before the first tei:cb, pages without PAGE XML file are left...
+        for column in [column for column in tracker.columns(event, element) if 1 <= column[0] <= len(files)]:
+            if column not in column_lines:
+                column_lines[column] = read_column(os.path.join(pagexml_dir, files[column[0] - 1]), column[1])
+                folios[column] = tracker.folios[column[0] - 1] if column[0] <= len(tracker.folios) else None
+            if column_lines[column] is not None and counted_lines[column] < len(column_lines[column]):
+                lines[number] = column_lines[column][counted_lines[column]]
+            counted_lines[column] += 1
+        if number not in lines and profile.matches(element):
+            elements[number] = element.attrib['facs']
+
+    corrections = dict(zip(elements, profile.transform(list(elements.values()))))
+    corrections.update(zip(lines, coordinates.bounding_boxes(list(lines.values()), profile.scale_factor)))
+    report = [(folios[column], column[1], counted_lines[column],
+               len(column_lines[column]) if column_lines[column] is not None else None)
+              for column in sorted(column_lines)]
+    return corrections, report
+
+
+def read_column(pagexml_file, column):
+    """
+    Reads the points of the lines of a column of a PAGE XML file.
+
+    :param pagexml_file: Path to PAGE XML file
+    :param column: 'a' (column_1) or 'b' (column_2)
+    :return: List of the first Coords/@points of every line, None if the column is missing
+    """
+
+    page = page_model.read_page_regions(pagexml_file)
+    regions = page_model.find_text_regions(page, custom_type='column_1' if column == 'a' else 'column_2')
+    if not regions:
+        return None
+    return [line.coords[0] for line in regions[0].lines]
+
+
+# markup of an XML document, start tags are captured with their name and attributes
+xml_markup = re.compile(rb'''<!--.*?-->|<\?.*?\?>|<!\[CDATA\[.*?\]\]>|<!DOCTYPE[^\[>]*(?:\[.*?\])?\s*>|'''
+                        rb'''<([^\s/>!?]+)((?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|'[^']*'))*)\s*/?>''', flags=re.DOTALL)
+# tei:@facs in the attributes of a start tag
+facs_attribute = re.compile(rb'''(\sfacs\s*=\s*)(["'])(.*?)\2''', flags=re.DOTALL)
+
+
+def write_corrections(tei_file_path, file_out, corrections):
+    """
+    Writes a copy of a TEI file with corrected tei:@facs.
+
+    Only the values of tei:@facs are replaced in the source of the TEI file, so everything else stays unchanged
+    (encoding, whitespace, order of attributes, comments, entities).
+
+    :param tei_file_path: Path to TEI file
+    :param file_out: Path to output file
+    :param corrections: Dictionary of element numbers and tei:@facs, see collect_corrections()
+    :raises ValueError: If the start tags of the source do not correspond to the elements read by collect_corrections()
+    """
+
+    with open(tei_file_path, 'rb') as tei_file:
+        source = tei_file.read()
+
+    parts = []
+    position = 0
+    number = -1
+    for markup in xml_markup.finditer(source):
+        if markup.group(1) is None:
+            continue
+        number += 1
+        if number not in corrections:
+            continue
+        value = corrections[number].encode('ascii')
+        attributes = markup.group(2)
+        facs = facs_attribute.search(attributes)
+        if facs:
+            attributes = attributes[:facs.start(3)] + value + attributes[facs.end(3):]
+        else:
+            attributes = attributes + b' facs="' + value + b'"'
+        parts.append(source[position:markup.start(2)])
+        parts.append(attributes)
+        position = markup.end(2)
+    parts.append(source[position:])
+
+    if corrections and max(corrections) > number:
+        raise ValueError(f'{tei_file_path}: found {number + 1} start tags, but element {max(corrections)} was corrected')
+
+    with open(file_out, 'wb') as output_file:
+        output_file.write(b''.join(parts))
+
+
+def correct_file(tei_file_path, pagexml_dir, file_out, profile):
+    """
+    Corrects the coordinates in tei:@facs of a TEI file, see collect_corrections() and write_corrections().
+
+    :param tei_file_path: Path to TEI file
+    :param pagexml_dir: Folder of the PAGE XML files of the book
+    :param file_out: Path to output file
+    :param profile: TransformProfile
+    :return: Dictionary with file, output, number of corrected elements and columns with different numbers of lines
+    """
+
+    corrections, report = collect_corrections(tei_file_path, pagexml_dir, profile)
+    write_corrections(tei_file_path, file_out, corrections)
+    mismatches = [(folio, column, counted, found) for folio, column, counted, found in report if counted != found]
+    return {'file': tei_file_path, 'output': file_out, 'corrected': len(corrections), 'mismatches': mismatches}
+
+
+def default_pagexml_dir(tei_file_path):
+    """ Returns the folder of the PAGE XML files of a TEI file, e.g. coords/20 for coords/bamberg-sb-c-6-20.xml and
+    coords/6 for coords/bamberg-sb-c-6-06.xml """
+
+    folder, file_name = os.path.split(tei_file_path)
+    book = re.search(r'(\d+)$', os.path.splitext(file_name)[0])
+    if book is None:
+        raise ValueError(f'Book number not found in {file_name}, specify -pagexml')
+    for candidate in (book.group(1), str(int(book.group(1)))):
+        if os.path.isdir(os.path.join(folder, candidate)):
+            return os.path.join(folder, candidate)
+    return os.path.join(folder, str(int(book.group(1))))
+
+
+def default_output_file(tei_file_path, output_dir=None):
+    """ Returns the output file of a TEI file, e.g. coords/bamberg-sb-c-6-20_new.xml """
+
+    folder, file_name = os.path.split(tei_file_path)
+    stem, extension = os.path.splitext(file_name)
+    return os.path.join(output_dir or folder, f'{stem}_new{extension}')
+
+
+def main(arguments=None, profile_name=None, prog=None):
+    """
+    Command line interface, see README.md.
+
+    :param arguments: Command line arguments, sys.argv[1:] if None
+    :param profile_name: Transform profile used instead of the positional argument 'profile' (e.g. by coords.py)
+    :param prog: Name of the program in the help message
+    """
+
+    if profile_name is None:
+        parser = argparse.ArgumentParser(prog=prog, description='Correction of the coordinates in tei:@facs of TEI '
+                                                                'files.')
+        parser.add_argument('profile', help='Transform profile as declared in config.coordinate_transforms')
+    else:
+        parser = argparse.ArgumentParser(prog=prog, description=f'Correction of the coordinates in tei:@facs of TEI '
+                                                                f'files with transform profile {profile_name}.')
+    parser.add_argument('files', nargs='+', help='TEI files, e.g. coords/bamberg-sb-c-6-20.xml')
+    parser.add_argument('-pagexml', '--pagexml', help='Folder of the PAGE XML files (default: folder named after the '
+                                                      'book next to every TEI file, e.g. coords/20)')
+    parser.add_argument('-out', '--out', help='Output folder (default: folder of the TEI file, suffix _new)')
+    parser.add_argument('-siglum', '--siglum', help='Siglum of the manuscript for iiif_scale_factor')
+    parser.add_argument('-workers', '--workers', help='Number of worker processes', type=int, default=os.cpu_count())
+    args = parser.parse_args(arguments)
+
+    profile = transform_profile(profile_name or args.profile, args.siglum)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {}
+        for tei_file_path in args.files:
+            pagexml_dir = args.pagexml or (default_pagexml_dir(tei_file_path) if profile.lines else None)
+            future = executor.submit(correct_file, tei_file_path, pagexml_dir,
+                                     default_output_file(tei_file_path, args.out), profile)
+            futures[future] = tei_file_path
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f'failed {futures[future]}: {type(e).__name__}: {e}')
+                continue
+            print(f"    ok {result['file']} -> {result['output']}: {result['corrected']} elements corrected")
+            for folio, column, counted, found in result['mismatches']:
+                print(f'       {folio}{column}: {counted} tei:lb, {found} lines in PAGE XML')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,268 @@
+""" Indexed in-memory lexicon of word forms
+
+Loads the word forms (column 'WF-Name') of lexicon.csv in the resources folder specified in config.py once per process
+and provides exact lookups using a hashed set as well as substring, prefix and suffix searches using a suffix array.
+The index is stored as binary file 'lexicon.pickle' next to lexicon.csv, so the csv file has to be parsed and indexed
+only once per machine. The binary file is rebuilt automatically if lexicon.csv has changed.
+
+"""
+
+import os # handles filenames in folder
+import pickle # for storing prebuilt index
+import functools # for loading lexicon only once
+from array import array # compact storage of suffix array
+from bisect import bisect_left # binary search in suffix array
+import pandas as pd # for reading lexicon.csv
+import config # stores basic config
+
+# version of the binary format, increase if Lexicon changes
+index_version = 1
+
+
+class Lexicon:
+    """
+    Represents a lexicon of word forms with indices for fast lookups.
+
+    All word forms are stored in a single string, separated and enclosed by newlines. The suffix array contains the
+    offsets of all suffixes of this string, sorted alphabetically up to the end of the respective word form. As every
+    word form is enclosed by newlines, searching '\\n' + prefix finds word forms starting with prefix, searching
+    suffix + '\\n' finds word forms ending with suffix.
+
+    Attributes:
+        text (str): All word forms, separated and enclosed by newlines.
+        suffix_array (array): Offsets of the suffixes of text in sorted order.
+        word_forms (set): All word forms for exact lookups.
+        trie (dict): Nested dictionaries of characters over all word forms, built on first use.
+
+    Methods:
+        from_word_forms(word_forms): Creates lexicon and index from an iterable of word forms.
+        from_csv(filename): Creates lexicon from the column 'WF-Name' of a csv file.
+        load(filename): Loads lexicon from prebuilt binary file.
+        save(filename, source_stamp): Saves lexicon as binary file.
+        contains(substring): Checks, if any word form contains substring.
+        startswith(prefix): Checks, if any word form starts with prefix.
+        endswith(suffix): Checks, if any word form ends with suffix.
+        segment(word): Splits a word into the fewest possible word forms.
+    """
+
+    # key marking the end of a word form in the trie
+    end_of_word = ''
+
+    def __init__(self, text, suffix_array):
+        """
+        Initializes a Lexicon from its text and suffix array.
+
+        Args:
+            text (str): Word forms, separated and enclosed by newlines.
+            suffix_array (array): Sorted offsets of the suffixes of text.
+        """
+
+        self.text = text
+        self.suffix_array = suffix_array
+        self.word_forms = set(text[1:-1].split('\n')) if len(text) > 1 else set()
+        self._trie = None
+
+    def __contains__(self, word):
+        return word in self.word_forms
+
+    def __len__(self):
+        return len(self.word_forms)
+
+    @classmethod
+    def from_word_forms(cls, word_forms):
+        """
+        Creates lexicon and suffix array from an iterable of word forms.
+
+        :param word_forms: Iterable of word forms as strings
+        :return: Lexicon
+        """
+
+        word_forms = sorted({word for word in word_forms if word and '\n' not in word})
+        text = '\n' + ''.join(word + '\n' for word in word_forms)
+
+        # ...end of the word form every offset belongs to (including the closing newline)...
+        ends = []
+        offset = 0
+        for word in word_forms:
+            end = offset + len(word) + 2
+            ends.extend([end] * (len(word) + 1))
+            offset = end - 1
+
+        # ...sort offsets of all suffixes alphabetically up to the end of their word form...
+        suffix_array = array('I', sorted(range(len(text) - 1), key=lambda i: text[i:ends[i]]))
+        return cls(text, suffix_array)
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Creates lexicon from the column 'WF-Name' of a csv file.
+
+        :param filename: Path to csv file as string
+        :return: Lexicon
+        """
+
+        df = pd.read_csv(filename)
+        return cls.from_word_forms(df['WF-Name'].dropna().astype(str))
+
+    @classmethod
+    def load(cls, filename, source_stamp=None):
+        """
+        Loads lexicon from prebuilt binary file.
+
+        :param filename: Path to binary file as string
+        :param source_stamp: If given, the file is only used if it was built from a source with this stamp
+        :return: Lexicon or None if file is missing, outdated or unreadable
+        """
+
+        try:
+            with open(filename, 'rb') as index_file:
+                data = pickle.load(index_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if data.get('version') != index_version:
+            return None
+        if source_stamp is not None and data.get('source_stamp') != source_stamp:
+            return None
+        return cls(data['text'], data['suffix_array'])
+
+    def save(self, filename, source_stamp=None):
+        """
+        Saves lexicon as binary file (written to temporary file first, so parallel processes never read half a file).
+
+        :param filename: Path to binary file as string
+        :param source_stamp: Stamp of the source the lexicon was built from (see source_stamp())
+        """
+
+        data = {'version': index_version, 'source_stamp': source_stamp, 'text': self.text,
+                'suffix_array': self.suffix_array}
+        temporary_filename = f'{filename}.{os.getpid()}.tmp'
+        with open(temporary_filename, 'wb') as index_file:
+            pickle.dump(data, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_filename, filename)
+
+    @property
+    def trie(self):
+        if self._trie is None:
+            # ...build trie once, only needed for segmentation...
+            trie = {}
+            for word in self.word_forms:
+                node = trie
+                for character in word:
+                    node = node.setdefault(character, {})
+                node[self.end_of_word] = True
+            self._trie = trie
+        return self._trie
+
+    def _key(self, offset, length):
+        # ...suffix at offset cut at the end of its word form, maximum length characters...
+        end = self.text.find('\n', offset + 1) + 1
+        return self.text[offset:min(offset + length, end)]
+
+    def contains(self, substring):
+        """
+        Checks, if any word form contains substring (corresponds to pandas str.contains() on the word forms).
+
+        :param substring: String to be searched
+        :return: True if substring is part of any word form
+        """
+
+        if not substring:
+            return len(self) > 0
+        length = len(substring)
+        index = bisect_left(self.suffix_array, substring, key=lambda offset: self._key(offset, length))
+        return index < len(self.suffix_array) and self._key(self.suffix_array[index], length) == substring
+
+    def startswith(self, prefix):
+        """
+        Checks, if any word form starts with prefix.
+
+        :param prefix: String to be searched
+        :return: True if any word form starts with prefix
+        """
+
+        return self.contains('\n' + prefix)
+
+    def endswith(self, suffix):
+        """
+        Checks, if any word form ends with suffix.
+
+        :param suffix: String to be searched
+        :return: True if any word form ends with suffix
+        """
+
+        return self.contains(suffix + '\n')
+
+    def segment(self, word):
+        """
+        Splits a word into the fewest possible word forms of the lexicon (dynamic programming over all split points).
+
+        Every position of the word is reached with the lowest number of word forms needed to cover the word up to
+        this position, walking the trie from each reachable position finds all word forms starting there. Among
+        segmentations with the same number of parts the one with the longest last part is chosen.
+
+        :param word: String to be segmented
+        :return: List of parts, [word] if word is a word form itself or cannot be segmented completely
+        """
+
+        if not word or word in self.word_forms:
+            return [word]
+
+        # ...best[i] is (number of parts, start of last part) for word[:i]...
+        best = [None] * (len(word) + 1)
+        best[0] = (0, 0)
+        for start in range(len(word)):
+            if best[start] is None:
+                continue
+            parts = best[start][0] + 1
+            node = self.trie
+            for end in range(start + 1, len(word) + 1):
+                node = node.get(word[end - 1])
+                if node is None:
+                    break
+                if self.end_of_word in node and (best[end] is None or parts < best[end][0]):
+                    best[end] = (parts, start)
+
+        if best[-1] is None:
+            return [word]
+
+        # ...follow start positions back from the end of the word...
+        segments = []
+        end = len(word)
+        while end > 0:
+            start = best[end][1]
+            segments.append(word[start:end])
+            end = start
+        return segments[::-1]
+
+
+def source_stamp(filename):
+    """ Returns size and modification time of a file for detecting changes """
+
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+@functools.lru_cache(maxsize=None)
+def load_lexicon(filename=None):
+    """ Load lexicon once per process
+
+    Loads the prebuilt binary lexicon next to lexicon.csv in the resources folder specified in config.py.
+    If it is missing or lexicon.csv has changed, the lexicon is built from lexicon.csv and the binary file is written.
+
+    :param filename: Path to lexicon csv file as string, defaults to lexicon.csv in resources folder
+    :return: Lexicon
+    """
+
+    if filename is None:
+        filename = config.resources_folder + 'lexicon.csv'
+    index_filename = os.path.splitext(filename)[0] + '.pickle'
+
+    stamp = source_stamp(filename)
+    lexicon = Lexicon.load(index_filename, stamp)
+    if lexicon is None:
+        lexicon = Lexicon.from_csv(filename)
+        try:
+            lexicon.save(index_filename, stamp)
+        except OSError as e:
+            print(f'Could not save prebuilt lexicon: {e}')
+    return lexicon
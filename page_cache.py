@@ -0,0 +1,106 @@
+""" Persistent cache of converted PAGE XML pages
+
+Stores the result of ManuscriptToProcess.convert_page() (TEI fragment and label/inscription tables) per page on disk.
+Keys are built from the content of the PAGE XML file, the position of the page (folio and IIIF image id) and the
+settings the conversion depends on (manuscript data from config.py, abbreviation dictionary version, cache format).
+If a book is rebuilt, only pages whose PAGE XML or settings have changed have to be parsed and converted again.
+
+"""
+
+import os # handles filenames in folder
+import pickle # for storing converted pages
+import hashlib # for building keys
+
+# version of cached data, increase if conversion of pages changes
+cache_version = 1
+
+
+def file_hash(filename):
+    """ Returns SHA-256 hash of the content of a file or None if the file does not exist """
+
+    try:
+        with open(filename, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class PageCache:
+    """
+    Represents a folder of cached page conversions.
+
+    Attributes:
+        folder (str): Folder containing the cached pages.
+        settings_hash (str): Hash of all settings the conversion depends on.
+        hits (int): Number of pages loaded from cache.
+        misses (int): Number of pages not found in cache.
+
+    Methods:
+        key(pagexml, folio, iiif_image_id): Builds key of a page.
+        load(key): Loads cached conversion of a page.
+        save(key, page): Saves conversion of a page.
+    """
+
+    def __init__(self, folder, settings):
+        """
+        Initializes a PageCache.
+
+        Args:
+            folder (str): Folder containing the cached pages, created if necessary.
+            settings: Settings the conversion depends on, e.g. a dictionary of config values (must have stable repr).
+        """
+
+        self.folder = folder
+        self.settings_hash = hashlib.sha256(repr((cache_version, settings)).encode('utf8')).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, pagexml, folio, iiif_image_id):
+        """
+        Builds key of a page from the content of its PAGE XML file, its position and the settings.
+
+        :param pagexml: Content of PAGE XML file as bytes
+        :param folio: Folio number of the page
+        :param iiif_image_id: IIIF image id of the page
+        :return: Key as hex string
+        """
+
+        key = hashlib.sha256(pagexml)
+        key.update(repr((folio, iiif_image_id, self.settings_hash)).encode('utf8'))
+        return key.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key + '.pickle')
+
+    def load(self, key):
+        """
+        Loads cached conversion of a page.
+
+        :param key: Key as returned by key()
+        :return: Conversion as returned by ManuscriptToProcess.convert_page() or None if not cached
+        """
+
+        try:
+            with open(self._path(key), 'rb') as cache_file:
+                page = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return page
+
+    def save(self, key, page):
+        """
+        Saves conversion of a page (written to temporary file first, so parallel processes never read half a file).
+
+        :param key: Key as returned by key()
+        :param page: Conversion as returned by ManuscriptToProcess.convert_page()
+        """
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as cache_file:
+            pickle.dump(page, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
@@ -0,0 +1,107 @@
+""" Page model of PAGE XML files
+
+Reads the text regions and text lines of a PAGE XML file in a single streaming pass into named tuples, so consumers
+can select regions by type and access lines with their text and coordinates without querying the tree themselves.
+All queries use the precompiled XPath expressions of xpaths.py.
+
+"""
+
+import collections # for page model
+import lxml.etree as LET # for parsing xml data
+import xpaths # precompiled XPath queries
+
+# namespace of pageXML elements
+pagexml_namespace = '{' + xpaths.namespaces['ns0'] + '}'
+
+
+# pageXML file as read by read_page_regions()
+PageRegions = collections.namedtuple('PageRegions', ['page_number', 'regions', 'texts'])
+# TextRegion of a pageXML file, text and baselines are collected from all lines of the region
+PageTextRegion = collections.namedtuple('PageTextRegion', ['type', 'custom', 'coords', 'lines', 'text', 'baselines',
+                                                           'has_markup', 'xml', 'id'])
+# TextLine of a pageXML file
+PageTextLine = collections.namedtuple('PageTextLine', ['coords', 'baselines', 'text'])
+
+
+def read_page_regions(pagexml_file):
+    """ Read text regions and text lines of a pageXML file in a single streaming pass
+
+    Every TextRegion and TextLine is visited once using iterparse and freed after its (outermost) region has been
+    read, so the consumers do not have to search the whole tree with XPath several times per page. The fields
+    correspond to the XPath queries used before (lists of strings in document order):
+
+    - PageTextRegion.coords: ./Coords/@points
+    - PageTextRegion.lines: .//TextLine
+    - PageTextRegion.text: .//TextLine/TextEquiv/Unicode/text()
+    - PageTextRegion.baselines: .//TextLine//Baseline/@points
+    - PageTextRegion.has_markup: "structure {type:" contained in serialised region, which is kept as xml if not
+      (the region is only serialised if its @custom does not contain it)
+    - PageTextRegion.id: @id
+    - PageTextLine.coords, baselines and text: ./Coords/@points, .//Baseline/@points, ./TextEquiv/Unicode/text()
+    - PageRegions.texts: text of all Unicode elements of the page (.//Unicode, i.e. inside TextRegions)
+
+    :param pagexml_file: Path to pageXML file or binary file object
+    :return: PageRegions with page number (@pageNr of TranskribusMetadata) and TextRegions in document order
+    """
+
+    page_number = None
+    regions = []
+    texts = []
+
+    region_tag = pagexml_namespace + 'TextRegion'
+    tags = [region_tag, pagexml_namespace + 'TranskribusMetadata']
+    for _, element in LET.iterparse(pagexml_file, tag=tags):
+        if element.tag != region_tag:
+            if page_number is None:
+                page_number = element.get('pageNr')
+            continue
+        # ...nested regions are read with their outermost region...
+        if next(element.iterancestors(region_tag), None) is not None:
+            continue
+
+        lines = {}
+        for region in element.iter(region_tag):
+            region_lines = []
+            for line in region.iter(pagexml_namespace + 'TextLine'):
+                if line not in lines:
+                    lines[line] = PageTextLine(xpaths.coords_points(line), xpaths.baseline_points(line),
+                                               xpaths.text_equiv_text(line))
+                region_lines.append(lines[line])
+
+            custom = region.get('custom', '')
+            # ...serialise region only if markup is not found in its own attribute...
+            xml = None
+            has_markup = 'structure {type:' in custom
+            if not has_markup:
+                xml = LET.tostring(region, encoding='unicode', method='xml', with_tail=False)
+                has_markup = 'structure {type:' in xml
+                if has_markup:
+                    xml = None
+            regions.append(PageTextRegion(
+                region.get('type', ''), custom, xpaths.coords_points(region), region_lines,
+                [text for line in region_lines for text in line.text],
+                [baseline for line in region_lines for baseline in line.baselines], has_markup, xml,
+                region.get('id', '')))
+        texts.extend(unicode.text for unicode in element.iter(pagexml_namespace + 'Unicode'))
+
+        # ...free region and everything read before...
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    return PageRegions(page_number, regions, texts)
+
+
+def find_text_regions(page, region_type=None, custom_type=None):
+    """ Find text regions by type
+
+    :param page: PageRegions as returned by read_page_regions()
+    :param region_type: Part of @type, e.g. 'header' (corresponds to TextRegion[contains(@type,"header")])
+    :param custom_type: Structure type in @custom, e.g. 'column_1' (corresponds to
+        TextRegion[contains(@custom,"type:column_1")])
+    :return: List of PageTextRegion in document order
+    """
+
+    return [region for region in page.regions
+            if (region_type is None or region_type in region.type) and
+            (custom_type is None or f'type:{custom_type}' in region.custom)]
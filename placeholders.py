@@ -0,0 +1,297 @@
+""" Resolution of the placeholders of chapters, interrogations and the table of contents
+
+While converting PAGE XML into TEI (see bdd.ManuscriptToProcess), entries of the table of contents are marked by ~n~,
+interrogations by *in* and chapters by *n*. Their labels and inscriptions are collected per page and inserted into the
+TEI document by BddTei.bdd_export_tei().
+
+Formerly, every label and inscription was inserted by its own regular expression over the whole document, so the time
+grew with the number of chapters times the length of the book. resolve_placeholders() finds all placeholders in a
+single scan, looks up their labels in dictionaries built from the stored labels and writes all replacements in one
+pass. Inscriptions are inserted in a second pass behind the labels of their chapters.
+
+The result is the same as inserting the labels one after another. If a label contains placeholders itself or two
+replacements would overlap, the labels are inserted one after another as before.
+
+"""
+
+import collections # for grouping placeholders
+import re # for regex
+
+# placeholders: ~n~ followed by a word character (table of contents), *in* (interrogation), *n* (chapter), found at
+# every position (also overlapping ones, which are inserted one after another then)
+placeholder = re.compile(r'(?=~(\d+)~(?=\w)|\*i(\d+)\*|\*(\d+)\*)')
+# first entry of the table of contents, the line break before is moved into the list
+first_toc_entry = re.compile(r'\n(<lb.*?/>)(</hi></head>\n)<list>\n~1~(\w)')
+# beginning of a chapter label, inscriptions are inserted behind it
+chapter_beginning = re.compile(r'<div n="(\w+)" type="chapter"')
+# word character as in the patterns of the former implementation
+word_character = re.compile(r'\w')
+
+
+def interrogation_label(div_number):
+    """ Returns the label of an interrogation without stored label """
+
+    return f'<div n="{div_number}" type="interrogation"><p n="1"><hi rend="color:red">'
+
+
+def lb_line_start(text, position):
+    """
+    Checks, if a placeholder directly follows a tei:lb at the beginning of its line (i.e. matches \\n(<lb.*?/>)~n~).
+
+    :return: Position of the line break before the line or None
+    """
+
+    if text[position - 2:position] != '/>':
+        return None
+    line_break = text.rfind('\n', 0, position)
+    if line_break == -1 or not text.startswith('<lb', line_break + 1) or position - 2 < line_break + 4:
+        return None
+    return line_break
+
+
+def label_edits(text, toc_labels, interrogation_labels, chapter_labels):
+    """
+    Finds all placeholders in a single scan and returns the replacements of their labels.
+
+    :return: List of replacements (start, end, replacement) sorted by position or None, if the labels cannot be
+        inserted in a single pass
+    """
+
+    # ...labels containing placeholders, tildes or group references would interact with each other...
+    for _, key, label in toc_labels + interrogation_labels + chapter_labels:
+        if any(character in label.replace(key, '') for character in '~*\\'):
+            return None
+    if any('\n' in label for _, _, label in toc_labels):
+        return None
+
+    # ...the first stored label of a placeholder is used, further ones did not find their placeholder formerly...
+    first_toc_label = next((label.replace(key, '') for number, key, label in toc_labels if int(number) == 1), None)
+    toc = {}
+    for number, key, label in toc_labels:
+        if int(number) != 1:
+            toc.setdefault(key, label.replace(key, ''))
+    interrogations = {}
+    for number, key, label in interrogation_labels:
+        interrogations.setdefault(number, ('</p>' if int(number) == 1 else '</p></div>') + label.replace(key, ''))
+    chapters = {}
+    for number, key, label in chapter_labels:
+        chapters.setdefault(number, ('' if int(number) == 1 else '</p>\n</div>\n') + label.replace(key, ''))
+
+    edits = []
+    # line breaks before the lines of the first entry, of entries following a tei:lb and of other entries
+    first_toc_lines = set()
+    lb_lines = set()
+    other_lines = set()
+    if first_toc_label is not None:
+        for match in first_toc_entry.finditer(text):
+            edits.append((match.start(), match.start() + 1, match.group(2)))
+            edits.append((match.start(2), match.end(), f'<list>{first_toc_label}{match.group(3)}</hi>'))
+            first_toc_lines.update((match.start(), match.end() - 5))
+
+    toc_placeholders = collections.defaultdict(list)
+    for match in placeholder.finditer(text):
+        toc_number, interrogation_number, chapter_number = match.groups()
+        start = match.start()
+        if toc_number is not None:
+            toc_placeholders[f'~{toc_number}~'].append((start, match.end(1) + 1))
+        elif interrogation_number is not None:
+            end = match.end(2) + 1
+            if not interrogation_labels:
+                prefix = '' if int(interrogation_number) == 1 else '</p></div>\n'
+                edits.append((start, end, f'{prefix}{interrogation_label(interrogation_number)}</hi>'))
+            elif interrogation_number in interrogations and text.startswith('~', end) and \
+                    word_character.match(text, end + 1):
+                edits.append((start, end + 2, f'{interrogations[interrogation_number]}{text[end + 1]}</hi>'))
+        elif chapter_number in chapters:
+            edits.append((start, match.end(3) + 1, chapters[chapter_number]))
+
+    # ...entries of the table of contents following a tei:lb are moved behind it, if there is any...
+    for key, matches in toc_placeholders.items():
+        if key not in toc:
+            continue
+        lines = []
+        for start, end in matches:
+            line_break = lb_line_start(text, start)
+            if line_break is not None and all(line_break != line for line, _, _ in lines):
+                lines.append((line_break, start, end))
+        if lines:
+            for line_break, start, end in lines:
+                edits.append((line_break, line_break + 1, '</item>\n'))
+                edits.append((start, end + 1, f'{toc[key]}{text[end]}</hi>'))
+                lb_lines.add(line_break)
+        else:
+            for start, end in matches:
+                edits.append((start, end + 1, f'</item>\n{toc[key]}{text[end]}</hi>'))
+                other_lines.add(text.rfind('\n', 0, start))
+
+    # ...entries inserted one after another changed the lines of entries on the same line...
+    if lb_lines & other_lines or first_toc_lines & (lb_lines | other_lines):
+        return None
+
+    edits.sort()
+    for previous, edit in zip(edits, edits[1:]):
+        if edit[0] < previous[1]:
+            return None
+    return edits
+
+
+def apply_edits(text, edits):
+    """ Applies replacements (start, end, replacement) sorted by position in one pass """
+
+    parts = []
+    position = 0
+    for start, end, replacement in edits:
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def insert_labels_one_after_another(text, toc_labels, interrogation_labels, chapter_labels):
+    """ Inserts labels by one regular expression per label over the whole document (former implementation) """
+
+    # Insert label TOC
+    for element in toc_labels:
+        if int(element[0]) == 1:
+            # treat first element differently
+            text = re.sub(r'\n(<lb.*?/>)(</hi></head>\n)<list>\n~1~(\w)',
+                          r'\g<2>\g<1><list>' + element[2].replace(element[1], '') + r'\g<3></hi>', text)
+        else:
+            elmt = re.findall(f'\n(<lb.*?/>){element[1]}(\\w)', text)
+            if elmt:
+                text = re.sub(f'\n(<lb.*?/>){element[1]}(\\w)',
+                              r'</item>\n\g<1>' + element[2].replace(element[1], '') + r'\g<2></hi>', text)
+            else: #for chapter titles that are on the same line
+                text = re.sub(f'{element[1]}(\\w)',
+                              r'</item>\n' + element[2].replace(element[1], '') + r'\g<1></hi>', text)
+
+    # Insert label interrogation
+    for element in interrogation_labels:
+        if int(element[0]) == 1:
+            # treat first element differently
+            text = re.sub(r'\*i' + element[0] + r'\*~(\w)',
+                          '</p>' + element[2].replace(element[1], '') + r'\g<1></hi>', text)
+        else:
+            text = re.sub(r'\*i' + element[0] + r'\*~(\w)',
+                          '</p></div>' + element[2].replace(element[1], '') + r'\g<1></hi>', text)
+
+    if len(interrogation_labels) == 0:
+        for r_k in re.findall(r'\*i\d+\*', text):
+            div_number = r_k.replace('*', '').replace('i', '')
+            label = interrogation_label(div_number)
+            if int(div_number) == 1:
+                text = re.sub(r'\*i' + div_number + r'\*', label + '</hi>', text)
+            else:
+                text = re.sub(r'\*i' + div_number + r'\*', '</p></div>\n' + label + '</hi>', text)
+
+    # Insert label chapter
+    for element in chapter_labels:
+        if int(element[0]) == 1:
+            # treat first element differently
+            text = re.sub(r'\*' + element[0] + r'\*', element[2].replace(element[1], ''), text)
+        else:
+            text = re.sub(r'\*' + element[0] + r'\*', '</p>\n</div>\n' + element[2].replace(element[1], ''), text)
+    return text
+
+
+def insert_inscription(text, inscription):
+    """ Inserts an inscription by a regular expression over the whole document (former implementation) """
+
+    replace_text, text_to_be_replaced, replace_key = inscription
+    if 'i1' in replace_text:
+        # interrogationes start with inscription instead of interrogation number
+        replace_text = replace_text.replace('</hi></head>\n', '')
+        replace_text = replace_text.replace('\n<p n="1"><hi rend="color:red initial">', '')
+
+        return re.sub(r'\*i1\*(.*?)~(\w)',
+                      '</p>\n<div n="1" type="interrogation"><head type="chapter-title"><hi '
+                      r'rend="color:red">\g<1></hi></head>\n' +
+                      replace_text.replace('*i1*', '') + r'<p n="1"><hi rend="color:red">\g<2></hi>',
+                      text, flags=re.DOTALL)
+    return re.sub('(' + text_to_be_replaced + '.*?)~', r'\g<1>' + replace_text.replace(replace_key, '') + '~',
+                  text, flags=re.DOTALL)
+
+
+def insert_inscriptions(text, inscriptions):
+    """
+    Inserts inscriptions of chapters in one pass, each in front of the first '~' behind the label of its chapter.
+
+    :param text: TEI document as string
+    :param inscriptions: List of [inscription, beginning of chapter label, placeholder], which can be inserted in one
+        pass, see resolve_placeholders()
+    :return: TEI document as string
+    """
+
+    chapter_labels = collections.defaultdict(list)
+    for match in chapter_beginning.finditer(text):
+        chapter_labels[match.group(1)].append(match.start())
+
+    # ...like the former regular expressions, a chapter label before the '~' of a previous one is skipped...
+    positions = {}
+    insertions = collections.defaultdict(list)
+    for replace_text, text_to_be_replaced, replace_key in inscriptions:
+        number = chapter_beginning.fullmatch(text_to_be_replaced).group(1)
+        if number not in positions:
+            positions[number] = []
+            end = -1
+            for start in chapter_labels[number]:
+                if start <= end:
+                    continue
+                end = text.find('~', start)
+                if end == -1:
+                    break
+                positions[number].append(end)
+        for position in positions[number]:
+            insertions[position].append(replace_text.replace(replace_key, ''))
+
+    parts = []
+    position = 0
+    for end in sorted(insertions):
+        parts.append(text[position:end])
+        parts.extend(insertions[end])
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def batchable(inscription):
+    """ Checks, if an inscription can be inserted in one pass with others by insert_inscriptions() """
+
+    replace_text, text_to_be_replaced, replace_key = inscription
+    return 'i1' not in replace_text and chapter_beginning.fullmatch(text_to_be_replaced) is not None and \
+        '~' not in replace_text.replace(replace_key, '') and '\\' not in replace_text and \
+        not chapter_beginning.search(replace_text)
+
+
+def resolve_placeholders(text, toc_labels, interrogation_labels, chapter_labels, inscriptions):
+    """
+    Inserts the labels of the table of contents, interrogations and chapters and the inscriptions into a TEI document.
+
+    :param text: TEI document as string
+    :param toc_labels: List of [number, placeholder, label] of the table of contents (~n~)
+    :param interrogation_labels: List of [number, placeholder, label] of interrogations (*in*)
+    :param chapter_labels: List of [number, placeholder, label] of chapters (*n*)
+    :param inscriptions: List of [inscription, beginning of chapter label, placeholder]
+    :return: TEI document as string
+    """
+
+    edits = label_edits(text, toc_labels, interrogation_labels, chapter_labels)
+    if edits is None:
+        text = insert_labels_one_after_another(text, toc_labels, interrogation_labels, chapter_labels)
+    else:
+        text = apply_edits(text, edits)
+
+    # ...consecutive inscriptions of chapters are inserted in one pass, others one after another...
+    batch = []
+    for inscription in inscriptions:
+        if batchable(inscription):
+            batch.append(inscription)
+            continue
+        if batch:
+            text = insert_inscriptions(text, batch)
+            batch = []
+        text = insert_inscription(text, inscription)
+    if batch:
+        text = insert_inscriptions(text, batch)
+    return text
@@ -0,0 +1,226 @@
+""" Instrumentation of the stages of the conversion of a book
+
+A StageReport records for every stage of the pipeline (e.g. create_tei_from_pagexml, preprocessing, sc_to_g)
+    - wall time and CPU time (including finished worker processes, e.g. of --jobs),
+    - peak resident set size of the process during the stage: on Linux the peak is reset at the beginning of every
+      stage, elsewhere it is only known if the stage exceeds all earlier peaks of the process (None otherwise), so
+      the peak of an earlier stage or book (e.g. in a worker of batch.py) is never reported for a later one,
+    - peak resident set size of the largest worker process finished during the stage (e.g. of --jobs), if it exceeds
+      all earlier worker processes (None otherwise, the peak of a finished process cannot be reset),
+    - size of the document (number of characters of the TEI text) before and after the stage,
+    - hits and seconds per rule of a rewrite.RuleSet applied during the stage (e.g. of postprocessing), its statistics
+      are reset at the beginning of the stage.
+
+The report is saved as JSON file next to the converted book. Optionally, the whole conversion is profiled with
+cProfile (saved as .prof file, readable with pstats or snakeviz) or pyinstrument (saved as .html file), if installed.
+
+"""
+
+import contextlib # for stages as context managers
+import cProfile # for profiling
+import datetime # for timestamp of report
+import io # for printing profiles
+import json # for saving reports
+import os # handles filenames in folder
+import pstats # for printing profiles
+import sys # for platform
+import time # for timing stages
+
+try:
+    import resource # for peak memory, not available on Windows
+except ImportError:
+    resource = None
+
+try:
+    import pyinstrument # optional statistical profiler
+except ImportError:
+    pyinstrument = None
+
+# profilers available for --profile
+profilers = ['cprofile', 'pyinstrument']
+
+
+def cpu_time():
+    """ Returns CPU time of the process and its finished child processes in seconds """
+
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident set size of the process to its current size (Linux only, see proc(5), clear_refs).
+
+    :return: True if the peak has been reset, False if not supported
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """ Returns peak resident set size of the process since its start or the last reset_peak_rss() in bytes (or None) """
+
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is given in kilobytes on Linux, in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+def peak_rss_children():
+    """ Returns peak resident set size of the largest finished child process in bytes (or None) """
+
+    if resource is None:
+        return None
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+
+
+class StageReport:
+    """
+    Records wall time, CPU time, peak memory and document size of the stages of a conversion.
+
+    Attributes:
+        name (str): Name of the converted book, e.g. 'bamberg-sb-c-6-20'.
+        stages (list): One dictionary per finished stage.
+
+    Methods:
+        stage(name, document, rule_set): Context manager recording a stage.
+        to_dict(): Returns report as dictionary.
+        save(filename): Saves report as JSON file.
+        table(): Returns report as printable table.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        # peaks of the running stages, see stage()
+        self._running = []
+
+    @contextlib.contextmanager
+    def stage(self, name, document=None, rule_set=None):
+        """
+        Records a stage, see module docstring for the meaning of the peaks.
+
+        :param name: Name of the stage
+        :param document: Function returning the current document as string (called before and after the stage)
+        :param rule_set: rewrite.RuleSet applied during the stage, its statistics are recorded
+        """
+
+        if rule_set is not None:
+            rule_set.reset()
+        size_before = len(document()) if document is not None else None
+        # ...keep the peak of the enclosing stages before resetting it...
+        for running in self._running:
+            running[0] = max(running[0], peak_rss() or 0)
+        peak = [0]
+        self._running.append(peak)
+        peak_resettable = reset_peak_rss()
+        peak_before = peak_rss()
+        peak_children_before = peak_rss_children()
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time()
+        try:
+            yield
+        finally:
+            self._running.pop()
+            peak_after = peak_rss()
+            if peak_after is not None and (peak_resettable or peak_after > peak_before):
+                peak_after = max(peak_after, peak[0])
+                for running in self._running:
+                    running[0] = max(running[0], peak_after)
+            else:
+                peak_after = None
+            peak_children = peak_rss_children()
+            self.stages.append({
+                'stage': name,
+                'wall_seconds': round(time.perf_counter() - wall_start, 6),
+                'cpu_seconds': round(cpu_time() - cpu_start, 6),
+                'peak_rss_bytes': peak_after,
+                'peak_rss_children_bytes': peak_children if peak_children and peak_children > peak_children_before
+                else None,
+                'size_before': size_before,
+                'size_after': len(document()) if document is not None else None,
+                'rules': {rule: {'hits': hits, 'seconds': round(seconds, 6)}
+                          for rule, (hits, seconds) in rule_set.statistics.items()} if rule_set is not None else None,
+            })
+
+    def to_dict(self):
+        """ Returns report as dictionary """
+
+        return {'name': self.name, 'started': self.started,
+                'wall_seconds': round(time.perf_counter() - self._start, 6), 'stages': self.stages}
+
+    def save(self, filename):
+        """ Saves report as JSON file """
+
+        with open(filename, 'w', encoding='utf8') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+
+    def table(self):
+        """ Returns report as printable table, one line per stage """
+
+        lines = [f'{"stage":<32} {"wall s":>8} {"cpu s":>8} {"peak MB":>8} {"workers MB":>10} {"size before":>12} '
+                 f'{"size after":>12}']
+        for stage in self.stages:
+            peak = f'{stage["peak_rss_bytes"] / 2 ** 20:.1f}' if stage['peak_rss_bytes'] is not None else '-'
+            peak_children = f'{stage["peak_rss_children_bytes"] / 2 ** 20:.1f}' \
+                if stage['peak_rss_children_bytes'] is not None else '-'
+            size_before = stage['size_before'] if stage['size_before'] is not None else '-'
+            size_after = stage['size_after'] if stage['size_after'] is not None else '-'
+            lines.append(f'{stage["stage"]:<32} {stage["wall_seconds"]:>8.3f} {stage["cpu_seconds"]:>8.3f} '
+                         f'{peak:>8} {peak_children:>10} {size_before:>12} {size_after:>12}')
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profiled(profiler, filename_base):
+    """
+    Profiles the enclosed code.
+
+    :param profiler: 'cprofile', 'pyinstrument' or None (no profiling)
+    :param filename_base: Path of the profile without extension, '.prof' (cProfile) or '.html' (pyinstrument) is added
+    """
+
+    if profiler is None:
+        yield
+    elif profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(filename_base + '.prof')
+            summary = io.StringIO()
+            pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(20)
+            print(summary.getvalue())
+            print(f'Profile saved as {filename_base}.prof')
+    elif profiler == 'pyinstrument':
+        if pyinstrument is None:
+            raise ValueError('pyinstrument is not installed, use --profile cprofile or pip install pyinstrument')
+        profile = pyinstrument.Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(filename_base + '.html', 'w', encoding='utf8') as profile_file:
+                profile_file.write(profile.output_html())
+            print(f'Profile saved as {filename_base}.html')
+    else:
+        raise ValueError(f'Unknown profiler {profiler}, use {" or ".join(profilers)}')
@@ -0,0 +1,267 @@
+""" Engine for rule tables of whole-document rewrites
+
+A rule table is a list of rules applied one after another to a TEI document as string. Rules are compiled once.
+Consecutive literal rules (patterns without regex syntax) which cannot interfere with each other are fused into a
+single pass over the document using one alternation, so the result stays the same as applying them one after another.
+For every rule, the number of hits and the time spent are recorded.
+
+Kinds of rules:
+    Rule(name, pattern, replacement, flags, required): re.sub() of pattern by replacement.
+    ChoiceTagRule(name, tag): Moves a closing tag wrongly placed inside a tei:choice element behind the element.
+
+Fixed-string replacements without statistics (e.g. the special characters of config.character_list) are compiled into
+a Translator.
+
+"""
+
+import re # for regex
+import time # for timing rules
+import transpy # function library
+
+
+# characters with special meaning in regular expressions
+regex_syntax = set('.^$*+?{}[]\\|()')
+
+
+def is_literal(pattern):
+    """ Checks, if a pattern matches only itself """
+
+    return bool(pattern) and not regex_syntax.intersection(pattern)
+
+
+class Rule:
+    """
+    Rewrite rule replacing all matches of a regular expression.
+
+    Attributes:
+        name (str): Name of the rule used in statistics.
+        pattern (str): Regular expression as string.
+        replacement (str): Replacement, may contain group references.
+        flags (int): Flags of the regular expression.
+        literal (bool): True, if pattern and replacement contain no regex syntax, i.e. the rule is a plain replacement.
+        required (str): Plain string contained in every match. If the text does not contain it, the regular expression
+            is not run at all.
+    """
+
+    def __init__(self, name, pattern, replacement, flags=0, required=None):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        self.flags = flags
+        self.required = required
+        self.literal = is_literal(pattern) and '\\' not in replacement
+        self.compiled = re.compile(pattern, flags)
+
+    def apply(self, text):
+        """ Applies rule to text and returns text and number of hits """
+
+        if self.required is not None and self.required not in text:
+            return text, 0
+        return self.compiled.subn(self.replacement, text)
+
+
+class ChoiceTagRule:
+    """
+    Rewrite rule moving a closing tag wrongly placed inside a tei:choice element behind the element.
+
+    Every tei:choice element on one line containing the closing tag but not the opening tag is replaced by the element
+    without the closing tag followed by the closing tag. The former implementation replaced every found element
+    separately, using the element itself as regular expression. If all elements are plain strings which cannot overlap
+    each other, i.e. they contain no regex syntax and no nested tei:choice, they are replaced in a single pass.
+    Otherwise, the former implementation is used to keep the results.
+
+    Attributes:
+        name (str): Name of the rule used in statistics.
+        tag (str): Name of the tag, e.g. 'p'.
+    """
+
+    literal = False
+
+    def __init__(self, name, tag):
+        self.name = name
+        self.tag = tag
+        self.compiled = re.compile(f'<choice>.*?</{tag}>.*?</choice>')
+
+    def apply(self, text):
+        """ Applies rule to text and returns text and number of hits """
+
+        closing_tag = f'</{self.tag}>'
+        choice_elements = [choice_element for choice_element in self.compiled.findall(text)
+                           if f'<{self.tag} ' not in choice_element]
+        if not choice_elements:
+            return text, 0
+
+        if all(is_literal(choice_element) and choice_element.count('<choice>') == 1
+               and choice_element.count('</choice>') == 1 for choice_element in choice_elements):
+            replacements = {choice_element: choice_element.replace(closing_tag, '') + closing_tag
+                            for choice_element in choice_elements}
+            pattern = re.compile('|'.join(re.escape(choice_element)
+                                          for choice_element in sorted(replacements, key=len, reverse=True)))
+            return pattern.subn(lambda match: replacements[match.group(0)], text)
+
+        # ...former implementation, elements used as regular expressions...
+        hits = 0
+        for choice_element in choice_elements:
+            replacement = re.sub(closing_tag, r'', choice_element)
+            text, count = re.subn(choice_element, replacement + closing_tag, text)
+            hits += count
+        return text, hits
+
+
+class FusedRules:
+    """
+    Literal rules applied in a single pass, see RuleSet.
+
+    Attributes:
+        rules (list): Fused rules.
+        name (str): Names of the fused rules.
+    """
+
+    literal = True
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.name = ' + '.join(rule.name for rule in rules)
+        self.replacements = {rule.pattern: rule.replacement for rule in rules}
+        self.names = {rule.pattern: rule.name for rule in rules}
+        self.compiled = re.compile('|'.join(re.escape(pattern)
+                                            for pattern in sorted(self.replacements, key=len, reverse=True)))
+
+    def apply_counting(self, text, hits):
+        """ Applies rules to text and adds number of hits per rule to hits """
+
+        def replace(match):
+            hits[self.names[match.group(0)]] += 1
+            return self.replacements[match.group(0)]
+
+        return self.compiled.sub(replace, text)
+
+
+class Translator:
+    """
+    Fixed-string replacements applied one after another, compiled into as few passes over the text as possible.
+
+    Consecutive replacements which cannot interfere with each other (see transpy.rules_overlap()) form a stage, every
+    stage is compiled into a single regular expression: single characters are matched by one character class, longer
+    strings by an alternation, and only positions starting with one of the strings are tried. The result is the same as
+    applying the replacements one after another with str.replace(). (str.translate() is slower than the character
+    class for texts with many non-ASCII characters like the transcriptions.)
+
+    Attributes:
+        replacements (list): Pairs of (string, replacement) in order of application.
+        stages (list): Tuples of compiled pattern and dictionary of replacements in order of application.
+
+    Methods:
+        apply(text): Applies all replacements to text.
+    """
+
+    def __init__(self, replacements):
+        self.replacements = list(replacements)
+
+        # ...start a new stage, if the replacement interferes with a replacement of the current stage...
+        stages = []
+        for string, replacement in self.replacements:
+            if not stages or any(transpy.rules_overlap(stage_string, string) or
+                                 transpy.rules_overlap(stage_replacement, string)
+                                 for stage_string, stage_replacement in stages[-1].items()):
+                stages.append({})
+            stages[-1][string] = replacement
+
+        self.stages = []
+        for stage in stages:
+            # ...strings of a stage cannot overlap, so at most one of them matches at every position...
+            alternatives = [re.escape(string) for string in sorted(stage, key=len, reverse=True) if len(string) > 1]
+            characters = ''.join(re.escape(string) for string in stage if len(string) == 1)
+            if characters:
+                alternatives.append(f'[{characters}]')
+            pattern = '|'.join(alternatives)
+            if '' not in stage and len(alternatives) > 1:
+                first_characters = ''.join(sorted({re.escape(string[0]) for string in stage}))
+                pattern = f'(?=[{first_characters}])(?:{pattern})'
+            self.stages.append((re.compile(pattern), stage))
+
+    def apply(self, text):
+        """
+        Applies all replacements to text.
+
+        :param text: Text as string
+        :return: Text with replacements as string
+        """
+
+        for pattern, replacements in self.stages:
+            text = pattern.sub(lambda match: replacements[match.group(0)], text)
+        return text
+
+
+class RuleSet:
+    """
+    Compiled rule table.
+
+    Attributes:
+        rules (list): Rules in order of application.
+        passes (list): Rules and fused literal rules in order of application.
+        statistics (dict): Number of hits and seconds per rule name, summed up over all applications since the last
+            reset().
+
+    Methods:
+        apply(text): Applies all rules to text.
+        reset(): Sets statistics to zero, e.g. before the next book.
+        report(): Returns statistics as printable table.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.passes = []
+        self.reset()
+
+        # ...fuse consecutive literal rules, which cannot create or destroy matches of each other...
+        group = []
+        for rule in rules + [None]:
+            if rule is not None and rule.literal and rule.flags == 0 and \
+                    not any(transpy.rules_overlap(member.pattern, rule.pattern) or
+                            transpy.rules_overlap(member.replacement, rule.pattern) for member in group):
+                group.append(rule)
+                continue
+            if len(group) > 1:
+                self.passes.append(FusedRules(group))
+            else:
+                self.passes.extend(group)
+            group = [rule] if rule is not None and rule.literal and rule.flags == 0 else []
+            if rule is not None and not group:
+                self.passes.append(rule)
+
+    def apply(self, text):
+        """
+        Applies all rules to text and updates statistics.
+
+        :param text: Text as string
+        :return: Rewritten text as string
+        """
+
+        for rule in self.passes:
+            start = time.perf_counter()
+            if isinstance(rule, FusedRules):
+                hits = {member.name: 0 for member in rule.rules}
+                text = rule.apply_counting(text, hits)
+                duration = (time.perf_counter() - start) / len(rule.rules)
+                for name, count in hits.items():
+                    self.statistics[name][0] += count
+                    self.statistics[name][1] += duration
+            else:
+                text, count = rule.apply(text)
+                self.statistics[rule.name][0] += count
+                self.statistics[rule.name][1] += time.perf_counter() - start
+        return text
+
+    def reset(self):
+        """ Sets statistics of all rules to zero """
+
+        self.statistics = {rule.name: [0, 0.0] for rule in self.rules}
+
+    def report(self):
+        """ Returns statistics as printable table, one line per rule """
+
+        lines = [f'{"rule":<40} {"hits":>6} {"ms":>9}']
+        for name, (hits, seconds) in self.statistics.items():
+            lines.append(f'{name:<40} {hits:>6} {seconds * 1000:>9.2f}')
+        return '\n'.join(lines)
@@ -0,0 +1,202 @@
+""" Streaming conversion of a book into BDD-TEI
+
+process_book() keeps the whole book as one string in BddTei.tei: every stage copies it and inserting it into the TEI
+template copies it again, so the peak memory is a multiple of the size of the book. In streaming mode (bdd.py -stream)
+the text converted from the PAGE XML files is split into chunks at the beginnings of chapters. Every chunk runs
+through the stages of BddTei and is written into the TEI file behind the beginning of the template, so besides the
+converted text only the chunk in process is held in memory.
+
+The TEI file is the same as the one of the whole book:
+    - labels of TOC, interrogations and chapters are looked up for the whole book (see placeholders.py) and inserted
+      into the chunks,
+    - delSpan and seg are numbered across chunks (BddTei keeps the numbers between calls),
+    - abbreviations are ranked by their first occurrence in the whole book: in a first pass the chunks are processed
+      up to bdd_specific_tei and kept in a temporary file while the abbreviated words are ranked, in a second pass
+      their abbreviations are expanded and the chunks are written,
+    - a chapter only begins a new chunk, if no transformation reaches across its beginning: the last line before it
+      must not end with '¬' (joined with the next tei:lb, also across tei:pb and tei:cb), the chapter before needs
+      its '~' for its inscription and the chapter must not begin inside a tei:delSpan or a replaced placeholder.
+      Otherwise the chapter stays in the chunk before, which serves as lookahead buffer.
+
+If the labels cannot be inserted in a single pass, the book is converted as one chunk.
+
+"""
+
+import bisect # for finding replacements of chunks
+import collections # for grouping inscriptions
+import re # for regex
+import tempfile # for chunks between both passes
+
+import placeholders # labels of TOC, interrogations and chapters
+import transpy # function library
+
+# chapter placeholder directly following a tei:lb at the beginning of a line
+chapter_line = re.compile(r'<lb[^<>\n]*/>\*(\d+)\*')
+# tei:delSpan before conversion, may reach over several lines
+delspan = re.compile('<delSpan>.*?</delSpan>', re.DOTALL)
+
+
+def joins_next_line(text, position):
+    """
+    Checks, if a '¬' before the beginning of a line may join it with the lines before.
+
+    Lines without tei:lb (e.g. tei:pb, tei:fw or tei:cb) are skipped until the first line with tei:lb.
+
+    :param text: Text converted from the PAGE XML files
+    :param position: Position of the beginning of the line
+    :return: True or False
+    """
+
+    end = position - 1
+    while end > 0:
+        start = text.rfind('\n', 0, end) + 1
+        line = text[start:end]
+        if line.rstrip(' ').endswith('¬'):
+            return True
+        if line.startswith('<lb'):
+            return False
+        end = start - 1
+    return False
+
+
+def inside(spans, starts, position):
+    """ Checks, if a position is inside one of the spans (start, end) sorted by their starts """
+
+    index = bisect.bisect_right(starts, position) - 1
+    return index >= 0 and position < spans[index][1]
+
+
+def chunk_boundaries(text, edits, chapter_labels):
+    """
+    Finds the beginnings of chapters where the text can be split into chunks.
+
+    :param text: Text converted from the PAGE XML files
+    :param edits: Replacements of the labels as returned by placeholders.label_edits()
+    :param chapter_labels: List of [number, placeholder, label] of chapters (*n*)
+    :return: Positions of the beginnings of the chunks, the first one is 0
+    """
+
+    chapters = {number for number, key, label in chapter_labels}
+    edit_starts = [edit[0] for edit in edits]
+    delspans = [match.span() for match in delspan.finditer(text)]
+    delspan_starts = [start for start, end in delspans]
+
+    # ...beginnings of chapter labels, inscriptions are inserted in front of the next '~' behind them...
+    chapter_starts = [match.start() for match in placeholders.placeholder.finditer(text)
+                      if match.group(3) in chapters]
+
+    boundaries = [0]
+    for match in chapter_line.finditer(text):
+        position = match.start()
+        if int(match.group(1)) == 1 or match.group(1) not in chapters or text[position - 1:position] != '\n':
+            continue
+        if joins_next_line(text, position) or inside(edits, edit_starts, position) or \
+                inside(delspans, delspan_starts, position):
+            continue
+        # ...the '~' behind the previous chapter label has to be in the chunk before...
+        index = bisect.bisect_left(chapter_starts, position) - 1
+        if index >= 0:
+            tilde = text.find('~', chapter_starts[index])
+            while tilde != -1 and inside(edits, edit_starts, tilde):
+                tilde = text.find('~', tilde + 1)
+            if tilde == -1 or tilde >= position:
+                continue
+        boundaries.append(position)
+    return boundaries
+
+
+class BookChunks:
+    """
+    A book converted chunk by chunk, see module docstring.
+
+    The first pass (bdd_export_tei, preprocessing, line_breaks_angled_dash and bdd_specific_tei) runs when the object
+    is created, the second pass (abbreviations, sc_to_g and postprocessing) while iterating over expand().
+
+    Attributes:
+        tei_file (BddTei): The BddTei object of the book, its 'tei' attribute holds the chunk in process.
+        boundaries (list): The positions of the beginnings of the chunks in the converted text.
+        ranks (dict): The abbreviated words of the whole book ranked by their first occurrence.
+        lengths (list): The lengths of the chunks in the temporary file.
+
+    Methods:
+        expand(dictionary_abbr_external): Yields the chunks of the TEI text one after another.
+        close(): Deletes the temporary file.
+    """
+
+    def __init__(self, tei_file):
+        """
+        Runs the first pass over the text of a BddTei object.
+
+        Args:
+            tei_file (BddTei): The BddTei object of the book, created from a converted manuscript.
+
+        """
+        self.tei_file = tei_file
+        self.ranks = {}
+        self.lengths = []
+        self.file = tempfile.TemporaryFile('w+', encoding='utf8', newline='')
+
+        text = tei_file.tei
+        edits = placeholders.label_edits(text, tei_file.toc_label_for_later_replacement,
+                                         tei_file.interrogation_label_for_later_replacement,
+                                         tei_file.label_for_later_replacement)
+        inscriptions = tei_file.inscriptions_to_replace
+        if edits is None or not all(placeholders.batchable(inscription) for inscription in inscriptions):
+            self.boundaries = [0]
+        else:
+            self.boundaries = chunk_boundaries(text, edits, tei_file.label_for_later_replacement)
+
+        # ...inscriptions by the number of their chapter, in their order...
+        inscriptions_by_chapter = collections.defaultdict(list)
+        for index, inscription in enumerate(inscriptions):
+            number = placeholders.chapter_beginning.fullmatch(inscription[1])
+            if number is not None:
+                inscriptions_by_chapter[number.group(1)].append((index, inscription))
+
+        edit_starts = [edit[0] for edit in edits] if edits is not None else []
+        for start, end in zip(self.boundaries, self.boundaries[1:] + [len(text)]):
+            if len(self.boundaries) == 1:
+                tei_file.bdd_export_tei()
+            else:
+                chunk_edits = [(edit_start - start, edit_end - start, replacement) for edit_start, edit_end, replacement
+                               in edits[bisect.bisect_left(edit_starts, start):bisect.bisect_left(edit_starts, end)]]
+                tei_file.tei = placeholders.apply_edits(text[start:end], chunk_edits)
+                chapters = set(placeholders.chapter_beginning.findall(tei_file.tei))
+                chunk_inscriptions = sorted(entry for number in chapters for entry in inscriptions_by_chapter[number])
+                tei_file.tei = placeholders.insert_inscriptions(tei_file.tei, [inscription for index, inscription
+                                                                               in chunk_inscriptions])
+                tei_file.remove_placeholders()
+            tei_file.preprocessing()
+            tei_file.line_breaks_angled_dash()
+            tei_file.bdd_specific_tei()
+
+            refined_xml, tokens = transpy.tokenize_tei(tei_file.tei)
+            transpy.rank_abbreviations(tokens, self.ranks)
+            self.file.write(tei_file.tei)
+            self.lengths.append(len(tei_file.tei))
+        tei_file.tei = ''
+
+    def expand(self, dictionary_abbr_external):
+        """
+        Expands the abbreviations of the chunks and runs sc_to_g and postprocessing.
+
+        :param dictionary_abbr_external: Abbreviation dictionary
+        :return: Generator of the chunks of the TEI text
+        """
+
+        tag_index = transpy.abbreviation_tag_index(self.ranks)
+        choice_elements = {}
+        self.file.seek(0)
+        for length in self.lengths:
+            refined_xml, tokens = transpy.tokenize_tei(self.file.read(length))
+            self.tei_file.tei = transpy.expand_abbreviations(dictionary_abbr_external, refined_xml, tokens,
+                                                             self.ranks, tag_index, choice_elements)
+            self.tei_file.sc_to_g()
+            self.tei_file.postprocessing()
+            yield self.tei_file.tei
+        self.tei_file.tei = ''
+
+    def close(self):
+        """ Deletes the temporary file """
+
+        self.file.close()
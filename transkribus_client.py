@@ -0,0 +1,256 @@
+""" Asynchronous client for exporting and downloading PAGE XML from Transkribus
+
+Runs export jobs for several documents or page ranges at the same time. The status of every export job is polled with
+increasing intervals, exported zip files are downloaded in chunks to a temporary file per job ('<zip file>.part').
+If a download is interrupted, it is resumed using an HTTP Range request instead of starting over, but only if the
+partial file belongs to the same url and ETag (see TranskribusClient.download()).
+
+Requests are sent with the requests library in worker threads, so the client does not need an asynchronous HTTP
+library. The base url can be changed, e.g. for testing against a local server providing the endpoints
+/auth/login, /collections/{collection-ID}/{document-ID}/export and /jobs/{job-ID}.
+
+Usage:
+    zip_files = download_exports([(collection_id, document_id, startpage, endpage, zip_file_name), ...])
+
+"""
+
+import asyncio # for running jobs concurrently
+import json # for url and ETag of partial downloads
+import os # handles filenames in folder
+import requests # for REST requests
+import transkribus_credentials # takes credentials from local config file
+
+# url of Transkribus REST API
+base_url = 'https://transkribus.eu/TrpServer/rest'
+
+
+# errors of requests worth retrying, e.g. connection lost during download
+retryable_errors = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class ExportError(Exception):
+    """ Raised if an export job fails on the server """
+
+
+def export_parameters(startpage, endpage):
+    """ Parameters for exporting page-XML of a page range as string """
+
+    # ...set paramater for exporting page-xml...
+    params = '{"commonPars":{"pages":"'+ str(startpage) +'-'+ str(endpage) +'","doExportDocMetadata":true,"doWriteMets":true,"doWriteImages":false,"doExportPageXml":true,"doExportAltoXml":false,"doExportSingleTxtFiles":false,"doWritePdf":false,"doWriteTei":false,"doWriteDocx":false,"doWriteOneTxt":false,"doWriteTagsXlsx":false,"doWriteTagsIob":false,"doWriteTablesXlsx":false,"doCreateTitle":false,"useVersionStatus":"Latest version","writeTextOnWordLevel":false,"doBlackening":false,"selectedTags":["add","date","Address","supplied","work","capital-rubricated","unclear","sic","structure","div","regionType","seg-supp","speech","person","gap","organization","comment","abbrev","place","rubricated"],"font":"FreeSerif","splitIntoWordsInAltoXml":false,"pageDirName":"page","fileNamePattern":"${filename}","useHttps":true,"remoteImgQuality":"orig","doOverwrite":true,"useOcrMasterDir":true,"exportTranscriptMetadata":true,"updatePageXmlImageDimensions":false},"altoPars":{"splitIntoWordsInAltoXml":false},"pdfPars":{"doPdfImagesOnly":false,"doPdfImagesPlusText":true,"doPdfWithTextPages":false,"doPdfWithTags":false,"doPdfWithArticles":false,"pdfImgQuality":"view"},"docxPars":{"doDocxWithTags":false,"doDocxPreserveLineBreaks":false,"doDocxForcePageBreaks":false,"doDocxMarkUnclear":false,"doDocxKeepAbbrevs":false,"doDocxExpandAbbrevs":false,"doDocxSubstituteAbbrevs":false}}'
+    return params
+
+
+def remove_partial_download(partial_file_name):
+    """ Deletes a partial download and the file with its url and ETag """
+
+    for file_name in (partial_file_name, partial_file_name + '.json'):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+
+class TranskribusClient:
+    """
+    Exports and downloads documents from Transkribus concurrently.
+
+    Attributes:
+        session (requests.Session): Logged in session.
+        base_url (str): Url of REST API.
+        max_concurrent_jobs (int): Maximum number of export jobs running at the same time.
+        first_poll_interval (float): Seconds to wait before polling the status of a job the first time.
+        max_poll_interval (float): Maximum number of seconds between two polls.
+        backoff_factor (float): Factor the poll interval is increased by after each unfinished poll.
+        retries (int): Number of retries for failed requests and interrupted downloads.
+        chunk_size (int): Size of chunks written while downloading.
+
+    Methods:
+        login(user, pw): Logs in and stores session.
+        export(collection_id, document_id, startpage, endpage): Starts export job and returns its id.
+        wait_for_job(job_id): Polls status of job until finished and returns url of exported file.
+        download(url, zip_file_name): Downloads file, resuming interrupted downloads.
+        export_and_download(collection_id, document_id, startpage, endpage, zip_file_name): All of the above.
+        export_and_download_all(jobs): Runs several exports and downloads concurrently.
+    """
+
+    def __init__(self, session=None, base_url=base_url, max_concurrent_jobs=4, first_poll_interval=2.0,
+                 max_poll_interval=30.0, backoff_factor=1.5, retries=5, chunk_size=64 * 1024):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.first_poll_interval = first_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self._semaphore = None
+
+    async def _request(self, method, url, **kwargs):
+        # ...send request in worker thread, retry on connection errors and server errors...
+        delay = self.first_poll_interval
+        for attempt in range(self.retries + 1):
+            try:
+                response = await asyncio.to_thread(self.session.request, method, url, timeout=60, **kwargs)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return response
+                if attempt == self.retries:
+                    response.raise_for_status()
+            except retryable_errors:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(delay)
+            delay = min(delay * self.backoff_factor, self.max_poll_interval)
+
+    async def login(self, user, pw):
+        """
+        Logs in to Transkribus and stores the session.
+
+        :param user: Username as string
+        :param pw: Password as string
+        """
+
+        self.session = requests.Session()
+        await self._request('POST', f'{self.base_url}/auth/login', data={'user': user, 'pw': pw})
+
+    async def export(self, collection_id, document_id, startpage, endpage):
+        """
+        Starts export of page-XML of a page range.
+
+        :param collection_id: Transkribus collection number as Int
+        :param document_id: Transkribus document number as Int
+        :param startpage: First page of document to be exported as Int
+        :param endpage: Last page of document to be exported as Int
+        :return: Id of export job as string
+        """
+
+        url = f'{self.base_url}/collections/{collection_id}/{document_id}/export?pages={startpage}-{endpage}'
+        response = await self._request('POST', url, data=export_parameters(startpage, endpage))
+        return response.text.strip()
+
+    async def wait_for_job(self, job_id):
+        """
+        Polls status of a job until it is finished, the interval between polls grows with every unfinished poll.
+
+        :param job_id: Id of job as returned by export()
+        :return: Url of exported zip file
+        """
+
+        interval = self.first_poll_interval
+        while True:
+            await asyncio.sleep(interval)
+            response = await self._request('GET', f'{self.base_url}/jobs/{job_id}')
+            status = response.json()
+            if status['state'] == 'FINISHED':
+                return status['result']
+            if status['state'] in ('FAILED', 'CANCELED'):
+                raise ExportError(f'Export job {job_id} {status["state"].lower()}: {status.get("description", "")}')
+            interval = min(interval * self.backoff_factor, self.max_poll_interval)
+
+    def _download_chunks(self, url, partial_file_name):
+        # ...continue download at the end of the partial file, if it belongs to the same export and the server supports
+        # ranges...
+        info_file_name = partial_file_name + '.json'
+        info = {}
+        if os.path.exists(partial_file_name) and os.path.exists(info_file_name):
+            with open(info_file_name, encoding='utf8') as info_file:
+                info = json.load(info_file)
+        if info.get('url') != url:
+            # ...partial file of another export job (e.g. older export of the same pages) or without url...
+            remove_partial_download(partial_file_name)
+            info = {}
+        offset = os.path.getsize(partial_file_name) if os.path.exists(partial_file_name) else 0
+        headers = {}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            if info.get('etag'):
+                # ...the server sends the whole file, if it has changed since the partial download...
+                headers['If-Range'] = info['etag']
+        with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code == 416 and offset:
+                # ...range not satisfiable, the partial file does not fit the file on the server, start over...
+                remove_partial_download(partial_file_name)
+                return self._download_chunks(url, partial_file_name)
+            response.raise_for_status()
+            etag = response.headers.get('ETag')
+            if response.status_code != 206 or not response.headers.get('Content-Range', '').startswith(
+                    f'bytes {offset}-') or (info.get('etag') and etag and etag != info['etag']):
+                offset = 0
+            with open(info_file_name, 'w', encoding='utf8') as info_file:
+                json.dump({'url': url, 'etag': etag}, info_file)
+            expected_size = response.headers.get('Content-Length')
+            written = 0
+            with open(partial_file_name, 'ab' if offset else 'wb') as partial_file:
+                for chunk in response.iter_content(self.chunk_size):
+                    partial_file.write(chunk)
+                    written += len(chunk)
+            if expected_size is not None and written < int(expected_size):
+                raise requests.ConnectionError(f'Download of {url} interrupted after {offset + written} bytes')
+
+    async def download(self, url, zip_file_name):
+        """
+        Downloads a file in chunks into '<zip_file_name>.part' and renames it when complete.
+        Interrupted downloads are resumed, also if they have been interrupted in an earlier run. The url and ETag of
+        the download are kept in '<zip_file_name>.part.json', a partial file of another url (e.g. of an older export
+        of the same pages) is deleted and downloaded again, as well as a partial file of a changed ETag.
+
+        :param url: Url of file as returned by wait_for_job()
+        :param zip_file_name: Path of downloaded file
+        :return: zip_file_name
+        """
+
+        partial_file_name = zip_file_name + '.part'
+        os.makedirs(os.path.dirname(os.path.abspath(zip_file_name)), exist_ok=True)
+        delay = self.first_poll_interval
+        for attempt in range(self.retries + 1):
+            try:
+                await asyncio.to_thread(self._download_chunks, url, partial_file_name)
+                break
+            except retryable_errors:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(delay)
+            delay = min(delay * self.backoff_factor, self.max_poll_interval)
+        os.replace(partial_file_name, zip_file_name)
+        os.remove(partial_file_name + '.json')
+        return zip_file_name
+
+    async def export_and_download(self, collection_id, document_id, startpage, endpage, zip_file_name):
+        """
+        Exports page-XML of a page range and downloads it as zip file.
+
+        :return: Path of downloaded zip file
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        async with self._semaphore:
+            job_id = await self.export(collection_id, document_id, startpage, endpage)
+            url = await self.wait_for_job(job_id)
+            return await self.download(url, zip_file_name)
+
+    async def export_and_download_all(self, jobs):
+        """
+        Exports and downloads several page ranges concurrently.
+
+        :param jobs: List of tuples (collection_id, document_id, startpage, endpage, zip_file_name)
+        :return: List of paths of downloaded zip files, or of exceptions for failed jobs, in order of jobs
+        """
+
+        return await asyncio.gather(*[self.export_and_download(*job) for job in jobs], return_exceptions=True)
+
+
+def download_exports(jobs, session=None, **kwargs):
+    """ Export and download several page ranges concurrently
+
+    :param jobs: List of tuples (collection_id, document_id, startpage, endpage, zip_file_name)
+    :param session: Logged in session as returned by transpy.login_transkribus(), logs in using credentials if None
+    :param kwargs: Further arguments for TranskribusClient, e.g. base_url
+    :return: List of paths of downloaded zip files, or of exceptions for failed jobs, in order of jobs
+    """
+
+    async def run():
+        client = TranskribusClient(session, **kwargs)
+        if session is None:
+            await client.login(transkribus_credentials.username, transkribus_credentials.password)
+        return await client.export_and_download_all(jobs)
+
+    return asyncio.run(run())
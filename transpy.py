@@ -2,7 +2,6 @@
 import re # for regex
 from zipfile import ZipFile # for handling exported zip file
 import time # for handling lagging export
-import json # for handling rest responses
 import requests # for REST requests
 from requests.auth import HTTPDigestAuth # for Transkribus REST requests
 from requests.auth import HTTPBasicAuth # for exist REST request
@@ -12,7 +11,15 @@ import exist_credentials # takes credentials from local config file
 import xml.etree.ElementTree as ET # for parsing xml data
 import lxml.etree as LET # TODO replace etree for parsing xml data
 import os # handles filenames in folder
-import pandas as pd
+import difflib # for comparing legacy and single-pass expansion
+import abbreviation_store # compiled abbreviation dictionary
+import functools # for memoizing expansions
+import itertools # for feeding downloaded chunks into parser
+import collections # for referencing files in zip
+import lexicon # indexed lexicon of word forms
+import page_model # text regions and lines of pageXML files
+import xpaths # precompiled XPath queries
+import transkribus_client # for concurrent exports and resumable downloads
 
 
 """ Functions for importing and exporting data from Transkribus via REST-API
@@ -53,7 +60,7 @@ def export_pagexml(session, collection_id, document_id, startpage, endpage):
     url = 'https://transkribus.eu/TrpServer/rest/collections/' + str(collection_id) + '/' + str(document_id) + '/export?pages='+str(startpage)+'-'+str(endpage)
 
     # ...set paramater for exporting page-xml...
-    params = '{"commonPars":{"pages":"'+ str(startpage) +'-'+ str(endpage) +'","doExportDocMetadata":true,"doWriteMets":true,"doWriteImages":false,"doExportPageXml":true,"doExportAltoXml":false,"doExportSingleTxtFiles":false,"doWritePdf":false,"doWriteTei":false,"doWriteDocx":false,"doWriteOneTxt":false,"doWriteTagsXlsx":false,"doWriteTagsIob":false,"doWriteTablesXlsx":false,"doCreateTitle":false,"useVersionStatus":"Latest version","writeTextOnWordLevel":false,"doBlackening":false,"selectedTags":["add","date","Address","supplied","work","capital-rubricated","unclear","sic","structure","div","regionType","seg-supp","speech","person","gap","organization","comment","abbrev","place","rubricated"],"font":"FreeSerif","splitIntoWordsInAltoXml":false,"pageDirName":"page","fileNamePattern":"${filename}","useHttps":true,"remoteImgQuality":"orig","doOverwrite":true,"useOcrMasterDir":true,"exportTranscriptMetadata":true,"updatePageXmlImageDimensions":false},"altoPars":{"splitIntoWordsInAltoXml":false},"pdfPars":{"doPdfImagesOnly":false,"doPdfImagesPlusText":true,"doPdfWithTextPages":false,"doPdfWithTags":false,"doPdfWithArticles":false,"pdfImgQuality":"view"},"docxPars":{"doDocxWithTags":false,"doDocxPreserveLineBreaks":false,"doDocxForcePageBreaks":false,"doDocxMarkUnclear":false,"doDocxKeepAbbrevs":false,"doDocxExpandAbbrevs":false,"doDocxSubstituteAbbrevs":false}}'
+    params = transkribus_client.export_parameters(startpage, endpage)
 
     # ...post export request, starts export and returns job number...
     export_request = session.post(url,params)
@@ -78,18 +85,20 @@ def export_pagexml(session, collection_id, document_id, startpage, endpage):
 
 """
 
-def download_export(url):
+def download_export(url, zip_file_name=None):
     """ Download of exported data
 
     Downloads exported data from transkribus server using url returned by export_pagexml() as zip file,
     saves it to export folder on local machine specified in config.py and returns name of zip file
 
     :param url: Url to zip file as string
+    :param zip_file_name: Path of zip file, defaults to ./documents/export.zip
     :return: Name of downloaded zip file as string
     """
 
     # download zip file to the subfolder ./documents on a local machine...
-    zip_file_name = os.path.join(os.getcwd(),'documents','export.zip')
+    if zip_file_name is None:
+        zip_file_name = os.path.join(os.getcwd(),'documents','export.zip')
     zip_file = requests.get(url)
     zip_file.raise_for_status()
     save_file = open(zip_file_name,'wb')
@@ -123,8 +132,17 @@ def rename_files(path_to_pagexml, path_to_folder):
     :param path_to_pagexml: Path to file as provided by function unzip_file
     """
     for filename in os.listdir(path_to_pagexml):
-        # replace string for Frankfurt ms and add leading numbers if neccessary
-        os.rename(os.path.join(path_to_pagexml,filename), os.path.join(path_to_pagexml, filename.replace('Ms Barth 50 - Decretum-', '').zfill(4)))
+        os.rename(os.path.join(path_to_pagexml,filename), os.path.join(path_to_pagexml, normalise_pagexml_filename(filename)))
+
+def normalise_pagexml_filename(filename):
+    """ Normalises filename of a downloaded pageXML file
+
+    :param filename: Filename without path as string
+    :return: Numbered filename
+    """
+
+    # replace string for Frankfurt ms and add leading numbers if neccessary
+    return filename.replace('Ms Barth 50 - Decretum-', '').zfill(4)
 
 def only_numbers(x):
     """ building sort key for load_pagexml()
@@ -152,93 +170,282 @@ def load_pagexml(folder_name):
     path_to_files = sorted([folder_name + '/' + string for string in filenames], key = only_numbers)
     return path_to_files
 
+def newest_modification_time(folder_name):
+    """ Get the most recent modification time of a folder and the files in it
+
+    Editing or overwriting a file does not change the modification time of its folder, so the files are checked too.
+
+    :param folder_name: Takes path to pageXML as returned by unzip_file()
+    :return: Returns modification time in seconds since the epoch
+    """
+
+    return max([os.path.getmtime(folder_name)] + [entry.stat().st_mtime for entry in os.scandir(folder_name)
+                                                  if entry.is_file()])
+
+# pageXML file inside an exported zip file, can be used instead of a path to a pageXML file
+ZipPage = collections.namedtuple('ZipPage', ['zip_file_name', 'member', 'filename'])
+
+@functools.lru_cache(maxsize=8)
+def open_zip_file(zip_file_name, modification_time, process_id):
+    """ Open zip file once per process (reopened if modification time changes)
+
+    The process id is part of the key, so worker processes forked after opening never share the file position.
+    """
+
+    return ZipFile(zip_file_name, 'r')
+
+def load_pagexml_from_zip(zip_file_name):
+    """ Get pageXML files inside an exported zip file without extracting them
+
+    Files are sorted by page number like load_pagexml(), the filenames of the Frankfurt ms are normalised in memory
+    like rename_files().
+
+    :param zip_file_name: Name of zip file as returned by download_export()
+    :return: Returns pageXML files as list of ZipPage
+    """
+
+    with ZipFile(zip_file_name, 'r') as zip_obj:
+        members = [name for name in zip_obj.namelist() if name.split('/')[-2:-1] == ['page'] and name.endswith('.xml')]
+    pages = [ZipPage(zip_file_name, name, normalise_pagexml_filename(name.rsplit('/', 1)[-1])) for name in members]
+    return sorted(pages, key = lambda page: only_numbers('/' + page.filename))
+
+def open_pagexml(page):
+    """ Open pageXML file for reading bytes
+
+    :param page: Path to pageXML file as returned by load_pagexml() or ZipPage as returned by load_pagexml_from_zip()
+    :return: Binary file object
+    """
+
+    if isinstance(page, ZipPage):
+        return open_zip_file(page.zip_file_name, os.path.getmtime(page.zip_file_name), os.getpid()).open(page.member)
+    return open(page, 'rb')
+
+def read_pagexml(page):
+    """ Read content of pageXML file as bytes, see open_pagexml() """
+
+    with open_pagexml(page) as pagexml_file:
+        return pagexml_file.read()
+
+def parse_pagexml(page):
+    """ Parse pageXML file
+
+    :param page: Path to pageXML file or ZipPage, see open_pagexml()
+    :return: lxml ElementTree
+    """
+
+    with open_pagexml(page) as pagexml_file:
+        return LET.parse(pagexml_file)
+
+def iter_pagexml_from_zip(zip_file_name):
+    """ Iterate over pageXML files inside an exported zip file in page order without extracting them
+
+    :param zip_file_name: Name of zip file as returned by download_export()
+    :return: Yields tuples of page number and parsed tree
+    """
+
+    for page in load_pagexml_from_zip(zip_file_name):
+        yield only_numbers('/' + page.filename), parse_pagexml(page)
+
+def read_page_regions(page):
+    """ Read text regions and text lines of a pageXML file in a single streaming pass, see page_model.py
+
+    :param page: Path to pageXML file or ZipPage, see open_pagexml()
+    :return: page_model.PageRegions
+    """
+
+    with open_pagexml(page) as pagexml_file:
+        return page_model.read_page_regions(pagexml_file)
+
 """ Export and import functions for handling data on existdb instance using REST API
 
 Documentation: https://exist-db.org/exist/apps/doc/devguide_rest
 """
 
 def get_exist_data(user, pw, exist_url, resources_folder):
-    """ Getting list of abbreviations from remote exist-db collections provided by xquery script
+    """ Synchronising list of abbreviations with remote exist-db collections provided by xquery script
 
     Downloads list of abbreviation needed for automatic expansion from existdb instance
-    queried by xquery script named 'abbreviations.xquery' on server as JSON file
-    'abbreviation_dictionary.json' in resource folder specified in config.py on local machine.
+    queried by xquery script named 'abbreviations.xquery' on server and merges it into
+    'abbreviation_dictionary.json' and its store in resource folder specified in config.py on local machine.
+    The request is conditional: ETag and Last-Modified of the last download are sent as If-None-Match and
+    If-Modified-Since, if the list is unchanged (304), nothing is downloaded. The list is parsed while it is
+    downloaded, see parse_exist_abbreviations(), only changes are written to the store, see abbreviation_store.py.
 
     :param user: Username as string (should be specified in config.py)
     :param pw: Password as string (should be specified in config.py)
     :param exist_url: Url to xquery script providing abbreviations as string (should be specified in config.py)
     :param resources_folder: Download-folder as string (should be specified in config.py)
-    :return: Returns dictionary containing abbreviations with corresponding expansions for further processing
+    :return: Returns store containing abbreviations with corresponding expansions for further processing
     """
 
+    json_filename = os.path.join(resources_folder, abbreviation_store.json_file_name)
+    store_filename = os.path.join(resources_folder, abbreviation_store.store_file_name)
+
+    # ...conditional request, if the local store is up to date with the local file...
+    headers = {}
+    metadata = abbreviation_store.read_metadata(store_filename)
+    if os.path.exists(json_filename) and metadata.get('stamp') == abbreviation_store.source_stamp(json_filename):
+        if 'etag' in metadata:
+            headers['If-None-Match'] = metadata['etag']
+        if 'last_modified' in metadata:
+            headers['If-Modified-Since'] = metadata['last_modified']
+
     # login to exist...
     # ...set session...
     session = requests.Session()
 
     # Get xml-document containing list of abbreviatins as choice elements via xquery stored on exist server...
     url = exist_url + 'abbreviations.xquery'
+    with session.get(url, auth=HTTPBasicAuth(user, pw), headers=headers, stream=True) as export_request:
+        if export_request.status_code == 304:
+            print('Abbreviations in eXist are unchanged.')
+            return abbreviation_store.open_store(json_filename)
+        export_request.raise_for_status()
+        # ...parse list while downloading...
+        dictionary_abbr_exist = parse_exist_abbreviations(export_request.iter_content(chunk_size=65536))
+        response_metadata = {key: export_request.headers[header] for key, header in
+                             (('etag', 'ETag'), ('last_modified', 'Last-Modified')) if header in export_request.headers}
+
+    # ...merge changes into local file and store...
+    changes = abbreviation_store.merge_dictionary(json_filename, dictionary_abbr_exist, response_metadata)
+    print(f"Abbreviations from eXist: {changes['added']} added, {changes['changed']} changed, "
+          f"{changes['removed']} removed.")
+    return abbreviation_store.open_store(json_filename)
+
+def parse_exist_abbreviations(chunks):
+    """ Parse list of abbreviations returned by abbreviations.xquery while it is downloaded
+
+    Every tei:choice is read when it is complete and removed from the tree afterwards. The abbreviation is the text up
+    to the end of its tei:abbr, the expansion the text following it, both without whitespace and without tei:fw.
+    Choice elements without tei:abbr are skipped, if an abbreviation occurs several times, the last expansion is used.
+
+    :param chunks: Iterable of bytes, e.g. content of the response
+    :return: Dictionary containing abbreviations with corresponding expansions
+    """
 
-    # ...post export request, starts export and returns xml...
-    export_request = session.get(url, auth=HTTPBasicAuth(user, pw))
-    export_request = export_request.text
+    def local_name(element):
+        return LET.QName(element).localname if isinstance(element.tag, str) else None
+
+    def text_without_fw(element):
+        parts = [element.text or '']
+        for child in element:
+            if local_name(child) != 'fw':
+                parts.append(text_without_fw(child))
+            parts.append(child.tail or '')
+        return ''.join(parts)
 
-    # ...preprocessing and converting xml file in dictionary...
-    export_request = export_request.replace('</abbr>','</abbr>;')
-    export_request = re.sub('\s+','',export_request)
-    export_request = re.sub('\n+','',export_request)
-    export_request = re.sub('<fw(.*?)</fw>','',export_request)
-    export_request = export_request.replace('</choice>','</choice>\n')
-    export_request = re.sub('<.*?>','',export_request)
     dictionary_abbr_exist = {}
-    list_of_abbreviations = export_request.split('\n')
-
-    # ...delete last empty line...
-    del list_of_abbreviations[-1]
-    list_of_abbreviations = list(dict.fromkeys(list_of_abbreviations))
-
-    for i in list_of_abbreviations:
-        choice = i.split(';')
-        # ...skip errors in list...
-        if len(choice) > 1:
-            dictionary_abbr_exist[choice[0]] = choice[1]
-
-    # ... save dictionary in file in local subfolder ./resources for further usage...
-    abbreviation_json = open(resources_folder + "abbreviation_dictionary.json", "w", encoding = 'utf8')
-    json.dump(dictionary_abbr_exist, abbreviation_json)
-    abbreviation_json.close()
-    # ...return dictionary
+    seen = set()
+    parser = LET.XMLPullParser(events=('end',))
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            parser.close()
+        else:
+            parser.feed(chunk)
+        for _, element in parser.read_events():
+            if local_name(element) != 'choice':
+                continue
+            parts = [[element.text or ''], []]
+            part = 0
+            for child in element:
+                if local_name(child) != 'fw':
+                    parts[part].append(text_without_fw(child))
+                if part == 0 and local_name(child) == 'abbr':
+                    part = 1
+                parts[part].append(child.tail or '')
+            if part == 1:
+                # ...skip repeated choice elements, the list contains every occurrence...
+                choice = tuple(re.sub(r'\s+', '', ''.join(texts)) for texts in parts)
+                if choice not in seen:
+                    seen.add(choice)
+                    dictionary_abbr_exist[choice[0]] = choice[1]
+            # ...remove parsed choice elements...
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
     return dictionary_abbr_exist
 
-def load_abbreviation_dict():
-    """ Check if abbreviation file already exists or has to be downloaded
+def load_abbreviation_dict(sync=False):
+    """ Open store of abbreviations, abbreviation file is downloaded if it does not exist yet
 
-    :return: dictionary containing abbreviations and corresponding expansions
+    The abbreviation file is compiled into a database once and read lazily, see abbreviation_store.py.
+
+    :param sync: Synchronise abbreviations with eXist first, see get_exist_data()
+    :return: store containing abbreviations and corresponding expansions (supports 'in' and [] like a dictionary)
     """
-    try:
-        dictionary_abbr_exist = os.path.join(config.resources_folder, 'abbreviation_dictionary.json')
-        with open(dictionary_abbr_exist,'r', encoding = 'utf8') as json_file:
-            dictionary_abbr_exist = json.load(json_file)
-    except:
-        dictionary_abbr_exist = get_exist_data(exist_credentials.user_exist, exist_credentials.pw_exist, config.exist_url, config.resources_folder)
-        with open(dictionary_abbr_exist,'r', encoding = 'utf8') as json_file:
-            dictionary_abbr_exist = json.load(json_file)
-    return dictionary_abbr_exist
+    json_filename = os.path.join(config.resources_folder, abbreviation_store.json_file_name)
+    if sync or not os.path.exists(json_filename):
+        return get_exist_data(exist_credentials.user_exist, exist_credentials.pw_exist, config.exist_url,
+                              config.resources_folder)
+    return abbreviation_store.open_store(json_filename)
 
 """ function for postprocessing page-xml
 
 """
 
+def rules_overlap(string_a, string_b):
+    """ check, if two strings of the rule table can interfere with each other
+
+    Two strings interfere if one contains the other or if the end of one string is the beginning of the other.
+    :param string_a: key or expansion of a rule as string
+    :param string_b: key or expansion of a rule as string
+    :return: True if strings overlap
+    """
+
+    if string_a in string_b or string_b in string_a:
+        return True
+    for i in range(1, min(len(string_a), len(string_b))):
+        if string_a[-i:] == string_b[:i] or string_b[-i:] == string_a[:i]:
+            return True
+    return False
+
+def compile_expansion_rules(rules_for_expansion):
+    """ compile rules for manual expansion into stages of multi-pattern matchers
+
+    Applying the rules one after another with str.replace() means that the expansion of one rule can create a
+    match for a later rule (e.g. '\\u0304' -> 'm' followed by 'm\\u0305' -> 'men'). Consecutive rules which cannot
+    interfere with each other are therefore put into one stage, every stage is compiled into a single regular
+    expression (alternation ordered by length, i.e. longest match first) and applied in one pass.
+    This keeps the results of the rules applied one after another.
+
+    :param rules_for_expansion: dictionary of rules as specified in config.py
+    :return: list of stages as tuples of compiled pattern and dictionary of rules
+    """
+
+    stages = []
+    for key, value in rules_for_expansion.items():
+        # ...start a new stage, if the rule interferes with a rule of the current stage...
+        if not stages or any(rules_overlap(stage_key, key) or rules_overlap(stage_value, key)
+                             for stage_key, stage_value in stages[-1].items()):
+            stages.append({})
+        stages[-1][key] = value
+
+    compiled_stages = []
+    for stage in stages:
+        pattern = re.compile('|'.join(re.escape(key) for key in sorted(stage, key=len, reverse=True)))
+        compiled_stages.append((pattern, stage))
+    return compiled_stages
+
+expansion_rules = None
+
+@functools.lru_cache(maxsize=65536)
 def manual_expansion(word):
     """ apply rules for manual expansion defined in config
 
-    Takes abbreviated word and returns expansion based on rules specified in config.py
+    Takes abbreviated word and returns expansion based on rules specified in config.py. The rules are compiled once
+    by compile_expansion_rules(), expansions are memoized (call manual_expansion.cache_clear() after changing the rules).
     :param word: word containign special character as specified in config.py as string
     :return: expanded word as string
     """
 
+    global expansion_rules
+    if expansion_rules is None:
+        expansion_rules = compile_expansion_rules(config.rules_for_expansion)
+
     expansion = word
-    for key, value in config.rules_for_expansion.items():
-        expansion = expansion.replace(key,value)
+    for pattern, stage in expansion_rules:
+        expansion = pattern.sub(lambda match: stage[match.group(0)], expansion)
     return expansion
 
 # replace expansions in page-xml files
@@ -296,9 +503,296 @@ def replace_abbreviations_from_pagexml(dictionary_abbr_exist, filenames):
         with open(new_filename, 'w') as f:
             tree.write(f, encoding='unicode')
 
-def replace_abbreviations_from_tei(dictionary_abbr_external, processed_text):
+def create_choice_element(word, dictionary_abbr_external, special_characters):
+    """ Create tei:choice element for a single abbreviated word
+
+    Takes abbreviated word (interpunctuation already deleted, whitespace in xml-tags replaced by '~'),
+    removes xml-tags inside the word, expands it using the abbreviation dictionary or the rules for manual expansion
+    and reinserts the removed tags into the expansion. Used by replace_abbreviations_from_tei() and
+    replace_abbreviations_from_tei_legacy().
+
+    :param word: Abbreviated word as string
+    :param dictionary_abbr_external: Dictionary containing abbreviations and corresponding expansions
+    :param special_characters: List of special characters marking abbreviations as specified in config.py
+    :return: tei:choice element as string
+    """
+
+    # ... store word as items in dictionary...
+    dictionary_abbr = {word: {'tags': {}}}
+
+    # ...find elements inside words and store start, end and content of word in dictionary...
+    pattern = re.compile('\<.*?\>',re.UNICODE)
+    n = 0
+    word_copy = word
+    for match in pattern.finditer(word):
+        element_start = match.start()
+        element_end = match.end()
+        element_text = match.group()
+        # ...add tags in nested dictionary...
+        dictionary_abbr[word_copy]['tags'][n] = {'tag': element_text, 'start': element_start, 'end': element_end}
+        n+=1
+        # ...delete elements from word (caveat: changes indices of start and beginning, thus order of deletion must be taken into account when reinserting...)
+        word = re.sub(element_text,'',word)
+        dictionary_abbr[word_copy]['abbr'] = word
+
+    # ...check if word is in abbreviation dictionary...
+    if word in dictionary_abbr_external:
+        #... and insert corresponding expansion if found in dict...
+        dictionary_abbr[word_copy]['expan'] = dictionary_abbr_external[word]
+    # ...else, expand word by rules specified in config file...
+    else:
+        expansion = manual_expansion(word)
+
+        # ...check, if some words have not been properly expanded...
+        if any(character in special_characters for character in expansion):
+            dictionary_abbr[word_copy]['expan'] = 'ERROR'
+        else:
+            dictionary_abbr[word_copy]['expan'] = expansion
+
+    # ...take deleted tags from dictionary and put them into expanded word...
+    if dictionary_abbr[word_copy]['tags'].values():
+
+        # ...detect number of deleted tags...
+        len_dict = range(0,len(dictionary_abbr[word_copy]['tags'].keys()))
+        word_with_tag = dictionary_abbr[word_copy]['expan']
+        # ...iterate through tags and insert by using start index...
+        for i in len_dict:
+            tag = dictionary_abbr[word_copy]['tags'][i]['tag']
+            start = dictionary_abbr[word_copy]['tags'][i]['start']
+            # ...check, if expanded special character has occured before tag that is to be entered...
+            # ..if so, add length of insertion to start
+            character_list = config.rules_for_expansion
+
+            if '</hi>' in tag:
+                #if (bool(re.search('>\w</hi>',word_copy)) == True) and (bool(i in character_list in re.search('>\w</hi>',word_copy)) == False):
+                try:
+                    if (bool(re.search('>\w</hi>',word_copy)) == True) and (bool(any(i in character_list.keys() for character in re.search('>\w</hi>',word_copy)[0])) == False):
+                        if 'Ꝓ' in re.search('>\w</hi>',word_copy)[0]:
+                            pass
+                        else:
+                            start = start
+                            print(word_copy)
+                    else:
+                        pass
+                except Exception as e:
+                    print(e)
+            else:
+                trigger = False
+                for key, value in character_list.items():
+                    if value in word_with_tag:
+                        if word_with_tag.index(value) < start:
+                            start = start + (len(key))
+                            if start > 1:
+                                if trigger == False:
+                                    start = start -1
+                                    trigger = True
+
+                                else:
+                                    pass
+            # ...insert tag on index...
+            word_with_tag = str(word_with_tag)
+            word_with_tag = word_with_tag[:start]+tag+word_with_tag[start:]
+        dictionary_abbr[word_copy]['expan_with_tags'] = word_with_tag
+
+    else:
+        dictionary_abbr[word_copy]['expan_with_tags'] = dictionary_abbr[word_copy]['expan']
+
+    # ...create choice element corresponding to tei scheme...
+    choice_element = '<choice><abbr>'+word_copy.strip()+'</abbr><expan>'+str(dictionary_abbr[word_copy]['expan_with_tags'])+'</expan></choice>'
+    if '</fw>' in choice_element:
+        choice_element = choice_element.replace('</fw>','') + '</fw>'
+    if '<p n="1">' in choice_element:
+        choice_element = choice_element.replace('<choice><abbr><p n="1">','<p n="1"><choice><abbr>')
+        choice_element = choice_element.replace('<expan><p n="1">','<expan>')
+    if '</item>' in choice_element:
+        choice_element = choice_element.replace('</item>','')
+        choice_element = choice_element.replace('</choice>','</choice></item>')
+    if '<note' in choice_element:
+        choice_element = re.sub(r'<choice><abbr>(<note.*?>)','\g<1><choice><abbr>',choice_element)
+        choice_element = re.sub(r'<expan><note.*?>','<expan>',choice_element)
+
+    return choice_element
+
+# interpunctuation, deleted from abbreviated words
+interpunctuation = '\uF1F8\uF1EA\uF1F5\uF1F0\uF160\uF1E2\uF1E1'
+
+def tokenize_tei(processed_text):
+    """ Split a TEI-encoded text into tokens for the expansion of abbreviations
+
+    :param processed_text: TEI-encoded text as string
+    :return: Text with whitespace in xml-tags replaced by '~' and list of its tokens as (start, end, token)
+    """
+
+    # ...replace whitespace with ~ in xml-tags to enable tokenizing without loosing element structure...
+    refined_xml = re.sub('\<(.*?)\>', lambda match: match.group(0).replace(' ','~'), processed_text)
+    tokens = [(match.start(), match.end(), match.group(0)) for match in re.finditer('\S+', refined_xml)]
+    return refined_xml, tokens
+
+def rank_abbreviations(tokens, ranks=None):
+    """ Rank abbreviated words (interpunctuation deleted) by their first occurrence
+
+    :param tokens: Tokens as returned by tokenize_tei()
+    :param ranks: Ranks of the preceding text, e.g. of the preceding chunks of a book (updated in place)
+    :return: Dictionary of abbreviated word -> rank
+    """
+
+    if ranks is None:
+        ranks = {}
+    special_characters = list(config.special_characters_dict.values())
+    for start, end, token in tokens:
+        word = token
+        for character in interpunctuation:
+            word = word.replace(character,'')
+        if word not in ranks and any(character in special_characters for character in word):
+            ranks[word] = len(ranks)
+    return ranks
+
+def abbreviation_tag_index(ranks):
+    """ Index abbreviations starting with a tag by their first tag
+
+    :param ranks: Ranks of abbreviated words as returned by rank_abbreviations()
+    :return: Dictionary of first tag -> abbreviations in order of their rank
+    """
+
+    tag_index = {}
+    for word in ranks:
+        if word[0] == '<' and '>' in word:
+            tag_index.setdefault(word[:word.index('>')+1], []).append(word)
+    return tag_index
+
+def expand_abbreviations(dictionary_abbr_external, refined_xml, tokens, ranks, tag_index, choice_elements=None):
+    """ Replace the abbreviated words of a tokenized text with tei:choice elements in one pass
+
+    Used by replace_abbreviations_from_tei(). The ranks may cover more than the given text, e.g. a whole book that is
+    expanded chunk by chunk (see streaming.py): abbreviations are then matched as in the whole book.
+
+    :param dictionary_abbr_external: Dictionary containing abbreviations and corresponding expansions
+    :param refined_xml: Text as returned by tokenize_tei()
+    :param tokens: Tokens as returned by tokenize_tei()
+    :param ranks: Ranks of abbreviated words as returned by rank_abbreviations()
+    :param tag_index: Index of abbreviations as returned by abbreviation_tag_index()
+    :param choice_elements: Map of abbreviation -> tei:choice element of preceding calls (updated in place)
+    :return: Text with tei:choice elements, whitespace in xml-tags restored
+    """
+
+    special_characters = list(config.special_characters_dict.values())
+
+    # ...map of abbreviation -> choice element, filled once per abbreviated word...
+    if choice_elements is None:
+        choice_elements = {}
+
+    # ...write output in one pass...
+    output = []
+    position = 0
+    for start, end, token in tokens:
+        output.append(refined_xml[position:start])
+        position = end
+        previous_character = refined_xml[start-1] if start > 0 else ''
+        next_character = refined_xml[end] if end < len(refined_xml) else ''
+
+        # ...collect candidates as (rank, start, end, abbreviation)...
+        candidates = []
+
+        # ...abbreviations starting with a tag, wherever they occur in the token...
+        index = token.find('<')
+        while index != -1:
+            first_tag = token[index:token.find('>', index)+1]
+            for word in tag_index.get(first_tag, []):
+                if token.startswith(word, index):
+                    candidates.append((ranks[word], index, index+len(word), word))
+            index = token.find('<', index+1)
+
+        # ...word preceded by whitespace and followed by whitespace, newline or interpunctuation...
+        if previous_character == ' ':
+            index = min([token.index(character) for character in interpunctuation if character in token], default=-1)
+            if index != -1:
+                word = token[:index]
+            elif next_character in (' ', '\n'):
+                word = token
+            else:
+                word = ''
+            if word in ranks and word[0] != '<':
+                candidates.append((ranks[word], 0, len(word), word))
+
+        # ...word following an element or interpunctuation at the end of the token...
+        if next_character == ' ':
+            for index in range(1, len(token)):
+                word = token[index:]
+                if token[index-1] in '>\uf1e1' and word in ranks and word[0] != '<':
+                    candidates.append((ranks[word], index, len(token), word))
+
+        if not candidates:
+            output.append(token)
+            continue
+
+        # ...replace non-overlapping candidates, abbreviations occurring first in the text first...
+        selected = []
+        for rank, candidate_start, candidate_end, word in sorted(candidates):
+            if all(candidate_end <= other[0] or candidate_start >= other[1] for other in selected):
+                selected.append((candidate_start, candidate_end, word))
+        index = 0
+        for candidate_start, candidate_end, word in sorted(selected):
+            if word not in choice_elements:
+                choice_elements[word] = create_choice_element(word, dictionary_abbr_external, special_characters)
+            output.append(token[index:candidate_start] + choice_elements[word])
+            index = candidate_end
+        output.append(token[index:])
+
+    output.append(refined_xml[position:])
+    refined_xml = ''.join(output)
+
+    # ...replace ~ with whitespace in xml-tags again...
+    return re.sub('\<(.*?)\>', lambda match: match.group(0).replace('~',' '), refined_xml)
+
+def replace_abbreviations_from_tei(dictionary_abbr_external, processed_text, compatibility_mode=False):
+    """ Processing TEI-Encoded Texts: Replacing Abbreviations in a single pass
+
+    Replaces abbreviations in a TEI-encoded text with tei:choice elements containing abbreviation and expansion.
+    Instead of running up to eleven re.sub() calls over the whole text for every abbreviated word (see
+    replace_abbreviations_from_tei_legacy()), the text is split into tokens once, every abbreviated word is
+    expanded once into a map of abbreviation -> tei:choice element and the output is written in one pass.
+
+    Abbreviations are matched in the same contexts as in the legacy function: words preceded by whitespace and
+    followed by whitespace, newline or interpunctuation, words following an element or interpunctuation at the end
+    of a token and words starting with an element (wherever they occur). If several abbreviations overlap in a token,
+    the one occurring first in the text wins, as it would have been replaced first by the legacy function.
+
+    Parameters:
+    dictionary_abbr_external (dict): A dictionary containing abbreviations as keys and their corresponding
+    expanded forms as values.
+    processed_text (str): The TEI-encoded text that needs to be processed.
+    compatibility_mode (bool): If True, the legacy function is run as well and differences between both
+    results are printed (for checking the single-pass expansion against existing corpora).
+
+    Returns:
+    refined_xml (str): The processed text where all identified abbreviations have been replaced with their
+    respective expansions wrapped in a TEI <choice> element.
+    """
+
+    refined_xml, tokens = tokenize_tei(processed_text)
+    ranks = rank_abbreviations(tokens)
+    refined_xml = expand_abbreviations(dictionary_abbr_external, refined_xml, tokens, ranks,
+                                       abbreviation_tag_index(ranks))
+
+    if compatibility_mode:
+        legacy_xml = replace_abbreviations_from_tei_legacy(dictionary_abbr_external, processed_text)
+        if legacy_xml == refined_xml:
+            print('Compatibility check: expansion identical to legacy function.')
+        else:
+            diff = list(difflib.unified_diff(legacy_xml.splitlines(), refined_xml.splitlines(),
+                                             'legacy', 'single-pass', lineterm='', n=0))
+            print(f'Compatibility check: {len([line for line in diff if line[:1] == "+"]) - 1} lines differ from legacy function.')
+            for line in diff:
+                print(line)
+
+    # ...return text
+    return refined_xml
+
+def replace_abbreviations_from_tei_legacy(dictionary_abbr_external, processed_text):
     """ Processing TEI-Encoded Texts: Replacing Abbreviations and Reinserting XML Tags
 
+    Legacy version of replace_abbreviations_from_tei(), kept as reference for its compatibility mode.
+
     This function is used to replace abbreviations in a TEI-encoded text with their respective expansions.
     It works by identifying abbreviations via specific characters, replacing them with their expanded forms, 
     and reinserting any XML tags that might have been removed during the process. The function then wraps 
@@ -317,13 +811,10 @@ def replace_abbreviations_from_tei(dictionary_abbr_external, processed_text):
     Steps:
     1. Replace whitespace in XML tags with an underscore to maintain element structure.
     2. Split the text into words and remove any duplicates.
-    3. Create a dictionary to store abbreviations and their respective expanded forms.
-    4. For each word, remove any interpunctuation and check if it contains any special characters that indicate an abbreviation.
-    5. If an abbreviation is found, the word is stored in the dictionary with information about any XML tags it contains and their respective start and end positions.
-    6. The function checks if the abbreviation is in the external abbreviation dictionary. If it is, the corresponding expansion is used. Otherwise, the function expands the abbreviation based on rules specified in the config file.
-    7. If any tags were removed from the word during the process, they are reinserted in their original positions in the expanded word.
-    8. The function then wraps the original abbreviation and its expanded form in a TEI <choice> element. This choice element replaces the original abbreviation in the text.
-    9. Finally, the function replaces the underscores in the XML tags with whitespace and returns the processed text.
+    3. For each word, remove any interpunctuation and check if it contains any special characters that indicate an abbreviation.
+    4. If an abbreviation is found, the corresponding tei:choice element is created by create_choice_element().
+    5. This choice element replaces the original abbreviation in the text.
+    6. Finally, the function replaces the underscores in the XML tags with whitespace and returns the processed text.
     """
 
 
@@ -345,120 +836,14 @@ def replace_abbreviations_from_tei(dictionary_abbr_external, processed_text):
     # ... creating list to iterate...
     special_characters = list(special_characters_dict.values())
 
-    # ...Create dictionary for storing all abbreciations with corresponding values...
-    dictionary_abbr = {}
-
-    # ... prepare words from wordlist and store in dictionary...
+    # ... prepare words from wordlist...
     for word in wordlist:
         # ...delete used interpunctuation from word...
         word = word.replace('\uF1F8','').replace('\uF1EA','').replace('\uF1F5','').replace('\uF1F0','').replace('\uF160','').replace('\uF1E2','').replace('\uF1E1','')
         # ... detect abbreviations by special characters...
         if any(character in special_characters for character in word):
-            # ... store word as items in dictionary...
-            dictionary_abbr[word] = {'tags': {}}
-
-            # ...find elements inside words and store start, end and content of word in dictionary...
-            pattern = re.compile('\<.*?\>',re.UNICODE)
-            n = 0
             word_copy = word
-            for match in pattern.finditer(word):
-                element_start = match.start()
-                element_end = match.end()
-                element_text = match.group()
-                # ...add tags in nested dictionary...
-                dictionary_abbr[word_copy]['tags'][n] = {'tag': element_text, 'start': element_start, 'end': element_end}
-                n+=1
-                # ...delete elements from word (caveat: changes indices of start and beginning, thus order of deletion must be taken into account when reinserting...)
-                word = re.sub(element_text,'',word)
-                dictionary_abbr[word_copy]['abbr'] = word
-
-            # ...check if word is in abbreviation dictionary...
-            if word in dictionary_abbr_external:
-                #... and insert corresponding expansion if found in dict...
-                dictionary_abbr[word_copy]['expan'] = dictionary_abbr_external[word]
-            # ...else, expand word by rules specified in config file...
-            else:
-                expansion = manual_expansion(word)
-                expansion = expansion
-
-                # ...check, if some words have not been properly expanded...
-                if any(character in special_characters for character in expansion):
-                    dictionary_abbr[word_copy]['expan'] = 'ERROR'
-                else:
-                    dictionary_abbr[word_copy]['expan'] = expansion
-
-            # ...take deleted tags from dictionary and put them into expanded word...
-            if dictionary_abbr[word_copy]['tags'].values():
-
-                # ...detect number of deleted tags...
-                len_dict = range(0,len(dictionary_abbr[word_copy]['tags'].keys()))
-                word_with_tag = dictionary_abbr[word_copy]['expan']
-                # ...iterate through tags and insert by using start index...
-                for i in len_dict:
-                    tag = dictionary_abbr[word_copy]['tags'][i]['tag']
-                    start = dictionary_abbr[word_copy]['tags'][i]['start']
-                    # ...check, if expanded special character has occured before tag that is to be entered...
-                    # ..if so, add length of insertion to start
-                    character_list = config.rules_for_expansion
-
-                    if '</hi>' in tag:
-                        #if (bool(re.search('>\w</hi>',word_copy)) == True) and (bool(i in character_list in re.search('>\w</hi>',word_copy)) == False):
-                        try:
-                            if (bool(re.search('>\w</hi>',word_copy)) == True) and (bool(any(i in character_list.keys() for character in re.search('>\w</hi>',word_copy)[0])) == False):
-                                if 'Ꝓ' in re.search('>\w</hi>',word_copy)[0]:
-                                    pass
-                                else:
-                                    start = start
-                                    print(word_copy)
-                            else:
-                                pass
-                        except Exception as e:
-                            print(e)
-                    else:
-                        trigger = False
-                        for key, value in character_list.items():
-                            if value in word_with_tag:
-                                if word_with_tag.index(value) < start:
-                                    start = start + (len(key))
-                                    if start > 1:
-                                        if trigger == False:
-                                            start = start -1
-                                            trigger = True
-
-                                        else:
-                                            pass
-                    # ...insert tag on index...
-                    word_with_tag = str(word_with_tag)
-                    word_with_tag = word_with_tag[:start]+tag+word_with_tag[start:]
-                dictionary_abbr[word_copy]['expan_with_tags'] = word_with_tag
-
-            else:
-                dictionary_abbr[word_copy]['expan_with_tags'] = dictionary_abbr[word_copy]['expan']
-                # ...create choice element corresponding to tei scheme...
-
-            # choose between tei choice element or just insertion of expanded text
-            choice_element = '<choice><abbr>'+word_copy.strip()+'</abbr><expan>'+str(dictionary_abbr[word_copy]['expan_with_tags'])+'</expan></choice>'
-            if '</fw>' in choice_element:
-                choice_element = choice_element.replace('</fw>','') + '</fw>'
-            else:
-                pass
-            if '<p n="1">' in choice_element:
-                choice_element = choice_element.replace('<choice><abbr><p n="1">','<p n="1"><choice><abbr>')
-                choice_element = choice_element.replace('<expan><p n="1">','<expan>')
-            else:
-                pass
-            if '</item>' in choice_element:
-                choice_element = choice_element.replace('</item>','')
-                choice_element = choice_element.replace('</choice>','</choice></item>')
-            else:
-                pass
-            if '<note' in choice_element:
-                choice_element = re.sub(r'<choice><abbr>(<note.*?>)','\g<1><choice><abbr>',choice_element)
-                choice_element = re.sub(r'<expan><note.*?>','<expan>',choice_element)
-                #print(choice_element)
-            else:
-                pass
-            #choice_element = str(dictionary_abbr[word_copy]['expan_with_tags'])
+            choice_element = create_choice_element(word, dictionary_abbr_external, special_characters)
 
             # ...loop through text and replace original word with choice element...
             # (Abbreviations starting with a tag have to be treated differently)
@@ -490,7 +875,6 @@ def replace_abbreviations_from_tei(dictionary_abbr_external, processed_text):
         refined_xml = refined_xml.replace(i,no_underscore)
 
     # ...return text
-    #print(dictionary_abbr)
     return refined_xml
 
 def export_tei(filenames):
@@ -523,9 +907,9 @@ def export_tei(filenames):
 
         # find column 1 and return element
         try:
-            column_1 = root.xpath('//ns0:TextRegion[contains(@custom,"type:column_1")]', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
+            column_1 = xpaths.text_regions_of_custom_type(root, type='column_1')[0]
             text_column_one = "\n<pb/><cb n='a'/>"
-            unicode_column_one = column_1.xpath('.//ns0:TextLine//ns0:Unicode', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+            unicode_column_one = xpaths.unicode_in_text_lines(column_1)
             for line in unicode_column_one:
                 text_column_one = text_column_one + '\n<lb/>' + line.text
         except:
@@ -533,10 +917,10 @@ def export_tei(filenames):
 
         # find column 2 and return element
         try:
-            column_2 = root.xpath('//ns0:TextRegion[contains(@custom,"type:column_2")]', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})[0]
+            column_2 = xpaths.text_regions_of_custom_type(root, type='column_2')[0]
             # put together text of column 1 and text of column 2
             text_column_two = "\n<cb n='b'/>"
-            unicode_column_two = column_2.xpath('.//ns0:TextLine//ns0:Unicode', namespaces = {'ns0':'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'})
+            unicode_column_two = xpaths.unicode_in_text_lines(column_2)
 
             for line in unicode_column_two:
                 text_column_two = text_column_two + '\n<lb/>' + line.text
@@ -588,8 +972,8 @@ def line_breaks(text_page):
     """
 
     text_page = text_page.replace('¬','')
-    # load dictinary containing wordforms
-    df = pd.read_csv(config.resources_folder+'lexicon.csv')
+    # load dictinary containing wordforms (indexed once per process)
+    lexicon_of_word_forms = lexicon.load_lexicon()
 
     # check word with linebreak
     # find words next to linebreaks
@@ -603,7 +987,7 @@ def line_breaks(text_page):
         searchstring = i
         searchstring = re.sub('\n<lb/>','',searchstring)
         # look for searchstring in dictionary and replace <lb/> with <lb break="no"/> if found
-        if df['WF-Name'].str.contains(searchstring.lower()).any():
+        if lexicon_of_word_forms.contains(searchstring.lower()):
             i = re.sub('<lb/>','<lb break="no" type="automated"/>',i)
         # if searchstring is not in dictionary, word probably don't belong together, <lb/> is inserted
         else:
@@ -614,17 +998,18 @@ def line_breaks(text_page):
 
     return text_page
 
-def word_segmentation(text_page):
+def word_segmentation(text_page, lexicon_of_word_forms=None):
     """
     Post-processes the word segmentation in the exported text page.
 
     This function analyzes the segmentation of words in the text page. It splits the page into individual words,
     then compares each word to a predefined dictionary (lexicon.csv). If a word isn't found in the dictionary,
-    the function attempts to split the word into two parts that are found in the dictionary and adds a space 
-    between them. 
+    the function splits the word into the fewest possible parts that are found in the dictionary and adds spaces
+    between them. The dictionary is loaded once per process and reused for all pages.
 
     Parameters:
     text_page (str): A string of text from a page, which may contain incorrectly segmented words.
+    lexicon_of_word_forms (Lexicon): Lexicon to be used, defaults to lexicon.csv in the resources folder.
 
     Returns:
     text_page (str): The processed string of text, with word segmentation corrected based on the predefined dictionary.
@@ -636,28 +1021,27 @@ def word_segmentation(text_page):
     # Remove duplicate words from the list
     wordlist = list(dict.fromkeys(wordlist))
 
+    # Load dictionary containing wordforms (indexed once per process)
+    if lexicon_of_word_forms is None:
+        lexicon_of_word_forms = lexicon.load_lexicon()
 
-
-    # Iterate through each word in the list
+    # Segment each word not found in the lexicon into the fewest possible valid parts
+    segmented_words = {}
     for word in wordlist:
-        # If the word is found in the lexicon, retain it as is
-        if df['WF-Name'].str.contains('^'+word+'$', regex=True).any():
-            new_word = word
-        else:
-            # If the word is not found in the lexicon, attempt to split it into valid parts
-            n = 1
-            word1 = word[:len(word)-n]
-            word2 = word[len(word)-n:]
-
-            # Try to find a valid split point for the word
-            while not (df['WF-Name'].str.contains(word1+'$', regex=True).any()) and (df['WF-Name'].str.contains(word2+'$',regex=True).any()):
-                n += 1
-                word1 = word[:len(word)-n]
-                word2 = word[len(word)-n:]
-            new_word = word1 + ' ' + word2  # Add a space between the split word parts
-
-        # Replace the original word in the text with the possibly segmented word
-        text_page = re.sub(word,new_word,text_page)
+        parts = lexicon_of_word_forms.segment(word.lower())
+        if len(parts) > 1:
+            # Split the original word at the same positions to keep its capitalisation
+            new_word = []
+            position = 0
+            for part in parts:
+                new_word.append(word[position:position + len(part)])
+                position += len(part)
+            segmented_words[word] = ' '.join(new_word)  # Add a space between the split word parts
+
+    # Replace all segmented words in the text in a single pass
+    if segmented_words:
+        pattern = '|'.join(re.escape(word) for word in sorted(segmented_words, key=len, reverse=True))
+        text_page = re.sub('(?<!\\S)(' + pattern + ')(?!\\S)', lambda match: segmented_words[match.group(1)], text_page)
 
     return text_page  # Return the text with corrected word segmentation
 
@@ -742,12 +1126,8 @@ def save_abbreviations(dictionary_abbr_exist, filenames):
     wordlist_abbr = []
 
     for filename in filenames:
-        tree = ET.parse(filename)
-        root = tree.getroot()
-        x = root.findall('.//{http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15}Unicode')
-
-        for i in x:
-            wordlist = i.text.split()
+        for text in read_page_regions(filename).texts:
+            wordlist = text.split()
 
             # define special characters that point to abbreviated words as dictionary (depending on model used for recognition)...
             special_characters_dict = config.special_characters_dict
@@ -787,22 +1167,47 @@ def save_abbreviations(dictionary_abbr_exist, filenames):
 
 """
 
-def download_data_from_transkribus(collection_id, document_id, startpage, endpage, path_to_folder):
+def export_zip_file_name(document_id, startpage, endpage):
+    """ Path of zip file for an export of a page range in the subfolder ./documents """
+
+    return os.path.join(os.getcwd(), 'documents', f'export_{document_id}_{startpage}-{endpage}.zip')
+
+def download_zip_from_transkribus(collection_id, document_id, startpage, endpage, session=None):
+    """ Download data from transkribus as zip file without extracting it
+
+    :param collection_id: Transkribus collection number as Int
+    :param document_id: Transkribus document number as Int
+    :param startpage: First page of document to be exported as Int
+    :param endpage: Last page of document to be exported as Int
+    :param session: Transkribus session as returned from login_transkribus(), a new session is started if None
+    :return: Returns name of zip file, see export_zip_file_name()
+    """
+
+    ## start session
+    if session is None:
+        session = login_transkribus(transkribus_credentials.username,transkribus_credentials.password)
+    ## export pagexml and download exported file (one zip file per export, so several books can be downloaded at the
+    ## same time, interrupted downloads are resumed)
+    local_xml_files = transkribus_client.download_exports([(collection_id, document_id, startpage, endpage,
+                                                            export_zip_file_name(document_id, startpage, endpage))],
+                                                          session=session)[0]
+    if isinstance(local_xml_files, Exception):
+        raise local_xml_files
+    return local_xml_files
+
+def download_data_from_transkribus(collection_id, document_id, startpage, endpage, path_to_folder, session=None):
     """ Download data from transkribus and return path to pageXMl
 
     :param collection_id: Transkribus collection number as Int
     :param document_id: Transkribus document number as Int
     :param startpage: First page of document to be exported as Int
     :param endpage: Last page of document to be exported as Int
+    :param session: Transkribus session as returned from login_transkribus(), a new session is started if None
     :return: Returns path to pageXML as list of filenames
     """
 
-    ## start session
-    session = login_transkribus(transkribus_credentials.username,transkribus_credentials.password)
-    ## export pagexml
-    export_file_url = export_pagexml(session, collection_id, document_id, startpage, endpage)
-    ## download exported file
-    local_xml_files = download_export(export_file_url)
+    ## export and download pagexml
+    local_xml_files = download_zip_from_transkribus(collection_id, document_id, startpage, endpage, session)
     ## unzip downloaded file and get path to pagexml-files
     path_to_pagexml = unzip_file(local_xml_files, path_to_folder)
     ## renames files
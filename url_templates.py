@@ -0,0 +1,137 @@
+""" Templates for the URLs of a page (facs, corresp and ana of tei:pb)
+
+The URLs of the page image, the IIIF canvas and the annotations are built from templates specified per manuscript
+in config.py. Templates use the syntax of str.format() with the following fields:
+
+    iiif_image_id: IIIF image id of the page, e.g. 236435
+    folio: Folio of the page, e.g. '139v'
+    folio_number: Number of the folio, e.g. '139'
+    folio_side: Side of the folio, e.g. 'v'
+
+Zero-padding is done by format specifications, e.g. 'p{iiif_image_id:0>4}' for 'p0012'. Templates are validated when
+compiled, so errors in config.py are reported before any page is converted.
+
+Config files written for former versions contain f-strings as source code, e.g. 'f"...{self.iiif_image_id}"'. They
+are converted into templates if they only contain the expressions used in config_template.py, but never evaluated.
+
+"""
+
+import functools # for compiling templates once per manuscript
+import re # for converting former f-string templates
+import string # for parsing templates
+import config # stores basic config
+
+# fields available in templates
+fields = ['iiif_image_id', 'folio', 'folio_number', 'folio_side']
+
+# expressions of former f-string templates and corresponding fields
+legacy_expressions = {
+    'self.iiif_image_id': '{iiif_image_id}',
+    'str(self.iiif_image_id).zfill(4)': '{iiif_image_id:0>4}',
+    'self.start_folio': '{folio}',
+    'self.start_folio[:-1].zfill(4)+self.start_folio[-1:]': '{folio_number:0>4}{folio_side}',
+}
+
+# names of the templates of a manuscript in config.py
+page_template_names = ['facs_url', 'corresp', 'ana']
+
+
+def convert_legacy_template(template):
+    """
+    Converts a former f-string template into a template.
+
+    :param template: Template as string, e.g. 'f"https://.../canvas/{self.iiif_image_id}"'
+    :return: Template, e.g. 'https://.../canvas/{iiif_image_id}', or the given template if it is no f-string
+    """
+
+    match = re.fullmatch(r'''f(["'])(.*)\1''', template.strip(), flags=re.DOTALL)
+    if not match:
+        return template
+
+    def replace_expression(expression):
+        normalised_expression = re.sub(r'\s', '', expression.group(1))
+        if normalised_expression not in legacy_expressions:
+            raise ValueError(f'Unknown expression {{{expression.group(1)}}} in template {template}, '
+                             f'use the fields {", ".join(fields)} instead')
+        return legacy_expressions[normalised_expression]
+
+    return re.sub(r'\{([^{}]*)\}', replace_expression, match.group(2))
+
+
+class UrlTemplate:
+    """
+    Represents a validated URL template.
+
+    Attributes:
+        source (str): Template as specified in config.py.
+        template (str): Template in str.format() syntax.
+
+    Methods:
+        render(folio, iiif_image_id): Returns URL of a page.
+    """
+
+    def __init__(self, template):
+        """
+        Compiles and validates a template.
+
+        Args:
+            template (str): Template in str.format() syntax or former f-string template.
+
+        Raises:
+            ValueError: If the template contains unknown fields or invalid format specifications.
+        """
+
+        self.source = template
+        self.template = convert_legacy_template(template)
+
+        try:
+            for _, field, _, _ in string.Formatter().parse(self.template):
+                if field is not None and field not in fields:
+                    raise ValueError(f'Unknown field {{{field}}}, use {", ".join(fields)}')
+            # ...render once to check format specifications...
+            self.render('139v', 236435)
+        except (ValueError, IndexError, KeyError) as e:
+            raise ValueError(f'Invalid template {template}: {e}') from e
+
+    def render(self, folio, iiif_image_id):
+        """
+        Returns URL of a page.
+
+        :param folio: Folio of the page, e.g. '139v'
+        :param iiif_image_id: IIIF image id of the page
+        :return: URL as string
+        """
+
+        return self.template.format(iiif_image_id=iiif_image_id, folio=folio, folio_number=folio[:-1],
+                                    folio_side=folio[-1:])
+
+
+@functools.lru_cache(maxsize=None)
+def page_templates(sigla):
+    """ Compile templates for facs, corresp and ana of a manuscript once per process
+
+    :param sigla: Siglum of the manuscript as specified in config.py
+    :return: Dictionary of template names ('facs_url', 'corresp', 'ana') and UrlTemplate
+    :raises ValueError: If a template of the manuscript is invalid
+    """
+
+    templates = {}
+    for name in page_template_names:
+        try:
+            templates[name] = UrlTemplate(config.manuscript_data[sigla][name])
+        except ValueError as e:
+            raise ValueError(f"manuscript_data['{sigla}']['{name}'] in config.py: {e}") from e
+    return templates
+
+
+def render_page_attributes(sigla, positions):
+    """ Render facs, corresp and ana for a range of pages
+
+    :param sigla: Siglum of the manuscript as specified in config.py
+    :param positions: List of tuples (folio, iiif_image_id), see ManuscriptToProcess.page_positions()
+    :return: List of dictionaries of template names and URLs, one per page
+    """
+
+    templates = page_templates(sigla)
+    return [{name: template.render(folio, iiif_image_id) for name, template in templates.items()}
+            for folio, iiif_image_id in positions]
@@ -0,0 +1,101 @@
+""" Validation of PAGE XML files before their conversion into TEI
+
+The tests of bdd.PageXMLTests check every page independently with validate_page(), in a pool of worker processes if
+more than one job is given:
+    - every TextRegion needs its structure type ("structure {type:...}") in @custom. The attributes are read directly
+      from the start tags in the text of the file. Only if a region seems to miss it, the file is parsed and the region
+      is checked as before, including its content (see page_model.read_page_regions()),
+    - the placeholders of TOC entries (~n~) and chapters (*n*) in the file are collected in their order.
+The placeholders of all pages are counted afterwards (check_entry_numbers()), so the text of the book is never
+concatenated into one string.
+
+Problems are returned as Finding (page, region id, rule, message).
+
+"""
+
+import collections # for results and counting
+import concurrent.futures # for worker processes
+import io # for parsing bytes
+import re # for regex
+
+import page_model # text regions and lines of pageXML files
+import transpy # function library
+
+# problem found in a PAGE XML file, page and region id are None for problems of the whole book
+Finding = collections.namedtuple('Finding', ['page', 'region_id', 'rule', 'message'])
+# result of validate_page(), placeholders as list of numbers in order of the file
+PageValidation = collections.namedtuple('PageValidation', ['page', 'findings', 'toc_entries', 'chapter_entries'])
+
+# start tags of text regions, their custom attribute and the page number, read without parsing the file
+region_start_tag = re.compile(r'<(?:\w+:)?TextRegion\b[^>]*>')
+custom_attribute = re.compile(r'\scustom="([^"]*)"')
+page_number_attribute = re.compile(r'<(?:\w+:)?TranskribusMetadata\b[^>]*?\spageNr="([^"]*)"')
+
+# placeholders of TOC entries and chapters
+toc_entry = re.compile(r'~(\d+)~')
+chapter_entry = re.compile(r'\*(\d+)\*')
+
+
+def validate_page(filename):
+    """
+    Checks the text regions of a PAGE XML file and collects its placeholders.
+
+    :param filename: Path to PAGE XML file or transpy.ZipPage
+    :return: PageValidation
+    """
+
+    data = transpy.read_pagexml(filename)
+    text = data.decode('utf8')
+
+    # ...check @custom of the start tags, parse the file only if a structure type seems to be missing...
+    page_number = page_number_attribute.search(text)
+    customs = [custom_attribute.search(start_tag) for start_tag in region_start_tag.findall(text)]
+    findings = []
+    if page_number is None or not all(custom is not None and 'structure {type:' in custom.group(1)
+                                      for custom in customs):
+        page = page_model.read_page_regions(io.BytesIO(data))
+        page_number = page.page_number
+        for region in page.regions:
+            if not region.has_markup:
+                text_of_region = ' '.join(region.text)[:80]
+                findings.append(Finding(page_number, region.id, 'structure-type',
+                                        f'No "structure {{type:" in @custom or content, text: {text_of_region}'))
+    else:
+        page_number = page_number.group(1)
+
+    text = text.replace('⁓', '~') # replace wrong '⁓' with correct one '~'
+    return PageValidation(page_number, findings, [int(number) for number in toc_entry.findall(text)],
+                          [int(number) for number in chapter_entry.findall(text)])
+
+
+def validate_pages(filenames, jobs=1):
+    """
+    Validates PAGE XML files, see validate_page().
+
+    :param filenames: Paths to PAGE XML files or transpy.ZipPage
+    :param jobs: Number of worker processes, pages are validated in this process if 1
+    :return: List of PageValidation in order of the files
+    """
+
+    if jobs > 1 and len(filenames) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(validate_page, filenames, chunksize=max(1, len(filenames) // (jobs * 4))))
+    return [validate_page(filename) for filename in filenames]
+
+
+def check_entry_numbers(entries, test_number, type):
+    """
+    Checks, that every placeholder occurs test_number times (every placeholder is found twice in a PAGE XML file, in
+    the text of its TextLine and of its TextRegion).
+
+    As before, the numbers from 1 to the highest number (excluded) are checked.
+
+    :param entries: Numbers of the placeholders of all pages
+    :param test_number: Expected number of placeholders per number, e.g. 2 TOC entries or 3 chapter placeholders
+    :param type: Type of the placeholders, e.g. 'TOC'
+    :return: List of Finding
+    """
+
+    counts = collections.Counter(entries)
+    return [Finding(None, None, f'{type}-placeholders', f'Item ({type}) {number} has wrong number.')
+            for number in range(1, max(entries)) if counts[number] / 2 != test_number]
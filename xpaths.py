@@ -0,0 +1,29 @@
+""" Precompiled XPath queries for PAGE XML documents
+
+The queries are compiled once per process when this module is imported. Queries returning strings (attributes and
+text nodes) return plain strings, which do not keep the parsed document alive and can be pickled.
+
+Queries with parameters take them as XPath variables, e.g. text_regions_of_custom_type(root, type='column_1').
+
+"""
+
+import lxml.etree as LET # for compiling XPath expressions
+
+# namespaces of PAGE XML and TEI (prefixes ns0 and tei)
+namespaces = {'ns0': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15',
+              'tei': 'http://www.tei-c.org/ns/1.0'}
+
+
+def compile_xpath(expression):
+    """ Compiles an XPath expression using the namespace prefixes ns0 (PAGE XML) and tei """
+
+    return LET.XPath(expression, namespaces=namespaces, smart_strings=False)
+
+
+# PAGE XML
+text_regions_of_custom_type = compile_xpath('//ns0:TextRegion[contains(@custom, concat("type:", $type))]')
+text_lines = compile_xpath('.//ns0:TextLine')
+coords_points = compile_xpath('./ns0:Coords/@points')
+baseline_points = compile_xpath('.//ns0:Baseline/@points')
+text_equiv_text = compile_xpath('./ns0:TextEquiv/ns0:Unicode/text()')
+unicode_in_text_lines = compile_xpath('.//ns0:TextLine//ns0:Unicode')